@@ -0,0 +1,186 @@
+"""Module for selecting parsing and serialization backends
+
+Parsing is done by ijson, which ships several backends of very different speed (the C
+yajl2 backend is usually an order of magnitude faster than the pure python one).
+Both dimensions are probed when this module is imported. The fastest available parser is
+picked unless asked for explicitly. Serialization defaults to simplejson, so that split
+files are byte for byte those of earlier versions; orjson is faster, but writes compact
+separators and unescaped non-ASCII characters, and is only used when asked for. Values
+orjson can not write, such as integers wider than 64 bits, fall back to simplejson.
+
+Numbers which are not integers are always parsed into `decimal.Decimal` and written back
+using their exact string representation, so every combination of backends produces the
+same values. Per feature parsers such as orjson or simdjson only produce floats, which do
+not round trip exactly, so they are not used for parsing.
+
+A backend is named either `'auto'`, a parser name, a serializer name or
+`'<parser>+<serializer>'`, e.g. `'yajl2_c+orjson'`.
+"""
+import importlib
+from decimal import Decimal
+from types import ModuleType
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+
+import simplejson
+
+# ordered fastest first
+PARSERS: List[str] = ["yajl2_c", "yajl2_cffi", "yajl2", "python"]
+SERIALIZERS: List[str] = ["orjson", "simplejson"]
+DEFAULT_SERIALIZER: str = "simplejson"
+
+
+def _probe_parsers() -> Dict[str, ModuleType]:
+    """Import every ijson backend that is available on this machine."""
+    parsers: Dict[str, ModuleType] = {}
+    name: str
+    for name in PARSERS:
+        try:
+            parsers[name] = importlib.import_module(f"ijson.backends.{name}")
+        except (ImportError, OSError):
+            pass  # C library or extension not available
+
+    return parsers
+
+
+def _probe_serializers() -> Dict[str, ModuleType]:
+    """Import every serializer that is available and can write decimals exactly."""
+    serializers: Dict[str, ModuleType] = {"simplejson": simplejson}
+    try:
+        import orjson
+
+        # fragments are needed to write decimals without quoting them
+        if hasattr(orjson, "Fragment"):
+            serializers["orjson"] = orjson
+    except ImportError:
+        pass
+
+    return serializers
+
+
+_parsers: Dict[str, ModuleType] = _probe_parsers()
+_serializers: Dict[str, ModuleType] = _probe_serializers()
+
+
+def available_parsers() -> List[str]:
+    """Names of the available ijson backends, fastest first."""
+    return [name for name in PARSERS if name in _parsers]
+
+
+def available_serializers() -> List[str]:
+    """Names of the available serializers, fastest first."""
+    return [name for name in SERIALIZERS if name in _serializers]
+
+
+def _orjson_default(obj: Any) -> Any:
+    if isinstance(obj, Decimal):
+        return _serializers["orjson"].Fragment(str(obj))
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class Backend:
+    """Parsing and serialization functions used to stream and write features
+
+    Attributes:
+        parser (str): Name of the ijson backend.
+        serializer (str): Name of the serializer.
+    """
+
+    def __init__(self, parser: str, serializer: str) -> None:
+        """
+        Constructor for Backend
+
+        Args:
+            parser (str): Name of the ijson backend, one of `PARSERS`.
+            serializer (str): Name of the serializer, one of `SERIALIZERS`.
+
+        Raises:
+            ValueError: If either backend is unknown or not available.
+        """
+        if parser not in _parsers:
+            raise ValueError(
+                f"parser {parser} is not available, choose from {available_parsers()}"
+            )
+        if serializer not in _serializers:
+            raise ValueError(
+                f"serializer {serializer} is not available, choose from "
+                f"{available_serializers()}"
+            )
+        self.parser = parser
+        self.serializer = serializer
+        self._ijson: ModuleType = _parsers[parser]
+
+    @property
+    def name(self) -> str:
+        return f"{self.parser}+{self.serializer}"
+
+    def __repr__(self) -> str:
+        return f"Backend({self.name!r})"
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Backend) and self.name == other.name
+
+    def items(self, fp: Any, prefix: str) -> Iterator[Any]:
+        """Iterate over the objects found under `prefix`, see `ijson.items`."""
+        return self._ijson.items(fp, prefix)
+
+    def parse(self, fp: Any) -> Iterator[Tuple[str, str, Any]]:
+        """Iterate over the prefixed parsing events of a document, see `ijson.parse`."""
+        return self._ijson.parse(fp)
+
+    def loads(self, raw: Union[bytes, memoryview]) -> Any:
+        """Parse the raw bytes of a single feature."""
+        if isinstance(raw, memoryview):
+            raw = raw.tobytes()
+        return simplejson.loads(raw, use_decimal=True)
+
+    def dumps(self, obj: Any) -> bytes:
+        """Serialize `obj` to UTF-8 encoded JSON."""
+        if self.serializer == "orjson":
+            try:
+                return _serializers["orjson"].dumps(obj, default=_orjson_default)
+            except (TypeError, OverflowError):
+                pass  # e.g. integers wider than 64 bits, which simplejson writes
+        return simplejson.dumps(obj).encode("utf-8")
+
+    def dump(self, obj: Any, fp: BinaryIO) -> None:
+        """Serialize `obj` to a binary file object."""
+        fp.write(self.dumps(obj))
+
+
+def get_backend(name: Optional[Union[str, Backend]] = None) -> Backend:
+    """
+    Resolve a backend name into a Backend.
+
+    Args:
+        name (Optional[Union[str, Backend]], optional): `'auto'`, a parser name, a
+            serializer name or `'<parser>+<serializer>'`. The parser is picked
+            automatically when not given, and the serializer is `DEFAULT_SERIALIZER`.
+            Defaults to `'auto'`.
+
+    Raises:
+        ValueError: If the name is unknown or names a backend which is not available.
+
+    Returns:
+        Backend: The resolved backend.
+    """
+    if isinstance(name, Backend):
+        return name
+    if name is None:
+        name = "auto"
+
+    parser: str = available_parsers()[0]
+    serializer: str = DEFAULT_SERIALIZER
+    part: str
+    for part in name.split("+"):
+        if part == "auto":
+            continue
+        elif part in PARSERS:
+            parser = part
+        elif part in SERIALIZERS:
+            serializer = part
+        else:
+            raise ValueError(
+                f"unknown backend {part}, choose from {PARSERS + SERIALIZERS}"
+            )
+
+    return Backend(parser, serializer)
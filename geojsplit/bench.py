@@ -0,0 +1,512 @@
+"""Module for benchmarking geojsplit
+
+Generates reproducible synthetic Feature Collections and measures how fast they are split
+for every backend and mode, reporting features and megabytes per second, peak resident
+memory and the time spent in each stage of the split:
+
+- parse: reading features from the document, either parsing them (`parse` and
+  `parse-mmap` modes) or locating their raw bytes (`raw` and `raw-mmap` modes).
+- batch: gathering features into batches.
+- serialize: turning a batch into the bytes of an output file.
+- write: writing those bytes to disk.
+
+Every case runs in a fresh process so that peak memory is measured per case. Results can
+be written as JSON to track them over releases ::
+
+    $ geojsplit bench --size 100 --backends all --json results.json
+
+"""
+import argparse
+import itertools
+import json
+import logging
+import mmap
+import platform
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, TextIO
+
+import geojson
+
+from . import __version__, scanner
+from .backends import available_parsers, available_serializers, get_backend
+
+try:
+    import resource
+except ImportError:  # not available on windows
+    resource = None
+
+GEOMETRY_TYPES: List[str] = [
+    "Point",
+    "LineString",
+    "Polygon",
+    "MultiPoint",
+    "MultiLineString",
+    "MultiPolygon",
+]
+MODES: List[str] = ["parse", "raw", "parse-mmap", "raw-mmap"]
+STAGES: List[str] = ["parse", "batch", "serialize", "write"]
+
+
+def _coordinates(rng: random.Random, geometry_type: str, vertices: int) -> Any:
+    """Random coordinates for a geometry of `geometry_type` with about `vertices` points."""
+
+    def position() -> List[float]:
+        return [round(rng.uniform(-180, 180), 6), round(rng.uniform(-90, 90), 6)]
+
+    def ring() -> List[List[float]]:
+        points: List[List[float]] = [position() for _ in range(max(3, vertices - 1))]
+        return points + [points[0]]
+
+    if geometry_type == "Point":
+        return position()
+    if geometry_type in ("LineString", "MultiPoint"):
+        return [position() for _ in range(max(2, vertices))]
+    if geometry_type == "Polygon":
+        return [ring()]
+    if geometry_type == "MultiLineString":
+        return [[position() for _ in range(max(2, vertices))] for _ in range(2)]
+    if geometry_type == "MultiPolygon":
+        return [[ring()] for _ in range(2)]
+    raise ValueError(
+        f"unknown geometry type {geometry_type}, choose from {GEOMETRY_TYPES}"
+    )
+
+
+def generate_features(
+    geometry_types: Optional[List[str]] = None,
+    vertices: int = 16,
+    properties: int = 8,
+    property_width: int = 16,
+    seed: int = 0,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Generator function to yield an endless, reproducible stream of random features.
+
+    Args:
+        geometry_types (Optional[List[str]], optional): Geometry types to pick from
+            uniformly. Defaults to Point, LineString and Polygon.
+        vertices (int, optional): Number of positions in each line or ring. Defaults to 16.
+        properties (int, optional): Number of properties of each feature. Defaults to 8.
+        property_width (int, optional): Length of each string property. Defaults to 16.
+        seed (int, optional): Random seed, the same seed yields the same features.
+            Defaults to 0.
+
+    Yields:
+        (Iterator[Dict[str, Any]]): The next random feature.
+    """
+    if geometry_types is None:
+        geometry_types = ["Point", "LineString", "Polygon"]
+    rng: random.Random = random.Random(seed)
+    alphabet: str = "abcdefghijklmnopqrstuvwxyz"
+
+    i: int
+    for i in itertools.count():
+        geometry_type: str = rng.choice(geometry_types)
+        feature_properties: Dict[str, Any] = {"id": i}
+        p: int
+        for p in range(properties - 1):
+            if p % 2:
+                feature_properties[f"value_{p}"] = round(rng.uniform(0, 1000), 3)
+            else:
+                feature_properties[f"name_{p}"] = "".join(
+                    rng.choice(alphabet) for _ in range(property_width)
+                )
+        yield {
+            "type": "Feature",
+            "properties": feature_properties,
+            "geometry": {
+                "type": geometry_type,
+                "coordinates": _coordinates(rng, geometry_type, vertices),
+            },
+        }
+
+
+def generate_geojson(path: Path, size: float, **kwargs: Any) -> int:
+    """
+    Write a synthetic Feature Collection of about `size` megabytes.
+
+    Features are written one at a time, so arbitrarily large documents can be generated
+    in constant memory.
+
+    Args:
+        path (Path): Output filename.
+        size (float): Target size in megabytes (10 ** 6 bytes). The document is slightly
+            larger, since the last feature is always written whole.
+        **kwargs: Passed down to `generate_features`.
+
+    Returns:
+        int: The number of features written.
+    """
+    target: int = int(size * 10 ** 6)
+    count: int = 0
+    with path.open("w") as fp:
+        written: int = fp.write('{"type": "FeatureCollection", "features": [')
+        feature: Dict[str, Any]
+        for feature in generate_features(**kwargs):
+            if written >= target:
+                break
+            if count:
+                written += fp.write(",\n")
+            written += fp.write(json.dumps(feature))
+            count += 1
+        fp.write("]}\n")
+
+    return count
+
+
+def _peak_rss() -> Optional[int]:
+    """Peak resident memory of this process in bytes, if it can be measured."""
+    if resource is None:
+        return None
+    peak: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes everywhere except on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_case(
+    geojson_file: Path, mode: str, backend: str, batch: int, output_dir: Path
+) -> Dict[str, Any]:
+    """
+    Split a document once, timing every stage.
+
+    This mirrors the loop of the command line tool with timers around each stage. Run it
+    in a fresh process for the peak memory to only account for this case.
+
+    Args:
+        geojson_file (Path): Filepath of the document to split.
+        mode (str): One of `MODES`.
+        backend (str): Name of the backend, see `backends.get_backend`.
+        batch (int): Number of features in each output file.
+        output_dir (Path): Directory to write output files to.
+
+    Returns:
+        Dict[str, Any]: Measurements of the case.
+    """
+    if mode not in MODES:
+        raise ValueError(f"unknown mode {mode}, choose from {MODES}")
+    resolved = get_backend(backend)
+    raw: bool = mode.startswith("raw")
+    stages: Dict[str, float] = dict.fromkeys(STAGES, 0.0)
+    clock = time.perf_counter
+    feature_count: int = 0
+    file_count: int = 0
+
+    def write(data: bytes) -> None:
+        nonlocal file_count
+        tick: float = clock()
+        with (output_dir / f"bench_x{file_count}.geojson").open("wb") as out:
+            out.write(data)
+        stages["write"] += clock() - tick
+        file_count += 1
+
+    start: float = clock()
+    with ExitStack() as stack:
+        fp = stack.enter_context(geojson_file.open("rb"))
+        source: Any = fp
+        if mode.endswith("mmap"):
+            source = stack.enter_context(
+                mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            )
+        features: Iterator[Any]
+        if not raw:
+            features = resolved.items(source, "features.item")
+        elif mode.endswith("mmap"):
+            features = (view for _, view in scanner.iter_mapped_features(source))
+            # release views of the mapping before it is closed
+            stack.callback(features.close)
+        else:
+            features = (data for _, data in scanner.iter_raw_features(source))
+
+        data: List[Any] = []
+        while True:
+            tick: float = clock()
+            feature: Any = next(features, None)
+            tock: float = clock()
+            stages["parse"] += tock - tick
+            if feature is not None:
+                data.append(feature)
+                feature_count += 1
+            stages["batch"] += clock() - tock
+            if data and (feature is None or len(data) == batch):
+                tick = clock()
+                if raw:
+                    serialized: bytes = b"".join(
+                        [
+                            scanner.FEATURE_COLLECTION_HEADER,
+                            b",".join(data),
+                            scanner.FEATURE_COLLECTION_FOOTER,
+                        ]
+                    )
+                else:
+                    serialized = resolved.dumps(geojson.FeatureCollection(data))
+                stages["serialize"] += clock() - tick
+                data = []
+                write(serialized)
+            if feature is None:
+                break
+    seconds: float = clock() - start
+
+    size: int = geojson_file.stat().st_size
+    return {
+        "mode": mode,
+        "backend": resolved.name if not raw else "raw",
+        "batch": batch,
+        "features": feature_count,
+        "files": file_count,
+        "bytes": size,
+        "seconds": seconds,
+        "features_per_sec": feature_count / seconds if seconds else None,
+        "mb_per_sec": size / 10 ** 6 / seconds if seconds else None,
+        "peak_rss_bytes": _peak_rss(),
+        "stages": stages,
+    }
+
+
+def _run_isolated(
+    geojson_file: Path, mode: str, backend: str, batch: int
+) -> Dict[str, Any]:
+    """Run a case in a fresh process writing to a temporary directory."""
+    with tempfile.TemporaryDirectory(prefix="geojsplit-bench-") as output_dir:
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            return executor.submit(
+                run_case, geojson_file, mode, backend, batch, Path(output_dir)
+            ).result()
+
+
+def run_benchmarks(
+    geojson_file: Path,
+    modes: Optional[List[str]] = None,
+    backends: Optional[List[str]] = None,
+    batch: int = 100,
+) -> List[Dict[str, Any]]:
+    """
+    Run every combination of `modes` and `backends` on a document.
+
+    Raw modes never parse features, so they are only run once whatever the backends.
+
+    Args:
+        geojson_file (Path): Filepath of the document to split.
+        modes (Optional[List[str]], optional): Modes to run. Defaults to `parse` and
+            `raw`.
+        backends (Optional[List[str]], optional): Backends to run the parse modes with.
+            Defaults to the fastest available backend.
+        batch (int, optional): Number of features in each output file. Defaults to 100.
+
+    Returns:
+        List[Dict[str, Any]]: Measurements of every case, see `run_case`.
+    """
+    if modes is None:
+        modes = ["parse", "raw"]
+    if backends is None:
+        backends = ["auto"]
+    logger: logging.Logger = logging.getLogger(__name__)
+
+    results: List[Dict[str, Any]] = []
+    mode: str
+    for mode in modes:
+        backend: str
+        for backend in backends if not mode.startswith("raw") else ["auto"]:
+            logger.debug(f"running {mode} with backend {backend}")
+            results.append(_run_isolated(geojson_file, mode, backend, batch))
+
+    return results
+
+
+def all_backends() -> List[str]:
+    """Names of every available combination of parser and serializer."""
+    return [
+        f"{parser}+{serializer}"
+        for parser, serializer in itertools.product(
+            available_parsers(), available_serializers()
+        )
+    ]
+
+
+def format_results(results: List[Dict[str, Any]], fp: TextIO) -> None:
+    """Write benchmark results as a human readable table."""
+    columns: List[str] = ["mode", "backend", "features/s", "MB/s", "peak MB"] + [
+        f"{stage} s" for stage in STAGES
+    ]
+    rows: List[List[str]] = [columns]
+    result: Dict[str, Any]
+    for result in results:
+        peak: Optional[int] = result["peak_rss_bytes"]
+        rows.append(
+            [
+                result["mode"],
+                result["backend"],
+                f"{result['features_per_sec'] or 0:.0f}",
+                f"{result['mb_per_sec'] or 0:.1f}",
+                f"{peak / 10 ** 6:.0f}" if peak is not None else "-",
+            ]
+            + [f"{result['stages'][stage]:.3f}" for stage in STAGES]
+        )
+    widths: List[int] = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+    row: List[str]
+    for row in rows:
+        fp.write("  ".join(cell.ljust(width) for cell, width in zip(row, widths)))
+        fp.write("\n")
+
+
+def _comma_list(x: str) -> List[str]:
+    return [item.strip() for item in x.split(",") if item.strip()]
+
+
+def setup_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="geojsplit bench",
+        description="Benchmark splitting of a synthetic or existing geojson file.",
+    )
+    parser.add_argument(
+        "-i", "--input", help="benchmark an existing geojson instead of a synthetic one"
+    )
+    parser.add_argument(
+        "--generate",
+        help="only write a synthetic geojson to GENERATE, without benchmarking it",
+    )
+    parser.add_argument(
+        "-s",
+        "--size",
+        type=float,
+        default=10.0,
+        help="size of the synthetic geojson in megabytes (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--geometry-types",
+        type=_comma_list,
+        default=["Point", "LineString", "Polygon"],
+        help="comma separated geometry types of the synthetic features "
+        "(default: Point,LineString,Polygon)",
+    )
+    parser.add_argument(
+        "--vertices",
+        type=int,
+        default=16,
+        help="number of positions in each line or ring (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--properties",
+        type=int,
+        default=8,
+        help="number of properties of each feature (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--property-width",
+        type=int,
+        default=16,
+        help="length of string properties (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="random seed (default: %(default)s)"
+    )
+    parser.add_argument(
+        "-l",
+        "--geometry-count",
+        type=int,
+        default=100,
+        help="the number of features to be distributed to each file "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--modes",
+        type=_comma_list,
+        default=["parse", "raw"],
+        help=f"comma separated modes to run, from {','.join(MODES)} "
+        "(default: parse,raw)",
+    )
+    parser.add_argument(
+        "--backends",
+        type=_comma_list,
+        default=["auto"],
+        help="comma separated backends to run parse modes with, or 'all' "
+        "(default: auto)",
+    )
+    parser.add_argument(
+        "--json", help="write results as JSON to this file, or '-' for stdout"
+    )
+    parser.add_argument(
+        "-v", "--verbose", help="increase output verbosity", action="store_true"
+    )
+
+    return parser
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    logger: logging.Logger = logging.getLogger(__name__)
+    parser: argparse.ArgumentParser = setup_parser()
+    parsed: argparse.Namespace = parser.parse_args(args=args)
+    if parsed.verbose:
+        logger.setLevel(logging.DEBUG)
+
+    unknown_modes: List[str] = [mode for mode in parsed.modes if mode not in MODES]
+    if unknown_modes:
+        parser.error(f"unknown modes {unknown_modes}, choose from {MODES}")
+    backends: List[str] = parsed.backends
+    if backends == ["all"]:
+        backends = all_backends()
+    try:
+        for backend in backends:
+            get_backend(backend)
+    except ValueError as e:
+        parser.error(str(e))
+    generator_options: Dict[str, Any] = {
+        "geometry_types": parsed.geometry_types,
+        "vertices": parsed.vertices,
+        "properties": parsed.properties,
+        "property_width": parsed.property_width,
+        "seed": parsed.seed,
+    }
+
+    with ExitStack() as stack:
+        if parsed.generate is not None:
+            count: int = generate_geojson(
+                Path(parsed.generate), parsed.size, **generator_options
+            )
+            logger.debug(f"generated {count} features to {parsed.generate}")
+            return
+        if parsed.input is not None:
+            geojson_file: Path = Path(parsed.input)
+            if not geojson_file.exists():
+                parser.error(f"file {geojson_file.name} does not exist")
+        else:
+            tmp_dir: str = stack.enter_context(
+                tempfile.TemporaryDirectory(prefix="geojsplit-bench-")
+            )
+            geojson_file = Path(tmp_dir) / "synthetic.geojson"
+            count = generate_geojson(geojson_file, parsed.size, **generator_options)
+            logger.debug(f"generated {count} synthetic features to {geojson_file}")
+
+        results: List[Dict[str, Any]] = run_benchmarks(
+            geojson_file, parsed.modes, backends, parsed.geometry_count
+        )
+
+    if parsed.json is None:
+        format_results(results, sys.stdout)
+        return
+    report: Dict[str, Any] = {
+        "geojsplit": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "input": parsed.input,
+        "generator": (
+            None
+            if parsed.input is not None
+            else {
+                "size": parsed.size,
+                **generator_options,
+            }
+        ),
+        "results": results,
+    }
+    if parsed.json == "-":
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        with Path(parsed.json).open("w") as fp:
+            json.dump(report, fp, indent=2)
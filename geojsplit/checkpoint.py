@@ -0,0 +1,124 @@
+"""Module for checkpoints of resumable splits
+
+A long running split periodically saves a small JSON checkpoint next to its output
+files, holding the number of output files completed so far, the byte offset of the input
+document right after the last feature written to them, and the fingerprint of the input
+(see `index.fingerprint`) and of the options used. A split restarted with the same input
+and options seeks straight to that offset, instead of parsing everything before it
+again, and carries on numbering output files from there.
+
+::
+
+    {
+        "version": 1,
+        "fingerprint": {"size": ..., "mtime_ns": ..., "hash": ...},
+        "settings": {"geometry_count": 100, ...},
+        "file_count": 42,
+        "feature_count": 4200,
+        "offset": 123456789
+    }
+
+"""
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .writers import atomic_open
+
+VERSION: int = 1
+INTERVAL: float = 10.0  # minimum number of seconds between two saves
+
+
+class Checkpoint:
+    """Progress of a split, from which it can be resumed
+
+    Attributes:
+        fingerprint (Dict[str, Any]): Fingerprint of the input document.
+        settings (Dict[str, Any]): Options of the split which change its output files.
+        file_count (int): Number of output files completed, i.e. the index of the next
+            one.
+        feature_count (int): Number of features written to the completed files.
+        offset (Optional[int]): Byte offset of the input document right after the last
+            feature of the completed files, or None before the first one.
+    """
+
+    def __init__(
+        self,
+        fingerprint: Dict[str, Any],
+        settings: Dict[str, Any],
+        file_count: int = 0,
+        feature_count: int = 0,
+        offset: Optional[int] = None,
+    ) -> None:
+        self.fingerprint = fingerprint
+        # normalized as read back from JSON, e.g. tuples as lists
+        self.settings: Dict[str, Any] = json.loads(json.dumps(settings))
+        self.file_count = file_count
+        self.feature_count = feature_count
+        self.offset = offset
+        self._saved: float = time.monotonic()
+
+    def matches(self, fingerprint: Dict[str, Any], settings: Dict[str, Any]) -> bool:
+        """Whether the split can be resumed for an input document and options."""
+        return self.fingerprint == fingerprint and self.settings == json.loads(
+            json.dumps(settings)
+        )
+
+    def advance(self, offset: int, feature_count: int) -> None:
+        """Record one more completed output file, ending at `offset` in the input."""
+        self.file_count += 1
+        self.feature_count += feature_count
+        self.offset = offset
+
+    def due(self) -> bool:
+        """Whether `INTERVAL` seconds passed since the checkpoint was last saved."""
+        return time.monotonic() - self._saved >= INTERVAL
+
+    def save(self, path: Path) -> None:
+        """Atomically write the checkpoint to `path`."""
+        with atomic_open(path) as fp:
+            fp.write(
+                json.dumps(
+                    {
+                        "version": VERSION,
+                        "fingerprint": self.fingerprint,
+                        "settings": self.settings,
+                        "file_count": self.file_count,
+                        "feature_count": self.feature_count,
+                        "offset": self.offset,
+                    },
+                    indent=2,
+                ).encode("utf-8")
+            )
+        self._saved = time.monotonic()
+
+    @classmethod
+    def load(cls, path: Path) -> "Checkpoint":
+        """
+        Read a checkpoint written by `save`.
+
+        Args:
+            path (Path): Filepath of the checkpoint.
+
+        Raises:
+            ValueError: If the file is not a checkpoint of a supported version.
+
+        Returns:
+            Checkpoint: The loaded checkpoint.
+        """
+        try:
+            data: Dict[str, Any] = json.loads(path.read_text())
+            if data.get("version") != VERSION:
+                raise ValueError(
+                    f"unsupported checkpoint version {data.get('version')}"
+                )
+            return cls(
+                data["fingerprint"],
+                data["settings"],
+                file_count=data["file_count"],
+                feature_count=data["feature_count"],
+                offset=data["offset"],
+            )
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"{path} is not a valid checkpoint") from e
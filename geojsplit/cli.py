@@ -1,63 +1,1423 @@
 import argparse
+import cProfile
+import glob
+import itertools
+import json
 import logging
 import sys
+import threading
+import urllib.parse
+from collections import deque
+from concurrent.futures import (
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
+from contextlib import ExitStack
 from logging.config import dictConfig
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Union
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    TextIO,
+    Tuple,
+    Union,
+)
 
 import geojson
-import simplejson as json
 
-from . import __version__
-from .geojsplit import GeoJSONBatchStreamer
+from . import __version__, bench, index
+from .backends import Backend, get_backend
+from .checkpoint import Checkpoint
+from .compression import (
+    COMPRESSIONS,
+    add_suffix,
+    strip_suffix,
+    wrap_compressed,
+    zstandard,
+)
+from .filters import FeatureFilter, parse_condition, raw_feature_bbox
+from .geojsplit import GeoJSONBatchStreamer, GeoJSONMultiStreamer, expand_paths
+from .metrics import Metrics, ProgressBar, StatsWriter, TimedWriter, clock
+from .partition import (
+    BBox,
+    Partitioner,
+    feature_bbox,
+    get_partitioner,
+    merge_bbox,
+    write_manifest,
+)
+from .sinks import (
+    SINKS,
+    GeoJSONSink,
+    NDJSONSink,
+    Sink,
+    TextSink,
+    get_sink,
+    pyarrow,
+)
+from .sort import ExternalSorter, SortKey, get_sort_key
+from .transform import TRANSFORMS, CoordinateTransform, numpy
+from .writers import (
+    PARTIAL_SUFFIX,
+    FeatureCollectionWriter,
+    RollingWriter,
+    WriterCache,
+    atomic_open,
+)
+
+TASK_BATCHES: int = 4  # batches handed to a worker at once by input_geojson_parallel
+SUMMARY_NAME: str = "geojsplit_summary.json"  # summary of a split of many documents
+SUFFIX_ALPHABET: str = "abcdefghijklmopqrstuvwxyz"  # characters of split file suffixes
+
+
+def gen_filename(
+    filename: Path,
+    file_count: int,
+    width: Optional[int] = None,
+    parent: Optional[Path] = None,
+) -> Path:
+    """Generate unique filename according to number of iterations thus far."""
+    if width is None:
+        width = 4
+    if parent is None:
+        parent = filename.parent
+    elif isinstance(parent, str):
+        parent = Path(parent)
+    suffix: str = filename.suffix
+    stem: str = filename.stem
+
+    return parent / (stem + "_x" + pad(file_count, width) + suffix)
+
+
+def partition_filename(filename: Path, key: str, parent: Optional[Path] = None) -> Path:
+    """Generate the filename of the partition `key`."""
+    if parent is None:
+        parent = filename.parent
+    elif isinstance(parent, str):
+        parent = Path(parent)
+
+    return parent / (filename.stem + "_" + key + filename.suffix)
+
+
+def key_to_str(key: Any) -> str:
+    """Convert a key into a string usable in filenames, quoting unsafe characters."""
+    if key is None:
+        return "null"
+    return urllib.parse.quote(str(key), safe="")
+
+
+def write_features(
+    features: Union[geojson.feature.FeatureCollection, List[bytes]],
+    filename: Path,
+    raw: bool = False,
+    backend: Optional[Backend] = None,
+    compress: Optional[str] = None,
+    level: Optional[int] = None,
+    sink: Optional[Union[str, Sink]] = None,
+    metrics: Optional[Metrics] = None,
+) -> int:
+    """
+    Write a batch of features to a new geojson file, atomically.
+
+    Args:
+        features (Union[geojson.feature.FeatureCollection, List[bytes]]): The batch to
+            write, either a Feature Collection or the raw bytes of each feature.
+        filename (Path): Output filename. Missing parent directories are created, and
+            the file only appears once completely written, see `writers.atomic_open`.
+        raw (bool, optional): Whether `features` are raw feature bytes. Defaults to False.
+        backend (Optional[Backend], optional): Backend used to serialize a Feature
+            Collection. Defaults to the fastest available one.
+        compress (Optional[str], optional): Compression of the file, one of
+            `compression.COMPRESSIONS`. Defaults to None.
+        level (Optional[int], optional): Compression level. Defaults to the library
+            default.
+        sink (Optional[Union[str, Sink]], optional): Output format, as a sink or the
+            name of one of `sinks.SINKS`. Defaults to a Feature Collection.
+        metrics (Optional[Metrics], optional): Metrics to record the file to, with the
+            time spent serializing and writing it. Defaults to None.
+
+    Returns:
+        int: The number of features written.
+    """
+    if metrics is None:
+        with atomic_open(filename, compress, level) as fp:
+            return get_sink(sink).write(fp, features, raw=raw, backend=backend)
+
+    start: float = clock()
+    with atomic_open(filename, compress, level) as fp:
+        timed: TimedWriter = TimedWriter(fp)
+        count: int = get_sink(sink).write(timed, features, raw=raw, backend=backend)
+        serialize: float = clock() - start - timed.seconds
+    # closing, compressing and renaming the file count as writing it
+    metrics.record_file(
+        count,
+        timed.bytes_written,
+        serialize=serialize,
+        write=clock() - start - serialize,
+    )
+    return count
+
+
+def write_span_batches(
+    geojson_file: Path,
+    batches: List[Tuple[Path, List[Tuple[int, int]]]],
+    raw: bool = False,
+    dry_run: bool = False,
+    backend: Optional[str] = None,
+    compress: Optional[str] = None,
+    level: Optional[int] = None,
+    sink: Optional[str] = None,
+) -> List[Tuple[Path, int, Optional[Exception]]]:
+    """
+    Worker function writing batches of features located by their byte offsets.
+
+    Every batch is read from `geojson_file` with a single seek and read, so that workers
+    never need to scan the document themselves.
+
+    Args:
+        geojson_file (Path): Filepath of the geojson document being split.
+        batches (List[Tuple[Path, List[Tuple[int, int]]]]): Output filename and the
+            start and end byte offsets of every feature of each batch.
+        raw (bool, optional): Copy the feature bytes without parsing them. Defaults to
+            False.
+        dry_run (bool, optional): Do not write anything. Defaults to False.
+        backend (Optional[str], optional): Name of the backend used to parse and
+            serialize features. Defaults to the fastest available one.
+        compress (Optional[str], optional): Compression of the output files. Defaults
+            to None.
+        level (Optional[int], optional): Compression level. Defaults to the library
+            default.
+        sink (Optional[str], optional): Name of the output format. Defaults to
+            `'geojson'`.
+
+    Returns:
+        List[Tuple[Path, int, Optional[Exception]]]: Output filename, number of features
+            and the error raised while writing, if any, for each batch.
+    """
+    results: List[Tuple[Path, int, Optional[Exception]]] = []
+    resolved_backend: Backend = get_backend(backend)
+    resolved_sink: Sink = get_sink(sink)
+    with geojson_file.open("rb") as fp:
+        filename: Path
+        spans: List[Tuple[int, int]]
+        for filename, spans in batches:
+            if dry_run:
+                results.append((filename, len(spans), None))
+                continue
+            start: int = spans[0][0]
+            fp.seek(start)
+            buf: bytes = fp.read(spans[-1][1] - start)
+            features: List[bytes] = [buf[s - start : e - start] for s, e in spans]
+            try:
+                if raw:
+                    write_features(
+                        features,
+                        filename,
+                        raw=True,
+                        backend=resolved_backend,
+                        compress=compress,
+                        level=level,
+                        sink=resolved_sink,
+                    )
+                else:
+                    write_features(
+                        geojson.FeatureCollection(
+                            [resolved_backend.loads(feature) for feature in features]
+                        ),
+                        filename,
+                        backend=resolved_backend,
+                        compress=compress,
+                        level=level,
+                        sink=resolved_sink,
+                    )
+                results.append((filename, len(spans), None))
+            except IOError as e:
+                results.append((filename, len(spans), e))
+
+    return results
+
+
+def save_features(
+    features: Union[geojson.feature.FeatureCollection, List[bytes]],
+    filename: Path,
+    raw: bool = False,
+    dry_run: bool = False,
+    backend: Optional[Backend] = None,
+    compress: Optional[str] = None,
+    level: Optional[int] = None,
+    sink: Optional[Sink] = None,
+    metrics: Optional[Metrics] = None,
+) -> None:
+    """Write a batch of features unless `dry_run`, logging the outcome."""
+    logger: logging.Logger = logging.getLogger(__name__)
+    try:
+        feature_count: int = len(features) if raw else len(features["features"])
+        if not dry_run:
+            write_features(
+                features,
+                filename,
+                raw=raw,
+                backend=backend,
+                compress=compress,
+                level=level,
+                sink=sink,
+                metrics=metrics,
+            )
+        elif metrics is not None:
+            metrics.record_file(feature_count)
+        logger.debug(f"successfully saved {feature_count} features to {filename}")
+    except IOError as e:
+        logger.error(f"Could not write features to {filename}", exc_info=e)
+
+
+class WriterPool:
+    """Bounded pool of writer threads
+
+    Lets the main thread parse the next batch while previous batches are serialized and
+    written. At most `queue_depth` batches are pending at once, so that memory stays
+    bounded when writes are slower than parsing; `submit` blocks until a slot is free.
+    Exceptions raised by a write are raised again from the next `submit` or on exit.
+
+    Attributes:
+        writers (int): Number of writer threads.
+        queue_depth (int): Maximum number of batches submitted but not yet written.
+    """
+
+    def __init__(self, writers: int, queue_depth: Optional[int] = None) -> None:
+        if queue_depth is None:
+            queue_depth = 2 * writers
+        self.writers = writers
+        self.queue_depth = queue_depth
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=writers)
+        self._slots: threading.BoundedSemaphore = threading.BoundedSemaphore(
+            queue_depth
+        )
+        self._pending: List[Future] = []
+
+    def __enter__(self) -> "WriterPool":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _raise_failed(self, wait: bool = False) -> None:
+        """Drop finished writes, raising the first exception found."""
+        future: Future
+        pending: List[Future] = []
+        for future in self._pending:
+            if wait or future.done():
+                future.result()
+            else:
+                pending.append(future)
+        self._pending = pending
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> None:
+        """Schedule `fn(*args)` on a writer thread, blocking while the queue is full."""
+        self._raise_failed()
+        self._slots.acquire()
+        future: Future = self._executor.submit(fn, *args)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._pending.append(future)
+
+    def close(self) -> None:
+        """Wait for every pending write to finish."""
+        try:
+            self._raise_failed(wait=True)
+        finally:
+            self._executor.shutdown(wait=True)
+
+
+def input_geojson_parallel(args: argparse.Namespace, gj: GeoJSONBatchStreamer) -> None:
+    """
+    Split a geojson document across a pool of worker processes.
+
+    The byte offsets of features are read lazily, a few batches at a time, and every run
+    of `TASK_BATCHES` batches is handed to a worker which reads and writes them
+    independently. At most `2 * --jobs` tasks are pending at once, so only their offsets
+    are held in memory however large the document is. Output filenames are identical to
+    the sequential path.
+    """
+    logger: logging.Logger = logging.getLogger(__name__)
+    batch: int = args.geometry_count if args.geometry_count is not None else 100
+    metrics: Optional[Metrics] = gj.metrics
+    read: int = metrics.bytes_read if metrics is not None else 0
+    done: int = 0  # bytes of the document read by workers so far
+
+    spans: Iterator[Tuple[int, int]]
+    if args.index:
+        spans = gj.index().spans()
+    else:
+        spans = gj.spans()
+    if args.limit is not None:
+        spans = itertools.islice(spans, args.limit * batch)
+    span_batches: Iterator[List[Tuple[int, int]]] = iter(
+        lambda: list(itertools.islice(spans, batch)), []
+    )
+
+    def collect(task: Future) -> int:
+        """Record the files written by a finished task, returning the bytes it read."""
+        size: int = 0
+        filename: Path
+        feature_count: int
+        error: Optional[Exception]
+        for filename, feature_count, error in task.result():
+            size += sizes.pop(filename)
+            if metrics is not None:
+                # timings of the work done by worker processes are not known
+                metrics.record_batch(feature_count)
+                if error is None:
+                    metrics.record_file(feature_count)
+            if error is None:
+                logger.debug(
+                    f"successfully saved {feature_count} features to {filename}"
+                )
+            else:
+                logger.error(f"Could not write features to {filename}", exc_info=error)
+        return size
+
+    # bytes of the document read by workers for each pending batch
+    sizes: Dict[Path, int] = {}
+    count: int = 0
+    exhausted: bool = False
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        pending: Deque[Future] = deque()
+        while not exhausted:
+            task: List[Tuple[Path, List[Tuple[int, int]]]] = []
+            span_batch: List[Tuple[int, int]]
+            for span_batch in itertools.islice(span_batches, TASK_BATCHES):
+                try:
+                    new_filename: Path = gen_filename(
+                        output_name(args, gj),
+                        count,
+                        width=args.suffix_length,
+                        parent=args.output,
+                    )
+                except TypeError as e:
+                    logger.error(f"Could not generate a unique suffix.", exc_info=e)
+                    exhausted = True
+                    break
+                new_filename = add_suffix(new_filename, args.compress)
+                sizes[new_filename] = span_batch[-1][1] - span_batch[0][0]
+                task.append((new_filename, span_batch))
+                count += 1
+            else:
+                exhausted = len(task) < TASK_BATCHES
+            if task:
+                pending.append(
+                    executor.submit(
+                        write_span_batches,
+                        gj.geojson,
+                        task,
+                        args.raw,
+                        args.dry_run,
+                        args.backend,
+                        args.compress,
+                        args.level,
+                        args.format,
+                    )
+                )
+            while pending and (exhausted or len(pending) > 2 * args.jobs):
+                done += collect(pending.popleft())
+            if metrics is not None:
+                # progress follows the batches read by workers rather than the scan
+                metrics.bytes_read = read + done
+    logger.debug(f"split {count} batches with {args.jobs} jobs")
 
 
 def input_geojson(args: argparse.Namespace) -> None:
     """Entrypoint function to iter through a valid geojson document and save to multiple files"""
+    logger: logging.Logger = logging.getLogger(__name__)
+    logger.debug(f"starting splitting with geojson {args.geojson}")
+    backend: Backend = get_backend(args.backend)
+    logger.debug(f"using backend {backend.name}")
+    with ExitStack() as stack:
+        metrics: Optional[Metrics] = None
+        if args.progress or args.stats_json is not None:
+            metrics = Metrics()
+            report_metrics(args, metrics, stack)
+        gj: GeoJSONBatchStreamer = GeoJSONBatchStreamer(
+            args.geojson, use_mmap=args.mmap, backend=backend, metrics=metrics
+        )
+        split_geojson(args, gj, backend)
+
+
+def report_metrics(
+    args: argparse.Namespace, metrics: Metrics, stack: ExitStack
+) -> None:
+    """Add the hooks of `--progress` and `--stats-json`, closed along with `stack`."""
+    if args.progress:
+        metrics.add_hook(ProgressBar())
+    if args.stats_json is not None:
+        stats: Any = sys.stderr
+        if args.stats_json != "-":
+            stats = stack.enter_context(open(args.stats_json, "w"))
+        metrics.add_hook(StatsWriter(stats, interval=args.stats_interval))
+    stack.callback(metrics.close)
 
-    def gen_filename(
-        filename: Path,
-        file_count: int,
-        width: Optional[int] = None,
-        parent: Optional[Path] = None,
-    ) -> Path:
-        """Generate unique filename according to number of iterations thus far."""
-        if width is None:
-            width = 4
-        if parent is None:
-            parent = filename.parent
-        elif isinstance(parent, str):
-            parent = Path(parent)
-        suffix: str = filename.suffix
-        stem: str = filename.stem
-
-        return parent / (stem + "_x" + pad(file_count, width) + suffix)
 
+def input_geojsons(args: argparse.Namespace) -> None:
+    """
+    Entrypoint function to split many geojson documents, whose filepaths are listed in
+    `args.geojson`, and write a summary of the split, see `write_summary`.
+
+    Documents are split on their own, by a pool of `--jobs` worker processes when given,
+    or read one after the other into a single sequence of split files with
+    `--continuous`.
+    """
     logger: logging.Logger = logging.getLogger(__name__)
-    logger.debug(f"starting splitting with geojson {args.geojson}")
-    gj: GeoJSONBatchStreamer = GeoJSONBatchStreamer(args.geojson)
+    geojson_files: List[Path] = [Path(geojson_file) for geojson_file in args.geojson]
+    logger.debug(f"starting splitting {len(geojson_files)} geojson documents")
+    backend: Backend = get_backend(args.backend)
+    logger.debug(f"using backend {backend.name}")
+    sources: List[Dict[str, Any]]
+    with ExitStack() as stack:
+        # always measured, the summary is made of the metrics
+        metrics: Metrics = Metrics()
+        report_metrics(args, metrics, stack)
+        if args.continuous:
+            gj: GeoJSONMultiStreamer = GeoJSONMultiStreamer(
+                geojson_files, use_mmap=args.mmap, backend=backend, metrics=metrics
+            )
+            split_geojson(args, gj, backend)
+            sources = [
+                {
+                    "filename": str(streamer.geojson),
+                    "bytes": streamer.geojson.stat().st_size,
+                    "features": count,
+                }
+                for streamer, count in zip(gj.streamers, gj.counts)
+            ]
+        else:
+            sources = split_sources(args, geojson_files, metrics)
+
+    if args.dry_run or args.output == "-":
+        return
+    summary: Path = Path(args.output or geojson_files[0].parent) / SUMMARY_NAME
+    summary.parent.mkdir(parents=True, exist_ok=True)
+    write_summary(summary, sources, metrics, args.continuous)
+    logger.debug(f"wrote summary of {len(sources)} documents to {summary}")
+
+
+def split_sources(
+    args: argparse.Namespace, geojson_files: List[Path], metrics: Metrics
+) -> List[Dict[str, Any]]:
+    """
+    Split every document on its own, adding the metrics of every split to `metrics`.
+
+    With `--jobs`, documents are split by a pool of worker processes, each splitting
+    one document at a time sequentially. The largest documents are submitted first so
+    that the pool is not left waiting on a large document started last. Documents which
+    can not be split are logged and skipped.
+
+    Returns:
+        List[Dict[str, Any]]: The `filename`, size in `bytes`, `features` read, output
+            `files` and `bytes_written` of each document, in the order given, and the
+            `error` of those which could not be split.
+    """
+    logger: logging.Logger = logging.getLogger(__name__)
+    sizes: Dict[Path, int] = {path: path.stat().st_size for path in geojson_files}
+    metrics.total_bytes = sum(sizes.values())
+    results: Dict[Path, Union[Metrics, Exception]] = {}
+    path: Path
+    if args.jobs is not None and args.jobs > 1 and args.output != "-":
+        logger.debug(
+            f"splitting {len(geojson_files)} documents with {args.jobs} jobs, "
+            "largest first"
+        )
+        workers: int = min(args.jobs, len(geojson_files))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            tasks: Dict[Future, Path] = {
+                executor.submit(split_source, args, path): path
+                for path in sorted(geojson_files, key=sizes.get, reverse=True)
+            }
+            task: Future
+            for task in as_completed(tasks):
+                try:
+                    results[tasks[task]] = task.result()
+                except Exception as e:
+                    results[tasks[task]] = e
+                    logger.error(f"Could not split {tasks[task]}", exc_info=e)
+                else:
+                    metrics.add(results[tasks[task]])
+    else:
+        for path in geojson_files:
+            try:
+                results[path] = split_source(args, path)
+            except Exception as e:
+                results[path] = e
+                logger.error(f"Could not split {path}", exc_info=e)
+            else:
+                metrics.add(results[path])
+
+    sources: List[Dict[str, Any]] = []
+    for path in geojson_files:
+        source: Dict[str, Any] = {"filename": str(path), "bytes": sizes[path]}
+        result: Union[Metrics, Exception] = results[path]
+        if isinstance(result, Exception):
+            source["error"] = str(result)
+        else:
+            source["features"] = result.features
+            source["files"] = result.files
+            source["bytes_written"] = result.bytes_written
+        sources.append(source)
+
+    return sources
+
+
+def split_source(args: argparse.Namespace, geojson_file: Path) -> Metrics:
+    """
+    Worker function splitting one document among many, see `split_sources`.
+
+    Returns:
+        Metrics: The metrics of the split, without hooks.
+    """
+    metrics: Metrics = Metrics()
+    source_args: argparse.Namespace = argparse.Namespace(**vars(args))
+    source_args.geojson = str(geojson_file)
+    if args.jobs is not None and args.jobs > 1 and args.output != "-":
+        source_args.jobs = None  # already running in a worker process
+    gj: GeoJSONBatchStreamer = GeoJSONBatchStreamer(
+        geojson_file, use_mmap=args.mmap, backend=args.backend, metrics=metrics
+    )
+    split_geojson(source_args, gj, gj.backend)
+
+    return metrics
+
+
+def write_summary(
+    path: Path, sources: List[Dict[str, Any]], metrics: Metrics, continuous: bool
+) -> None:
+    """
+    Write the summary of a split of many documents as JSON.
+
+    Args:
+        path (Path): Filepath of the summary.
+        sources (List[Dict[str, Any]]): The `filename`, size in `bytes` and number of
+            `features` read of each document, see `split_sources`.
+        metrics (Metrics): Metrics of the whole split, from which totals are taken.
+        continuous (bool): Whether the documents were split into a single sequence of
+            files.
+    """
+    with path.open("w") as fp:
+        json.dump(
+            {
+                "continuous": continuous,
+                "documents": len(sources),
+                "bytes": sum(source["bytes"] for source in sources),
+                "features": metrics.features,
+                "files": metrics.files,
+                "bytes_written": metrics.bytes_written,
+                "sources": sources,
+            },
+            fp,
+            indent=2,
+        )
+
+
+def input_plan(args: argparse.Namespace, out: Optional[TextIO] = None) -> None:
+    """
+    Entrypoint function to print the split files a split would write, without parsing
+    or writing any feature.
+
+    Features are located by the scanner, see `GeoJSONBatchStreamer.spans`, and only
+    decoded as far as `--bbox` and `--where` need. Every file is printed on its own line
+    with its number of features and estimated size, followed by a line of totals. The
+    number of files of every split is checked against the capacity of the suffixes
+    before anything is printed.
+
+    Args:
+        args (argparse.Namespace): Parsed command line options.
+        out (Optional[TextIO], optional): Where the plan is printed. Defaults to stdout.
+    """
+    logger: logging.Logger = logging.getLogger(__name__)
+    backend: Backend = get_backend(args.backend)
+    streamers: List[Union[GeoJSONBatchStreamer, GeoJSONMultiStreamer]]
+    if not isinstance(args.geojson, list):
+        streamers = [
+            GeoJSONBatchStreamer(args.geojson, use_mmap=args.mmap, backend=backend)
+        ]
+    elif args.continuous:
+        streamers = [
+            GeoJSONMultiStreamer(args.geojson, use_mmap=args.mmap, backend=backend)
+        ]
+    else:
+        streamers = [
+            GeoJSONBatchStreamer(path, use_mmap=args.mmap, backend=backend)
+            for path in args.geojson
+        ]
+
+    width: int = args.suffix_length if args.suffix_length is not None else 4
+    rows: List[Tuple[Path, int, int]] = []
+    gj: Union[GeoJSONBatchStreamer, GeoJSONMultiStreamer]
+    for gj in streamers:
+        files: List[Tuple[int, int]] = plan_files(args, feature_sizes(args, gj))
+        if len(files) > suffix_capacity(width):
+            needed: int = width
+            while len(files) > suffix_capacity(needed):
+                needed += 1
+            logger.error(
+                f"splitting {gj.name} into {len(files)} files needs a suffix length of "
+                f"at least {needed}, increase --suffix-length"
+            )
+            return
+        i: int
+        count: int
+        size: int
+        for i, (count, size) in enumerate(files):
+            filename: Path = gen_filename(
+                output_name(args, gj), i, width=width, parent=args.output
+            )
+            rows.append((add_suffix(filename, args.compress), count, size))
+
+    if out is None:
+        out = sys.stdout
+    for filename, count, size in rows:
+        print(f"{filename}\t{count}\t{size}", file=out)
+    print(
+        f"total\t{sum(row[1] for row in rows)}\t{sum(row[2] for row in rows)}",
+        file=out,
+    )
+    logger.debug(f"planned {len(rows)} files")
+
+
+def feature_sizes(
+    args: argparse.Namespace, gj: Union[GeoJSONBatchStreamer, GeoJSONMultiStreamer]
+) -> Iterator[int]:
+    """Size in bytes of every feature to split, located without parsing features."""
+    if isinstance(gj, GeoJSONMultiStreamer):
+        return itertools.chain.from_iterable(
+            feature_sizes(args, streamer) for streamer in gj.streamers
+        )
+    filters: Dict[str, Any] = filter_kwargs(args)
+    if any(filters.values()):
+        return (len(raw) for raw in gj.raw_features(**filters))
+    if args.index and gj.seekable:
+        return (end - start for start, end in gj.index().spans())
+    return (end - start for start, end in gj.spans())
+
+
+def plan_files(args: argparse.Namespace, sizes: Iterator[int]) -> List[Tuple[int, int]]:
+    """
+    Group features into the files a split would write, by `--geometry-count` and
+    `--max-bytes`, up to `--limit` files.
+
+    Sizes of files are estimated as if features were written as they were read, before
+    compression. Columnar formats are estimated as newline delimited features.
+
+    Args:
+        args (argparse.Namespace): Parsed command line options.
+        sizes (Iterator[int]): Size in bytes of every feature, see `feature_sizes`.
+
+    Returns:
+        List[Tuple[int, int]]: The number of features and estimated size of each file.
+    """
+    sink: Sink = get_sink(args.format)
+    if not isinstance(sink, TextSink):
+        sink = NDJSONSink()
+    batch: Optional[int] = args.geometry_count
+    if batch is None and args.max_bytes is None:
+        batch = 100
+
+    files: List[Tuple[int, int]] = []
+    count: int = 0
+    size: int = sink.envelope_size
+    feature_size: int
+    for feature_size in sizes:
+        record: int = sink.record_size(feature_size, first=not count)
+        if count and (
+            (batch is not None and count >= batch)
+            or (args.max_bytes is not None and size + record > args.max_bytes)
+        ):
+            files.append((count, size))
+            if args.limit is not None and len(files) >= args.limit:
+                return files
+            count = 0
+            size = sink.envelope_size
+            record = sink.record_size(feature_size, first=True)
+        count += 1
+        size += record
+    if count:
+        files.append((count, size))
+
+    return files
+
+
+def split_geojson(
+    args: argparse.Namespace,
+    gj: Union[GeoJSONBatchStreamer, GeoJSONMultiStreamer],
+    backend: Backend,
+) -> None:
+    """Split a geojson document with the method matching the command line options."""
+    logger: logging.Logger = logging.getLogger(__name__)
+    if args.partition is not None:
+        split_by_partition(args, gj, backend)
+        return
+    if args.split_by is not None:
+        split_by_key(args, gj, backend)
+        return
+    if args.sort_by is not None:
+        split_sorted(args, gj, backend)
+        return
+    if args.max_bytes is not None:
+        split_by_size(args, gj, backend)
+        return
+    if args.resume:
+        split_resumable(args, gj, backend)
+        return
+
+    to_stdout: bool = args.output == "-"
+    use_index: bool = args.index
+    jobs: Optional[int] = None
+    filters: Dict[str, Any] = filter_kwargs(args)
+    transform: CoordinateTransform = coordinate_transform(args)
+    if not gj.seekable and (use_index or args.jobs is not None):
+        logger.debug(
+            "input is compressed, a stream or many documents, reading it sequentially"
+        )
+        use_index = False
+    elif (
+        gj.sequence
+        and (any(filters.values()) or transform)
+        and not args.raw
+        and args.jobs is not None
+        and args.jobs > 1
+    ):
+        logger.debug(f"parsing ranges of the feature sequence with {args.jobs} jobs")
+        use_index = False
+        jobs = args.jobs
+    elif any(filters.values()) and (use_index or args.jobs is not None):
+        logger.debug("filtering features while reading them sequentially")
+        use_index = False
+    elif transform and (use_index or args.jobs is not None):
+        logger.debug("transforming features while reading them sequentially")
+        use_index = False
+    elif args.jobs is not None and args.jobs > 1 and not to_stdout:
+        input_geojson_parallel(args, gj)
+        return
+
+    batches: Iterator[Union[geojson.feature.FeatureCollection, List[bytes]]]
+    if args.raw:
+        logger.debug("copying raw feature bytes without parsing")
+    if use_index:
+        batch: int = args.geometry_count if args.geometry_count is not None else 100
+        logger.debug(f"reading batches from feature index of {len(gj)} features")
+        read_slice = gj.slice_raw if args.raw else gj.slice
+        batches = (read_slice(i, i + batch) for i in range(0, len(gj), batch))
+        if gj.metrics is not None:
+            batches = gj.metrics.measure(
+                batches, len if args.raw else lambda fc: len(fc["features"])
+            )
+    elif args.raw:
+        batches = gj.stream_raw(batch=args.geometry_count, **filters)
+    else:
+        batches = gj.stream(
+            batch=args.geometry_count,
+            transform=transform or None,
+            jobs=jobs,
+            **filters,
+        )
+
+    if to_stdout:
+        split_to_stdout(args, batches, backend, gj.metrics)
+        return
+
+    with ExitStack() as stack:
+        writer_pool: Optional[WriterPool] = None
+        if args.writers is not None:
+            writer_pool = stack.enter_context(
+                WriterPool(args.writers, queue_depth=args.queue_depth)
+            )
+            logger.debug(
+                f"writing with {args.writers} writer threads and a queue depth of "
+                f"{writer_pool.queue_depth}"
+            )
+        split_batches(args, gj, batches, writer_pool, backend)
+
+
+def filter_kwargs(args: argparse.Namespace) -> Dict[str, Any]:
+    """Keyword arguments of the `--bbox` and `--where` filters of the streamer methods."""
+    return {"bbox": args.bbox, "where": args.where}
+
 
+def coordinate_transform(args: argparse.Namespace) -> CoordinateTransform:
+    """Transform of `--precision`, `--drop-z` and `--transform`, falsy if none is given."""
+    return CoordinateTransform(
+        precision=args.precision, drop_z=args.drop_z, function=args.transform
+    )
+
+
+def output_name(args: argparse.Namespace, gj: GeoJSONBatchStreamer) -> Path:
+    """
+    Name split files are derived from, with the extension of `--format`. The name of a
+    Feature Collection input is kept as is, whatever its extension.
+    """
+    if args.format == GeoJSONSink.name and not gj.sequence:
+        return gj.name
+    return gj.name.with_suffix(SINKS[args.format].suffix)
+
+
+def split_resumable(
+    args: argparse.Namespace, gj: GeoJSONBatchStreamer, backend: Backend
+) -> None:
+    """
+    Split sequentially, saving a checkpoint to resume from if the split is interrupted.
+
+    A checkpoint left by a previous run with the same input and options is resumed
+    from: the input is read from the byte offset following the last completed output
+    file, and partial files left by the interrupted run are removed. The checkpoint is
+    removed once every feature is written.
+    """
+    logger: logging.Logger = logging.getLogger(__name__)
+    if args.index or args.jobs is not None or args.writers is not None:
+        logger.debug("--resume writes batches sequentially as they are read")
+    transform: CoordinateTransform = coordinate_transform(args)
+    settings: Dict[str, Any] = {
+        "geometry_count": args.geometry_count,
+        "suffix_length": args.suffix_length,
+        "raw": args.raw,
+        "compress": args.compress,
+        "format": args.format,
+        "transform": [args.precision, args.drop_z, args.transform],
+        **filter_kwargs(args),
+    }
+    fingerprint: Dict[str, Any] = index.fingerprint(gj.geojson)
+    path: Path = partition_filename(gj.name, "checkpoint", parent=args.output)
+    path = path.with_suffix(".json")
+
+    checkpoint: Checkpoint = Checkpoint(fingerprint, settings)
+    if path.exists():
+        try:
+            checkpoint = Checkpoint.load(path)
+        except ValueError as e:
+            logger.error(f"Could not read checkpoint {path}", exc_info=e)
+            return
+        if not checkpoint.matches(fingerprint, settings):
+            logger.error(
+                f"checkpoint {path} was saved for another input or other options, "
+                "remove it to start over"
+            )
+            return
+        if checkpoint.file_count and not args.dry_run:
+            last: Path = add_suffix(
+                gen_filename(
+                    output_name(args, gj),
+                    checkpoint.file_count - 1,
+                    width=args.suffix_length,
+                    parent=args.output,
+                ),
+                args.compress,
+            )
+            if not last.exists():
+                logger.error(
+                    f"{last} saved before checkpoint {path} is missing, remove the "
+                    "checkpoint to start over"
+                )
+                return
+        logger.debug(
+            f"resuming after {checkpoint.file_count} files and "
+            f"{checkpoint.feature_count} features, from byte {checkpoint.offset}"
+        )
+    output: Path = path.parent
+    partial: Path
+    for partial in output.glob(f"{gj.name.stem}_x*{PARTIAL_SUFFIX}"):
+        logger.debug(f"removing partial file {partial} of an interrupted split")
+        partial.unlink()
+
+    sink: Sink = get_sink(args.format)
+    complete: bool = False
+    try:
+        offset: int
+        features: List[Union[bytes, memoryview]]
+        for offset, features in gj.stream_resumable(
+            batch=args.geometry_count, offset=checkpoint.offset, **filter_kwargs(args)
+        ):
+            if args.limit is not None and checkpoint.file_count >= args.limit:
+                break
+            try:
+                filename: Path = add_suffix(
+                    gen_filename(
+                        output_name(args, gj),
+                        checkpoint.file_count,
+                        width=args.suffix_length,
+                        parent=args.output,
+                    ),
+                    args.compress,
+                )
+            except TypeError as e:
+                logger.error(f"Could not generate a unique suffix.", exc_info=e)
+                return
+            if not args.dry_run:
+                if args.raw:
+                    write_features(
+                        features,
+                        filename,
+                        raw=True,
+                        backend=backend,
+                        compress=args.compress,
+                        level=args.level,
+                        sink=sink,
+                        metrics=gj.metrics,
+                    )
+                else:
+                    data: List[Dict[str, Any]] = [
+                        backend.loads(feature) for feature in features
+                    ]
+                    if transform:
+                        transform.apply(data)
+                    write_features(
+                        geojson.FeatureCollection(data),
+                        filename,
+                        backend=backend,
+                        compress=args.compress,
+                        level=args.level,
+                        sink=sink,
+                        metrics=gj.metrics,
+                    )
+            elif gj.metrics is not None:
+                gj.metrics.record_file(len(features))
+            logger.debug(f"successfully saved {len(features)} features to {filename}")
+            checkpoint.advance(offset, len(features))
+            if not args.dry_run and checkpoint.due():
+                checkpoint.save(path)
+        else:
+            complete = True
+    except IOError as e:
+        logger.error(f"Could not write features", exc_info=e)
+    finally:
+        if not args.dry_run:
+            if complete:
+                if path.exists():
+                    path.unlink()
+            elif checkpoint.file_count:
+                checkpoint.save(path)
+                logger.debug(f"saved checkpoint to {path}, run again to resume")
+
+
+def split_by_size(
+    args: argparse.Namespace,
+    gj: GeoJSONBatchStreamer,
+    backend: Backend,
+    features: Optional[Iterator[Union[bytes, memoryview]]] = None,
+) -> None:
+    """
+    Write features one at a time, starting a new file whenever the next feature would
+    make the current one larger than `--max-bytes`.
+
+    Only a single feature is held in memory at once, however large the output files are.
+    `--geometry-count` additionally caps the number of features of each file. Serialized
+    `features` are written instead of those of `gj` if given.
+    """
+    logger: logging.Logger = logging.getLogger(__name__)
+    if args.index or args.jobs is not None or args.writers is not None:
+        logger.debug("--max-bytes writes features sequentially as they are read")
+
+    sink: TextSink = get_sink(args.format)
+    metrics: Optional[Metrics] = gj.metrics
+    dumps: Callable[[Any], bytes] = backend.dumps
+    if metrics is not None:
+        dumps = metrics.timed("serialize", dumps)
+
+    def filename(count: int) -> Path:
+        return add_suffix(
+            gen_filename(
+                output_name(args, gj),
+                count,
+                width=args.suffix_length,
+                parent=args.output,
+            ),
+            args.compress,
+        )
+
+    def on_close(writer: FeatureCollectionWriter) -> None:
+        logger.debug(
+            f"successfully saved {writer.count} features ({writer.size} bytes) to "
+            f"{writer.filename}"
+        )
+        if metrics is not None:
+            metrics.record_file(writer.count, writer.size)
+
+    if features is None and args.raw:
+        logger.debug("copying raw feature bytes without parsing")
+        features = gj.raw_features(**filter_kwargs(args))
+    elif features is None:
+        features = (
+            dumps(feature)
+            for feature in gj.features(
+                transform=coordinate_transform(args) or None, **filter_kwargs(args)
+            )
+        )
+
+    with RollingWriter(
+        filename,
+        max_bytes=args.max_bytes,
+        max_features=args.geometry_count,
+        dry_run=args.dry_run,
+        compress=args.compress,
+        level=args.level,
+        on_close=on_close,
+        sink=sink,
+    ) as writer:
+        write: Callable[[Union[bytes, memoryview]], None] = writer.write
+        if metrics is not None:
+            write = metrics.timed("write", write)
+        raw: Union[bytes, memoryview]
+        for raw in features:
+            size: int = sink.envelope_size + sink.record_size(len(raw), first=True)
+            if size > args.max_bytes:
+                logger.warning(
+                    f"feature of {len(raw)} bytes is larger than --max-bytes, "
+                    "writing it to its own file"
+                )
+            if args.limit is not None and writer.file_count >= args.limit:
+                if not writer.fits(len(raw)):
+                    break
+            try:
+                write(raw)
+            except TypeError as e:
+                logger.error(f"Could not generate a unique suffix.", exc_info=e)
+                return
+            except IOError as e:
+                logger.error(f"Could not write features", exc_info=e)
+                return
+
+
+def split_sorted(
+    args: argparse.Namespace,
+    gj: Union[GeoJSONBatchStreamer, GeoJSONMultiStreamer],
+    backend: Backend,
+) -> None:
+    """
+    Sort features by `--sort-by` before splitting them, within `--memory-limit`.
+
+    Keys are computed from the raw bytes of features as they are read, and features are
+    handed to a `sort.ExternalSorter` serialized, transformed first if required. Sorted
+    runs spilled to temporary files are then merged straight into the regular writers,
+    which copy the serialized features as they are.
+    """
+    logger: logging.Logger = logging.getLogger(__name__)
+    if args.index or args.jobs is not None:
+        logger.debug("--sort-by reads features sequentially")
+    sort_key: SortKey = get_sort_key(args.sort_by)
+    logger.debug(f"sorting features by {sort_key!r}")
+    transform: CoordinateTransform = coordinate_transform(args)
+    dumps: Callable[[Any], bytes] = backend.dumps
+    if gj.metrics is not None:
+        dumps = gj.metrics.timed("serialize", dumps)
+
+    with ExitStack() as stack:
+        sorter: ExternalSorter = stack.enter_context(ExternalSorter(args.memory_limit))
+        raw_features: Iterator[Union[bytes, memoryview]] = gj.raw_features(
+            **filter_kwargs(args)
+        )
+        try:
+            while True:
+                raws: List[Union[bytes, memoryview]] = list(
+                    itertools.islice(raw_features, 1000)
+                )
+                if not raws:
+                    break
+                keys: List[Any] = [sort_key.key(raw) for raw in raws]
+                if not args.raw:
+                    # serialized the way unsorted splits are, keyed on the input
+                    data: List[Dict[str, Any]] = [backend.loads(raw) for raw in raws]
+                    if transform:
+                        transform.apply(data)
+                    raws = [dumps(feature) for feature in data]
+                key: Any
+                raw: Union[bytes, memoryview]
+                for key, raw in zip(keys, raws):
+                    sorter.add(key, raw)
+        except IOError as e:
+            logger.error(f"Could not sort features", exc_info=e)
+            return
+        logger.debug(
+            f"sorted {sorter.count} features in {len(sorter.runs) + 1} runs of at "
+            f"most {sorter.memory_limit} bytes"
+        )
+
+        # features are serialized already, whatever --raw is
+        sorted_args: argparse.Namespace = argparse.Namespace(**vars(args))
+        sorted_args.raw = True
+        features: Iterator[bytes] = sorter.sorted()
+        if args.max_bytes is not None:
+            split_by_size(sorted_args, gj, backend, features=features)
+            return
+        batch: int = args.geometry_count if args.geometry_count is not None else 100
+        batches: Iterator[List[bytes]] = iter(
+            lambda: list(itertools.islice(features, batch)), []
+        )
+        if args.output == "-":
+            split_to_stdout(sorted_args, batches, backend, gj.metrics)
+            return
+        writer_pool: Optional[WriterPool] = None
+        if args.writers is not None:
+            writer_pool = stack.enter_context(
+                WriterPool(args.writers, queue_depth=args.queue_depth)
+            )
+        split_batches(sorted_args, gj, batches, writer_pool, backend)
+
+
+def split_by_partition(
+    args: argparse.Namespace, gj: GeoJSONBatchStreamer, backend: Backend
+) -> None:
+    """
+    Write every feature to the file of its spatial partition, in a single pass.
+
+    At most `--max-open` files are kept open, see `writers.WriterCache`. A manifest of the
+    partitions is written next to them once every feature is written.
+    """
+    logger: logging.Logger = logging.getLogger(__name__)
+    if args.index or args.jobs is not None or args.writers is not None:
+        logger.debug("--partition writes features sequentially as they are read")
+    partitioner: Partitioner = get_partitioner(args.partition)
+    logger.debug(f"partitioning features with {partitioner!r}")
+
+    def filename(key: str) -> Path:
+        return add_suffix(
+            partition_filename(output_name(args, gj), key, parent=args.output),
+            args.compress,
+        )
+
+    metrics: Optional[Metrics] = gj.metrics
+    dumps: Callable[[Any], bytes] = backend.dumps
+    if metrics is not None:
+        dumps = metrics.timed("serialize", dumps)
+
+    features: Iterator[Tuple[Optional[BBox], Union[bytes, memoryview]]]
+    if args.raw:
+        logger.debug("copying raw feature bytes, scanning their bounding box unparsed")
+        features = (
+            (raw_feature_bbox(raw), raw)
+            for raw in gj.raw_features(**filter_kwargs(args))
+        )
+    else:
+        features = (
+            (feature_bbox(feature), dumps(feature))
+            for feature in gj.features(
+                transform=coordinate_transform(args) or None, **filter_kwargs(args)
+            )
+        )
+
+    bboxes: Dict[str, Optional[BBox]] = {}
+    try:
+        with WriterCache(
+            filename,
+            max_open=args.max_open,
+            dry_run=args.dry_run,
+            compress=args.compress,
+            level=args.level,
+            sink=get_sink(args.format),
+        ) as cache:
+            write: Callable[[str, Union[bytes, memoryview]], None] = cache.write
+            if metrics is not None:
+                write = metrics.timed("write", write)
+            bbox: Optional[BBox]
+            raw: Union[bytes, memoryview]
+            for bbox, raw in features:
+                key: str = partitioner.key(bbox)
+                write(key, raw)
+                bboxes[key] = merge_bbox(bboxes.get(key), bbox)
+    except IOError as e:
+        logger.error(f"Could not write partitions", exc_info=e)
+        return
+
+    partitions: List[Dict[str, Any]] = []
+    writer: FeatureCollectionWriter
+    for key, writer in cache.writers.items():
+        logger.debug(f"successfully saved {writer.count} features to {writer.filename}")
+        if metrics is not None:
+            metrics.record_file(writer.count, writer.size)
+        partitions.append(
+            {
+                "key": key,
+                "filename": writer.filename.name,
+                "count": writer.count,
+                "bbox": bboxes[key],
+            }
+        )
+    manifest: Path = partition_filename(gj.name, "manifest", parent=args.output)
+    manifest = manifest.with_suffix(".json")
+    if not args.dry_run:
+        manifest.parent.mkdir(parents=True, exist_ok=True)
+        write_manifest(manifest, partitioner, partitions)
+    logger.debug(f"wrote manifest of {len(partitions)} partitions to {manifest}")
+
+
+def split_by_key(
+    args: argparse.Namespace, gj: GeoJSONBatchStreamer, backend: Backend
+) -> None:
+    """
+    Write every feature to the file of its `--split-by` property value, in a single pass.
+
+    With `--geometry-count`, the features of each value are further split into files of
+    at most that many features, suffixed like regular splits. At most `--max-open` files
+    are kept open, see `writers.WriterCache`.
+    """
+    logger: logging.Logger = logging.getLogger(__name__)
+    if args.index or args.jobs is not None or args.writers is not None:
+        logger.debug("--split-by writes features sequentially as they are read")
+    batch: Optional[int] = args.geometry_count
+    counts: Dict[str, int] = {}
+    metrics: Optional[Metrics] = gj.metrics
+    dumps: Callable[[Any], bytes] = backend.dumps
+    if metrics is not None:
+        dumps = metrics.timed("serialize", dumps)
+
+    # files are cached by '<key>/<number>', keys never contain '/' once quoted
+    def filename(file_key: str) -> Path:
+        key, _, number = file_key.rpartition("/")
+        name: Path = partition_filename(output_name(args, gj), key, parent=args.output)
+        if batch is not None:
+            name = gen_filename(
+                name, int(number), width=args.suffix_length, parent=name.parent
+            )
+        return add_suffix(name, args.compress)
+
+    try:
+        with WriterCache(
+            filename,
+            max_open=args.max_open,
+            dry_run=args.dry_run,
+            compress=args.compress,
+            level=args.level,
+            sink=get_sink(args.format),
+        ) as cache:
+            write: Callable[[str, Union[bytes, memoryview]], None] = cache.write
+            if metrics is not None:
+                write = metrics.timed("write", write)
+            value: Any
+            feature: Union[Dict[str, Any], bytes, memoryview]
+            for value, feature in gj.stream_by(
+                args.split_by,
+                raw=args.raw,
+                transform=coordinate_transform(args) or None,
+                **filter_kwargs(args),
+            ):
+                key: str = key_to_str(value)
+                count: int = counts.get(key, 0)
+                number: int = count // batch if batch is not None else 0
+                if number and count % batch == 0:
+                    cache.finish(f"{key}/{number - 1}")  # previous file is full
+                write(f"{key}/{number}", feature if args.raw else dumps(feature))
+                counts[key] = count + 1
+    except TypeError as e:
+        logger.error(f"Could not generate a unique suffix.", exc_info=e)
+        return
+    except IOError as e:
+        logger.error(f"Could not write features", exc_info=e)
+        return
+
+    writer: FeatureCollectionWriter
+    for writer in cache.writers.values():
+        logger.debug(f"successfully saved {writer.count} features to {writer.filename}")
+        if metrics is not None:
+            metrics.record_file(writer.count, writer.size)
+    logger.debug(f"split {sum(counts.values())} features by {len(counts)} values")
+
+
+def split_to_stdout(
+    args: argparse.Namespace,
+    batches: Iterator[Union[geojson.feature.FeatureCollection, List[bytes]]],
+    backend: Backend,
+    metrics: Optional[Metrics] = None,
+) -> None:
+    """
+    Write every batch to stdout as one Feature Collection per line, or as the records
+    of a text sequence format such as `--format ndjson`. With `metrics`, every batch is
+    recorded as a file.
+    """
+    logger: logging.Logger = logging.getLogger(__name__)
+    sink: TextSink = get_sink(args.format)
+    with wrap_compressed(sys.stdout.buffer, args.compress, args.level) as fp:
+        if metrics is not None:
+            fp = TimedWriter(fp)
+        start: float = 0.0
+        size: int = 0
+        seconds: float = 0.0
+        count: int
+        features: Union[geojson.feature.FeatureCollection, List[bytes]]
+        for count, features in enumerate(batches):
+            if metrics is not None:
+                start, size, seconds = clock(), fp.bytes_written, fp.seconds
+            if not args.dry_run:
+                sink.write(fp, features, raw=args.raw, backend=backend)
+                if isinstance(sink, GeoJSONSink):
+                    fp.write(b"\n")
+            feature_count: int = (
+                len(features) if args.raw else len(features["features"])
+            )
+            if metrics is not None:
+                write: float = fp.seconds - seconds
+                metrics.record_file(
+                    feature_count,
+                    fp.bytes_written - size,
+                    serialize=clock() - start - write,
+                    write=write,
+                )
+            logger.debug(f"successfully saved {feature_count} features to stdout")
+
+            if args.limit is not None:
+                if count >= args.limit - 1:
+                    break
+
+
+def split_batches(
+    args: argparse.Namespace,
+    gj: GeoJSONBatchStreamer,
+    batches: Iterator[Union[geojson.feature.FeatureCollection, List[bytes]]],
+    writer_pool: Optional[WriterPool],
+    backend: Backend,
+) -> None:
+    """Name and save every batch, handing the writes to `writer_pool` if given."""
+    logger: logging.Logger = logging.getLogger(__name__)
+    # shared by every batch, so that columnar files get the columns of earlier ones, with
+    # types widened as needed: schemas can still differ between files, see `sinks`
+    sink: Sink = get_sink(args.format)
     count: int
-    features: geojson.feature.FeatureCollection
-    for count, features in enumerate(gj.stream(batch=args.geometry_count)):
+    features: Union[geojson.feature.FeatureCollection, List[bytes]]
+    for count, features in enumerate(batches):
         try:
             new_filename: Path = gen_filename(
-                gj.geojson, count, width=args.suffix_length, parent=args.output
+                output_name(args, gj),
+                count,
+                width=args.suffix_length,
+                parent=args.output,
             )
         except TypeError as e:
             logger.error(f"Could not generate a unique suffix.", exc_info=e)
-        try:
-            if not args.dry_run:
-                if not new_filename.parent.exists():
-                    logger.debug(f"creating output directory {args.output}")
-                    new_filename.parent.mkdir(parents=True, exist_ok=True)
-                with new_filename.open("w") as fp:
-                    json.dump(features, fp)
-            logger.debug(
-                f"successfully saved {len(features['features'])} features to {new_filename}"
+        new_filename = add_suffix(new_filename, args.compress)
+        if writer_pool is not None:
+            writer_pool.submit(
+                save_features,
+                features,
+                new_filename,
+                args.raw,
+                args.dry_run,
+                backend,
+                args.compress,
+                args.level,
+                sink,
+                gj.metrics,
+            )
+        else:
+            save_features(
+                features,
+                new_filename,
+                args.raw,
+                args.dry_run,
+                backend,
+                args.compress,
+                args.level,
+                sink,
+                gj.metrics,
             )
-        except IOError as e:
-            logger.error(f"Could not write features to {new_filename}", exc_info=e)
 
         # account for 0 based index of enumerate that is required for `pad` method.
         if args.limit is not None:
@@ -74,9 +1434,9 @@ def pad(file_count: int, width: int) -> str:
         width (int): 
     """
     logger: logging.Logger = logging.getLogger(__name__)
-    alphabet: str = "abcdefghijklmopqrstuvwxyz"
+    alphabet: str = SUFFIX_ALPHABET
 
-    if file_count >= len(alphabet) ** width:
+    if file_count >= suffix_capacity(width):
         logger.error(
             f"Suffix of width of {width} is not enough to generate a unique filename. Increase "
         )
@@ -93,6 +1453,11 @@ def pad(file_count: int, width: int) -> str:
     return "".join(char_array)
 
 
+def suffix_capacity(width: int) -> int:
+    """Number of unique suffixes of `width` characters `pad` can generate."""
+    return len(SUFFIX_ALPHABET) ** width
+
+
 def setup_logger() -> None:
     dct: Dict[str, Any] = {
         "version": 1,
@@ -122,11 +1487,97 @@ def limit_type(x):
     return x
 
 
+def backend_type(x):
+    try:
+        get_backend(x)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return x
+
+
+SIZE_UNITS: Dict[str, int] = {"k": 1 << 10, "m": 1 << 20, "g": 1 << 30}
+
+
+def partition_type(x):
+    try:
+        get_partitioner(x)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return x
+
+
+def sort_by_type(x):
+    try:
+        get_sort_key(x)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return x
+
+
+def bbox_type(x):
+    try:
+        bbox: List[float] = [float(c) for c in x.split(",")]
+        FeatureFilter(bbox=bbox)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"invalid bbox {x}, expected MINX,MINY,MAXX,MAXY"
+        )
+    return bbox
+
+
+def where_type(x):
+    try:
+        parse_condition(x)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return x
+
+
+def size_type(x):
+    number: str = x
+    unit: int = 1
+    if x and x[-1].lower() in SIZE_UNITS:
+        number = x[:-1]
+        unit = SIZE_UNITS[x[-1].lower()]
+    try:
+        size: int = int(float(number) * unit)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size {x}, expected e.g. 500K or 64M")
+    if size <= 0:
+        raise argparse.ArgumentTypeError("size must be a positive number of bytes")
+    return size
+
+
+def positive_int_type(x):
+    x = int(x)
+    if x <= 0:
+        raise argparse.ArgumentTypeError("value must be a positive integer")
+    return x
+
+
+def positive_float_type(x):
+    x = float(x)
+    if x <= 0:
+        raise argparse.ArgumentTypeError("value must be a positive number")
+    return x
+
+
 def setup_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
-        prog="geojsplit", description="Split a geojson file into many geojson files."
+        prog="geojsplit",
+        description="Split a geojson file into many geojson files.",
+        epilog="Run 'geojsplit count -h' for counting features, or 'geojsplit bench -h' "
+        "for benchmarking options.",
+    )
+    parser.add_argument(
+        "geojson",
+        nargs="+",
+        help="filename of geojson file to split, or - for stdin. gzip, bz2, xz and "
+        "zstd compressed files are decompressed on the fly, and newline delimited "
+        "geojson or geojson text sequences are detected as well. Several filenames or "
+        "glob patterns such as 'data/**/*.geojson' split every matching file, each on "
+        "its own, with --jobs files at once, and write a summary to " + SUMMARY_NAME,
     )
-    parser.add_argument("geojson", help="filename of geojson file to split")
     parser.add_argument(
         "-l",
         "--geometry-count",
@@ -140,7 +1591,10 @@ def setup_parser() -> argparse.ArgumentParser:
         help="number of characters in the suffix length for split geojsons",
     )
     parser.add_argument(
-        "-o", "--output", help="output directory to save split geojsons"
+        "-o",
+        "--output",
+        help="output directory to save split geojsons, or - to write them to stdout "
+        "as one feature collection per line",
     )
     parser.add_argument(
         "-n",
@@ -148,6 +1602,183 @@ def setup_parser() -> argparse.ArgumentParser:
         type=limit_type,
         help="limit number of split geojson file to at most LIMIT, with GEOMETRY_COUNT number of features.",
     )
+    parser.add_argument(
+        "-m",
+        "--max-bytes",
+        type=size_type,
+        help="start a new file whenever the next feature would make the current one "
+        "larger than MAX_BYTES (e.g. 500K, 64M, 1G), writing features one at a time",
+    )
+    parser.add_argument(
+        "-p",
+        "--partition",
+        type=partition_type,
+        help="write features to one file per spatial partition instead of splitting "
+        "them in order, as SCHEME or SCHEME:PARAMETER where SCHEME is grid (cell size, "
+        "default 1), quadtree (features per cell, default 10000), geohash (precision, "
+        "default 4) or tile (zoom, default 10). A manifest of the partitions is written "
+        "alongside them",
+    )
+    parser.add_argument(
+        "-s",
+        "--split-by",
+        metavar="PROPERTY",
+        help="write features to one file per value of their PROPERTY property, "
+        "further split into files of GEOMETRY_COUNT features if given",
+    )
+    parser.add_argument(
+        "--max-open",
+        type=positive_int_type,
+        help="maximum number of files open at once with --partition or --split-by "
+        "(default: 256)",
+    )
+    parser.add_argument(
+        "--sort-by",
+        type=sort_by_type,
+        metavar="ORDER",
+        help="sort features before splitting them, so that each file holds features "
+        "close to each other, by hilbert or zorder curve of the centre of their "
+        "bounding box (bits per axis, default 16) or by property:NAME. Features are "
+        "sorted within --memory-limit, spilling sorted runs to temporary files",
+    )
+    parser.add_argument(
+        "--memory-limit",
+        type=size_type,
+        help="approximate memory used to sort features with --sort-by before sorted "
+        "runs are spilled to temporary files (e.g. 64M, 1G, default: 256M)",
+    )
+    parser.add_argument(
+        "--bbox",
+        type=bbox_type,
+        metavar="MINX,MINY,MAXX,MAXY",
+        help="only keep features whose bounding box intersects this one",
+    )
+    parser.add_argument(
+        "--where",
+        type=where_type,
+        action="append",
+        metavar="CONDITION",
+        help="only keep features whose properties match CONDITION, e.g. status=active, "
+        "lanes>=2 or name!=null. Can be repeated, features must match every condition",
+    )
+    parser.add_argument(
+        "--precision",
+        type=int,
+        metavar="N",
+        help="round coordinates to N decimals",
+    )
+    parser.add_argument(
+        "--drop-z",
+        help="drop the Z value of positions, keeping only their first two dimensions",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--transform",
+        choices=list(TRANSFORMS),
+        help="reproject coordinates, from longitude and latitude to web mercator, the "
+        "other way around, or swap their first two axes",
+    )
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=list(SINKS),
+        default=GeoJSONSink.name,
+        help="format of the split files: feature collections (default), GeoJSON text "
+        "sequences, newline delimited GeoJSON, or Arrow IPC and GeoParquet tables with "
+        "WKB geometries, which require pyarrow and whose schemas are inferred per file, "
+        "so they can differ between split files",
+    )
+    parser.add_argument(
+        "-z",
+        "--compress",
+        choices=COMPRESSIONS,
+        help="compress split geojsons as they are written",
+    )
+    parser.add_argument(
+        "--level", type=int, help="compression level used with --compress"
+    )
+    parser.add_argument(
+        "-r",
+        "--raw",
+        help="copy the original bytes of each feature without parsing them",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--resume",
+        help="periodically save a checkpoint next to the split geojsons, and resume "
+        "from the checkpoint of an interrupted split with the same input and options",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--continuous",
+        help="with several input files, read them one after the other and split their "
+        "features into a single sequence of files named after the first one",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-i",
+        "--index",
+        help="read features through a sidecar index of their byte offsets, "
+        "creating it if missing or stale, so later splits do not rescan the file",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=positive_int_type,
+        help="number of worker processes used to split the geojson in parallel",
+    )
+    parser.add_argument(
+        "-b",
+        "--backend",
+        type=backend_type,
+        help="parsing and serialization backend, as PARSER, SERIALIZER or "
+        "PARSER+SERIALIZER (default: fastest available)",
+    )
+    parser.add_argument(
+        "-w",
+        "--writers",
+        type=positive_int_type,
+        help="number of threads serializing and writing files while the next batch "
+        "is parsed",
+    )
+    parser.add_argument(
+        "--queue-depth",
+        type=positive_int_type,
+        help="maximum number of batches waiting to be written when using --writers "
+        "(default: twice the number of writers)",
+    )
+    parser.add_argument(
+        "--mmap",
+        help="read the geojson through a memory mapping instead of buffered reads",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--progress",
+        help="show a progress bar with throughput and time left on stderr",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--stats-json",
+        metavar="PATH",
+        help="periodically append bytes read, features per second, batch latencies and "
+        "the time spent parsing, serializing and writing as JSON lines to PATH, or to "
+        "stderr with -",
+    )
+    parser.add_argument(
+        "--stats-interval",
+        type=positive_float_type,
+        default=5.0,
+        metavar="SECONDS",
+        help="minimum number of seconds between two lines of --stats-json (default: "
+        "%(default)s)",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        help="profile the split with cProfile and save the statistics to PATH, to be "
+        "read with python -m pstats. Worker processes are not profiled",
+    )
     parser.add_argument(
         "-v", "--verbose", help="increase output verbosity", action="store_true"
     )
@@ -157,6 +1788,13 @@ def setup_parser() -> argparse.ArgumentParser:
         help="see output without actually writing to file",
         action="store_true",
     )
+    parser.add_argument(
+        "--plan",
+        help="print the files a split would write, with their number of features and "
+        "estimated size, without parsing features or writing anything. Much faster "
+        "than --dry-run, and checks up front that --suffix-length is long enough",
+        action="store_true",
+    )
     parser.add_argument(
         "--version",
         help="show %(prog)s version number",
@@ -167,21 +1805,189 @@ def setup_parser() -> argparse.ArgumentParser:
     return parser
 
 
+def input_files(parser: argparse.ArgumentParser, patterns: List[str]) -> List[str]:
+    """Expand the input filenames and glob patterns, see `geojsplit.expand_paths`."""
+    if len(patterns) == 1 and not glob.has_magic(patterns[0]):
+        return patterns  # a single file, stdin included, is opened as is
+    if "-" in patterns:
+        parser.error("- can not be combined with other input files")
+    try:
+        return [str(path) for path in expand_paths(patterns)]
+    except FileNotFoundError as e:
+        parser.error(str(e))
+
+
+def setup_count_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="geojsplit count",
+        description="Count the features of geojson files without parsing them.",
+    )
+    parser.add_argument(
+        "geojson",
+        nargs="+",
+        help="filenames or glob patterns of geojson files to count, or - for stdin",
+    )
+    parser.add_argument(
+        "-i",
+        "--index",
+        help="read the count from the sidecar index of the file, creating it if "
+        "missing or stale",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-v", "--verbose", help="increase output verbosity", action="store_true"
+    )
+
+    return parser
+
+
+def count_main(args: List[str]) -> None:
+    """Entrypoint of `geojsplit count`, printing the number of features of every file."""
+    logger: logging.Logger = logging.getLogger(__name__)
+    parser: argparse.ArgumentParser = setup_count_parser()
+    options: argparse.Namespace = parser.parse_args(args=args)
+    if options.verbose:
+        logger.setLevel(logging.DEBUG)
+
+    geojson_files: List[str] = input_files(parser, options.geojson)
+    total: int = 0
+    geojson_file: str
+    for geojson_file in geojson_files:
+        gj: GeoJSONBatchStreamer = GeoJSONBatchStreamer(geojson_file)
+        count: int
+        if options.index and gj.seekable:
+            count = len(gj.index())
+        else:
+            count = gj.count()
+        total += count
+        print(f"{count} {geojson_file}")
+    if len(geojson_files) > 1:
+        print(f"{total} total")
+
+
 def main(args=None) -> None:
     setup_logger()
+    if args is None:
+        args = sys.argv[1:]
+    if args and args[0] == "bench":
+        bench.main(args[1:])
+        return
+
+    if args and args[0] == "count":
+        count_main(args[1:])
+        return
+
     logger: logging.Logger = logging.getLogger(__name__)
     parser: argparse.ArgumentParser = setup_parser()
     args: argparse.Namespace = parser.parse_args(args=args)
 
     if args.verbose:
         logger.setLevel(logging.DEBUG)
+    geojson_files: List[str] = input_files(parser, args.geojson)
+    if len(geojson_files) > 1:
+        args.geojson = geojson_files
+        if args.continuous and args.resume:
+            parser.error("--resume can not be used with --continuous")
+        if not args.continuous:
+            names: Dict[Tuple[Path, str], Path] = {}
+            path: Path
+            for path in map(Path, geojson_files):
+                # split files of both would share the same names
+                name: Tuple[Path, str] = (
+                    Path(args.output or path.parent),
+                    strip_suffix(path).stem,
+                )
+                if name in names:
+                    parser.error(
+                        f"{names[name]} and {path} would be split into the same files, "
+                        "use --continuous or another --output"
+                    )
+                names[name] = path
+    else:
+        args.geojson = geojson_files[0]
+    if args.compress == "zstd" and zstandard is None:
+        parser.error("--compress zstd requires the zstandard package")
+    if args.precision is not None or args.drop_z or args.transform is not None:
+        if numpy is None:
+            parser.error("--precision, --drop-z and --transform require numpy")
+        if args.raw:
+            parser.error(
+                "--precision, --drop-z and --transform can not be used with --raw"
+            )
+    if not issubclass(SINKS[args.format], TextSink):
+        if pyarrow is None:
+            parser.error(f"--format {args.format} requires the pyarrow package")
+        if args.output == "-" or args.compress is not None:
+            parser.error(
+                f"--format {args.format} can not be used with --output - or --compress"
+            )
+        if (
+            args.partition is not None
+            or args.split_by is not None
+            or args.max_bytes is not None
+        ):
+            parser.error(
+                f"--format {args.format} can not be used with --partition, --split-by "
+                "or --max-bytes"
+            )
+    if args.resume:
+        if args.output == "-" or args.geojson == "-":
+            parser.error("--resume can not be used with stdin or stdout")
+        if (
+            args.partition is not None
+            or args.split_by is not None
+            or args.max_bytes is not None
+        ):
+            parser.error(
+                "--resume can not be used with --partition, --split-by or --max-bytes"
+            )
+    if args.max_bytes is not None and args.output == "-":
+        parser.error("--max-bytes can not be used with --output -")
+    if args.partition is not None and args.output == "-":
+        parser.error("--partition can not be used with --output -")
+    if args.partition is not None and args.max_bytes is not None:
+        parser.error("--partition can not be used with --max-bytes")
+    if args.plan:
+        if (
+            args.partition is not None
+            or args.split_by is not None
+            or args.sort_by is not None
+        ):
+            parser.error(
+                "--plan can not be used with --partition, --split-by or --sort-by"
+            )
+        if args.output == "-":
+            parser.error("--plan can not be used with --output -")
+    if args.split_by is not None:
+        if args.output == "-":
+            parser.error("--split-by can not be used with --output -")
+        if args.partition is not None or args.max_bytes is not None:
+            parser.error("--split-by can not be used with --partition or --max-bytes")
+    if args.sort_by is not None:
+        if args.partition is not None or args.split_by is not None or args.resume:
+            parser.error(
+                "--sort-by can not be used with --partition, --split-by or --resume"
+            )
 
     logger.debug(f"called {__name__} with arguments:")
     for arg_name, arg_value in vars(args).items():
         if arg_value is not None:
             logger.debug(f"{arg_name}: {arg_value}")
 
-    input_geojson(args)
+    split: Callable[[argparse.Namespace], None] = input_geojson
+    if args.plan:
+        split = input_plan
+    elif isinstance(args.geojson, list):
+        split = input_geojsons
+    if args.profile is not None:
+        profiler: cProfile.Profile = cProfile.Profile()
+        try:
+            profiler.runcall(split, args)
+        finally:
+            profiler.dump_stats(args.profile)
+            logger.debug(f"saved profile to {args.profile}")
+    else:
+        split(args)
     logger.debug(f"finished splitting geojson")
 
 
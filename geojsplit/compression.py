@@ -0,0 +1,267 @@
+"""Module for transparent compression of geojson documents
+
+Compressed input is detected from its first bytes rather than its file extension, so that
+compressed data piped through stdin is handled as well. gzip, bz2 and xz are supported
+through the standard library, zstd requires the optional `zstandard` package.
+"""
+import bz2
+import gzip
+import io
+import lzma
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC: Dict[str, bytes] = {
+    "gzip": b"\x1f\x8b",
+    "bz2": b"BZh",
+    "xz": b"\xfd7zXZ\x00",
+    "zstd": b"\x28\xb5\x2f\xfd",
+}
+SUFFIXES: Dict[str, str] = {"gzip": ".gz", "bz2": ".bz2", "xz": ".xz", "zstd": ".zst"}
+COMPRESSIONS: List[str] = list(MAGIC)
+
+
+def detect(head: bytes) -> Optional[str]:
+    """Name of the compression starting with `head`, or None if uncompressed."""
+    name: str
+    magic: bytes
+    for name, magic in MAGIC.items():
+        if head.startswith(magic):
+            return name
+
+    return None
+
+
+def strip_suffix(path: Path) -> Path:
+    """Remove a compression suffix, e.g. `a.geojson.gz` becomes `a.geojson`."""
+    if path.suffix in SUFFIXES.values():
+        return path.with_suffix("")
+
+    return path
+
+
+def add_suffix(path: Path, compression: Optional[str] = None) -> Path:
+    """Append the suffix of `compression` to `path`, if any."""
+    if compression is None:
+        return path
+
+    return path.with_name(path.name + SUFFIXES[compression])
+
+
+def _require_zstandard() -> None:
+    if zstandard is None:
+        raise ValueError("zstd compression requires the zstandard package")
+
+
+class _Prepend(io.RawIOBase):
+    """Raw stream returning `head` before the rest of `fp`
+
+    Used to give back the bytes consumed while sniffing the compression of streams which
+    can not seek or peek.
+    """
+
+    def __init__(self, head: bytes, fp: BinaryIO) -> None:
+        self._head = head
+        self._fp = fp
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b: bytearray) -> int:
+        if self._head:
+            n: int = min(len(b), len(self._head))
+            b[:n] = self._head[:n]
+            self._head = self._head[n:]
+            return n
+        data: bytes = self._fp.read(len(b))
+        b[: len(data)] = data
+        return len(data)
+
+
+def sniff(fp: BinaryIO) -> Tuple[Optional[str], BinaryIO]:
+    """
+    Detect the compression of a binary stream without losing any bytes.
+
+    Args:
+        fp (BinaryIO): Binary file object positioned at the start of the document.
+
+    Returns:
+        Tuple[Optional[str], BinaryIO]: The name of the compression, or None, and a file
+            object to read the whole document from, which may be `fp` itself.
+    """
+    size: int = max(len(magic) for magic in MAGIC.values())
+    if hasattr(fp, "peek"):
+        return detect(fp.peek(size)[:size]), fp
+    head: bytes
+    head, fp = read_head(fp, size)
+
+    return detect(head), fp
+
+
+def read_head(fp: BinaryIO, size: int) -> Tuple[bytes, BinaryIO]:
+    """
+    Read the first `size` bytes of a binary stream without losing them.
+
+    Args:
+        fp (BinaryIO): Binary file object positioned at the start of the document.
+        size (int): Maximum number of bytes to read.
+
+    Returns:
+        Tuple[bytes, BinaryIO]: The bytes read, fewer than `size` only at the end of the
+            stream, and a file object to read the whole document from, which is `fp`
+            itself if it can seek.
+    """
+    position: Optional[int] = fp.tell() if fp.seekable() else None
+    head: bytes = b""
+    while len(head) < size:
+        data: bytes = fp.read(size - len(head))
+        if not data:
+            break
+        head += data
+    if position is not None:
+        fp.seek(position)
+        return head, fp
+
+    return head, io.BufferedReader(_Prepend(head, fp))
+
+
+def open_decompressed(fp: BinaryIO) -> Tuple[Optional[str], BinaryIO]:
+    """
+    Wrap a binary stream so that reading it yields decompressed bytes.
+
+    Args:
+        fp (BinaryIO): Binary file object positioned at the start of the document,
+            compressed or not.
+
+    Raises:
+        ValueError: If the stream is zstd compressed and zstandard is not installed.
+
+    Returns:
+        Tuple[Optional[str], BinaryIO]: The name of the detected compression, or None,
+            and a binary file object yielding the decompressed document.
+    """
+    compression: Optional[str]
+    compression, fp = sniff(fp)
+    if compression == "gzip":
+        return compression, gzip.GzipFile(fileobj=fp, mode="rb")
+    if compression == "bz2":
+        return compression, bz2.BZ2File(fp, mode="rb")
+    if compression == "xz":
+        return compression, lzma.LZMAFile(fp, mode="rb")
+    if compression == "zstd":
+        _require_zstandard()
+        return (
+            compression,
+            io.BufferedReader(
+                zstandard.ZstdDecompressor().stream_reader(
+                    fp, read_across_frames=True, closefd=False
+                )
+            ),
+        )
+
+    return None, fp
+
+
+def open_compressed(
+    path: Path,
+    compression: Optional[str] = None,
+    level: Optional[int] = None,
+    append: bool = False,
+) -> BinaryIO:
+    """
+    Open a file for writing, compressing everything written to it.
+
+    Args:
+        path (Path): Output filename.
+        compression (Optional[str], optional): One of `COMPRESSIONS`, or None to write
+            uncompressed bytes. Defaults to None.
+        level (Optional[int], optional): Compression level, with the meaning and range
+            of the chosen compression. Defaults to the library default.
+        append (bool, optional): Append to the end of an existing file instead of
+            truncating it. Compressed data is written as a new stream, which every
+            supported compression decompresses as a continuation of the previous ones.
+            Defaults to False.
+
+    Raises:
+        ValueError: If the compression is unknown, or zstd is asked for and zstandard is
+            not installed.
+
+    Returns:
+        BinaryIO: A binary file object, to be closed by the caller.
+    """
+    mode: str = "ab" if append else "wb"
+    if compression is None:
+        return path.open(mode)
+    if compression == "gzip":
+        return gzip.open(path, mode, compresslevel=9 if level is None else level)
+    if compression == "bz2":
+        return bz2.open(path, mode, compresslevel=9 if level is None else level)
+    if compression == "xz":
+        return lzma.open(path, mode, preset=level)
+    if compression == "zstd":
+        _require_zstandard()
+        compressor = zstandard.ZstdCompressor(level=3 if level is None else level)
+        return compressor.stream_writer(path.open(mode), closefd=True)
+    raise ValueError(f"unknown compression {compression}, choose from {COMPRESSIONS}")
+
+
+def wrap_compressed(
+    fp: BinaryIO, compression: Optional[str] = None, level: Optional[int] = None
+) -> BinaryIO:
+    """
+    Wrap an already open binary stream, such as stdout, so that writes are compressed.
+
+    Closing the returned object flushes the compressor without closing `fp`.
+
+    Args:
+        fp (BinaryIO): Binary file object to write compressed bytes to.
+        compression (Optional[str], optional): One of `COMPRESSIONS`, or None to write
+            uncompressed bytes. Defaults to None.
+        level (Optional[int], optional): Compression level. Defaults to the library
+            default.
+
+    Raises:
+        ValueError: If the compression is unknown, or zstd is asked for and zstandard is
+            not installed.
+
+    Returns:
+        BinaryIO: A binary file object, to be closed by the caller.
+    """
+    if compression is None:
+        return _Unclosed(fp)
+    if compression == "gzip":
+        return gzip.GzipFile(
+            fileobj=fp, mode="wb", compresslevel=9 if level is None else level
+        )
+    if compression == "bz2":
+        return bz2.BZ2File(fp, "wb", compresslevel=9 if level is None else level)
+    if compression == "xz":
+        return lzma.LZMAFile(fp, "wb", preset=level)
+    if compression == "zstd":
+        _require_zstandard()
+        compressor = zstandard.ZstdCompressor(level=3 if level is None else level)
+        return compressor.stream_writer(fp, closefd=False)
+    raise ValueError(f"unknown compression {compression}, choose from {COMPRESSIONS}")
+
+
+class _Unclosed(io.RawIOBase):
+    """Writable stream forwarding to `fp`, flushing instead of closing it"""
+
+    def __init__(self, fp: BinaryIO) -> None:
+        self._fp = fp
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b: bytes) -> int:
+        return self._fp.write(b)
+
+    def close(self) -> None:
+        if not self.closed:
+            self._fp.flush()
+        super().close()
@@ -0,0 +1,416 @@
+"""Module for filtering features while they are parsed
+
+Rather than building every feature and discarding those which do not match, filters are
+evaluated on the members they depend on (`properties` for property conditions, `bbox` or
+`geometry` for bounding box filters) before the rest of the feature is built:
+
+* `FeatureFilter.matches_raw` decodes only these members out of the raw bytes of a
+  feature located by the scanner, so the coordinates of rejected features are never
+  parsed. This is used whenever the document can be scanned.
+* `FeatureFilter.filter` evaluates the filter against the ijson event stream as each
+  feature is read, and skips the remaining events of rejected features unbuilt. When
+  `properties` or a precomputed `bbox` come before `geometry` in the document, the
+  coordinates of rejected features are never allocated.
+
+Property conditions are written `<name><operator><value>`, where the operator is one of
+`=`, `!=`, `<`, `<=`, `>` or `>=` and the value is parsed as JSON when possible and
+taken as a string otherwise, e.g. `status=active`, `lanes>=2` or `name!=null`.
+"""
+import json
+import operator
+import re
+from decimal import Decimal
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+import simplejson
+from ijson.common import ObjectBuilder
+
+from .partition import BBox, feature_bbox
+from .scanner import member_offsets, object_end, value_end
+
+# numbers are decoded as in `backends.Backend.loads`
+_DECODER = simplejson.JSONDecoder(parse_float=Decimal)
+
+OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<=": operator.le,
+    ">=": operator.ge,
+    "<": operator.lt,
+    ">": operator.gt,
+}
+# longest operators first, so that `<=` is not read as `<`
+_CONDITION = re.compile(r"^\s*([^=!<>]+?)\s*(!=|<=|>=|=|<|>)\s*(.*?)\s*$")
+
+Where = Callable[[Dict[str, Any]], bool]
+
+# name of a `bbox` member, or a string holding it
+_BBOX_NAME = re.compile(rb'"bbox"')
+# first two numbers of an innermost coordinates array, i.e. of a position
+_POSITION = re.compile(rb"\[\s*(-?[0-9][0-9.eE+-]*)\s*,\s*(-?[0-9][0-9.eE+-]*)")
+# name of a `coordinates` member and its separator
+_COORDINATES_NAME = re.compile(rb'"coordinates"\s*:\s*')
+_OBJECT_START = re.compile(rb"\{")
+# bytes of a coordinates array, which holds nothing but nested arrays of numbers
+_COORDINATES = re.compile(rb"[\[\]\s0-9.eE+,-]*")
+# next member of the `geometries` array of a collection, or the end of the array
+_MEMBER_GEOMETRY = re.compile(rb"[{\]]")
+
+
+def parse_condition(condition: str) -> Where:
+    """
+    Parse a property condition such as `'status=active'` into a function of properties.
+
+    Args:
+        condition (str): The condition, see the module documentation.
+
+    Raises:
+        ValueError: If the condition can not be parsed.
+
+    Returns:
+        Where: Function returning whether the properties of a feature match. Values which
+            can not be compared, or missing properties compared with an order operator,
+            do not match.
+    """
+    match = _CONDITION.match(condition)
+    if match is None:
+        raise ValueError(
+            f"invalid condition {condition}, expected e.g. 'status=active' or 'lanes>=2'"
+        )
+    name, op, text = match.groups()
+    value: Any
+    try:
+        value = json.loads(text, parse_float=Decimal)
+    except ValueError:
+        value = text
+    compare: Callable[[Any, Any], bool] = OPERATORS[op]
+
+    def where(properties: Dict[str, Any]) -> bool:
+        try:
+            return bool(compare(properties.get(name), value))
+        except TypeError:
+            return False  # e.g. None or a string ordered against a number
+
+    return where
+
+
+def where_function(where: Any) -> Optional[Where]:
+    """
+    Normalize the forms a property filter can be given in into a single function.
+
+    Args:
+        where (Any): None, a function of the properties of a feature, a dict of property
+            values which must all be equal, or one or many conditions parsed with
+            `parse_condition`, which must all match.
+
+    Raises:
+        ValueError: If a condition can not be parsed.
+
+    Returns:
+        Optional[Where]: A function of the properties of a feature, or None to keep
+            every feature.
+    """
+    if where is None or callable(where):
+        return where
+    if isinstance(where, dict):
+        expected: Dict[str, Any] = dict(where)
+        return lambda properties: all(
+            properties.get(k) == v for k, v in expected.items()
+        )
+    if isinstance(where, str):
+        where = [where]
+    conditions: List[Where] = [parse_condition(c) for c in where]
+    return lambda properties: all(condition(properties) for condition in conditions)
+
+
+def _raw_positions(
+    raw: Union[bytes, memoryview], positions: List[Tuple[bytes, bytes]]
+) -> None:
+    """Append the positions of the raw bytes of a geometry, see `raw_geometry_bbox`."""
+    offsets: Dict[bytes, int]
+    # a name followed by a colon with no object before it is a member of the geometry
+    name = _COORDINATES_NAME.search(raw)
+    if name is not None and _OBJECT_START.search(raw, 1, name.start()) is None:
+        offsets = {b"coordinates": name.end()}
+    else:
+        # members are all recorded while scanning, so those of collections are found too
+        offsets = member_offsets(raw, [b"coordinates"])
+    offset: int
+    end: int
+    if b"coordinates" in offsets:
+        offset = offsets[b"coordinates"]
+        end = _COORDINATES.match(raw, offset).end()
+        positions.extend(_POSITION.findall(raw, offset, end))
+    if b"geometries" in offsets:
+        offset = offsets[b"geometries"]
+        if raw[offset : offset + 1] != b"[":
+            return  # null geometries
+        m = _MEMBER_GEOMETRY.search(raw, offset + 1)
+        while m is not None and m.group() == b"{":
+            end = object_end(raw, m.start())
+            _raw_positions(raw[m.start() : end], positions)
+            m = _MEMBER_GEOMETRY.search(raw, end)
+
+
+def raw_geometry_bbox(raw: Union[bytes, memoryview]) -> Optional[BBox]:
+    """
+    Compute the bounding box of the raw bytes of a geometry without parsing them.
+
+    Positions are matched directly in the bytes of the `coordinates` member, or of the
+    `coordinates` of the members of `geometries` for collections, so nested coordinate
+    arrays are never built. Other members, such as a `bbox` of the geometry itself, are
+    skipped. Only the numbers of each position are converted.
+
+    Args:
+        raw (Union[bytes, memoryview]): Raw bytes of a geojson geometry.
+
+    Returns:
+        Optional[BBox]: The bounding box of the geometry, or None if it has no positions.
+    """
+    positions: List[Tuple[bytes, bytes]] = []
+    _raw_positions(raw, positions)
+    if not positions:
+        return None
+    xs: List[float] = [float(x) for x, _ in positions]
+    ys: List[float] = [float(y) for _, y in positions]
+
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def raw_feature_bbox(raw: Union[bytes, memoryview]) -> Optional[BBox]:
+    """
+    Compute the bounding box of the raw bytes of a feature, as `partition.feature_bbox`
+    does for parsed features, decoding as little of them as possible.
+
+    Only the `bbox` member is decoded when present, otherwise the positions of the
+    `geometry` member are matched with `raw_geometry_bbox`. Bare geometries are decoded
+    whole.
+
+    Args:
+        raw (Union[bytes, memoryview]): Raw bytes of a feature, as yielded by
+            `scanner.iter_raw_features`.
+
+    Returns:
+        Optional[BBox]: The bounding box of the feature, or None if it has no geometry.
+    """
+    offsets: Dict[bytes, int] = member_offsets(raw, [b"geometry"])
+    end: Optional[int] = None
+    if b"geometry" in offsets:
+        end = value_end(raw, offsets[b"geometry"])
+        # members after the geometry are only scanned when a bbox may be among them
+        if b"bbox" not in offsets and _BBOX_NAME.search(raw, end) is not None:
+            offsets = member_offsets(raw, [b"bbox", b"geometry"])
+    offset: int
+    if b"bbox" in offsets:
+        offset = offsets[b"bbox"]
+        bbox: Any = _DECODER.decode(
+            bytes(raw[offset : value_end(raw, offset)]).decode()
+        )
+        if bbox:
+            return feature_bbox({"bbox": bbox})
+    if end is not None:
+        offset = offsets[b"geometry"]
+        if raw[offset : offset + 1] != b"{":
+            return None  # null geometry
+        return raw_geometry_bbox(raw[offset:end])
+
+    return feature_bbox(_DECODER.decode(bytes(raw).decode()))
+
+
+def intersects(bbox: BBox, other: BBox) -> bool:
+    """Whether two bounding boxes intersect, including when they only touch."""
+    return (
+        bbox[0] <= other[2]
+        and other[0] <= bbox[2]
+        and bbox[1] <= other[3]
+        and other[1] <= bbox[3]
+    )
+
+
+class FeatureFilter:
+    """Bounding box and property filter which can decide on partially read features
+
+    Attributes:
+        bbox (Optional[BBox]): Features must intersect this bounding box.
+        where (Optional[Where]): Features properties must match this function.
+    """
+
+    def __init__(
+        self, bbox: Optional[Sequence[float]] = None, where: Any = None
+    ) -> None:
+        """
+        Constructor for FeatureFilter
+
+        Args:
+            bbox (Optional[Sequence[float]], optional): Minimum x, minimum y, maximum x
+                and maximum y features must intersect. Features without a geometry never
+                intersect. Defaults to None.
+            where (Any, optional): Property filter, in any of the forms accepted by
+                `where_function`. Defaults to None.
+
+        Raises:
+            ValueError: If the bounding box or a condition is invalid.
+        """
+        if bbox is not None:
+            if len(bbox) != 4 or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+                raise ValueError(f"invalid bbox {bbox}, expected minx,miny,maxx,maxy")
+            bbox = tuple(float(c) for c in bbox)
+        self.bbox: Optional[BBox] = bbox
+        self.where: Optional[Where] = where_function(where)
+
+    def __bool__(self) -> bool:
+        return self.bbox is not None or self.where is not None
+
+    def decide(
+        self, feature: Dict[str, Any], members: Set[str], complete: bool = True
+    ) -> Optional[bool]:
+        """
+        Decide whether a feature matches, from the members read so far.
+
+        Args:
+            feature (Dict[str, Any]): The feature, possibly partially built.
+            members (Set[str]): Names of the members of `feature` which are fully read.
+            complete (bool, optional): Whether the whole feature was read. Defaults to
+                True.
+
+        Returns:
+            Optional[bool]: Whether the feature matches, or None if it can not be
+                decided yet.
+        """
+        undecided: bool = False
+        if self.where is not None:
+            if complete or "properties" in members:
+                if not self.where(feature.get("properties") or {}):
+                    return False
+            else:
+                undecided = True
+        if self.bbox is not None:
+            if complete or members & {"bbox", "geometry", "coordinates", "geometries"}:
+                bbox: Optional[BBox] = feature_bbox(feature)
+                if bbox is None or not intersects(self.bbox, bbox):
+                    return False
+            else:
+                undecided = True
+
+        return None if undecided else True
+
+    def matches(self, feature: Dict[str, Any]) -> bool:
+        """Whether a fully read feature matches."""
+        return bool(self.decide(feature, set(feature)))
+
+    def matches_raw(self, raw: Union[bytes, memoryview]) -> bool:
+        """
+        Whether the raw bytes of a feature match, decoding as little of them as possible.
+
+        Property conditions only decode the `properties` member, and bounding boxes the
+        `bbox` member when present, or otherwise the positions of the `geometry` member
+        with `raw_geometry_bbox`. Features which are neither are decoded whole.
+
+        Args:
+            raw (Union[bytes, memoryview]): Raw bytes of a feature, as yielded by
+                `scanner.iter_raw_features`.
+
+        Returns:
+            bool: Whether the feature matches.
+        """
+        names: List[bytes] = []
+        if self.where is not None:
+            names.append(b"properties")
+        if self.bbox is not None:
+            names.extend([b"bbox", b"geometry"])
+        offsets: Dict[bytes, int] = member_offsets(raw, names)
+        feature: Dict[str, Any] = {}
+        name: bytes
+        for name in (b"properties", b"bbox"):
+            if name in names and name in offsets:
+                # only the bytes of the member are copied, never the coordinates
+                offset: int = offsets[name]
+                feature[name.decode()] = _DECODER.decode(
+                    bytes(raw[offset : value_end(raw, offset)]).decode()
+                )
+        decided: Optional[bool] = self.decide(feature, set(feature), complete=False)
+        if decided is not None:
+            return decided
+        if "bbox" not in feature and b"geometry" in offsets:
+            offset = offsets[b"geometry"]
+            if raw[offset : offset + 1] != b"{":
+                return False  # null geometry
+            end: int = object_end(raw, offset)
+            bbox: Optional[BBox] = raw_geometry_bbox(raw[offset:end])
+            if bbox is None or not intersects(self.bbox, bbox):
+                return False
+            return self.where is None or self.where(feature.get("properties") or {})
+
+        return self.matches(_DECODER.decode(bytes(raw).decode()))
+
+    def filter(
+        self, events: Iterator[Tuple[str, str, Any]], prefix: str
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Generator method to build the matching objects found under `prefix`.
+
+        Equivalent to filtering the output of `ijson.items(fp, prefix)`, without building
+        more of the rejected objects than needed to reject them.
+
+        Args:
+            events (Iterator[Tuple[str, str, Any]]): Events of `ijson.parse`.
+            prefix (str): ijson prefix of the objects to filter, e.g. `'features.item'`.
+
+        Yields:
+            (Iterator[Dict[str, Any]]): The next matching object.
+        """
+        depth: int = 0
+        skipping: bool = False
+        builder: Optional[ObjectBuilder] = None
+        members: Set[str] = set()
+        member: Optional[str] = None
+        decided: Optional[bool] = None
+        current: str
+        event: str
+        value: Any
+        for current, event, value in events:
+            if depth == 0:
+                if current == prefix and event == "start_map":
+                    depth = 1
+                    builder = ObjectBuilder()
+                    builder.event(event, value)
+                    members = set()
+                    member = None
+                    decided = None
+                continue
+
+            if event == "start_map" or event == "start_array":
+                depth += 1
+            elif event == "end_map" or event == "end_array":
+                depth -= 1
+            if skipping:
+                skipping = depth > 0
+                continue
+
+            builder.event(event, value)
+            if depth == 1 and event == "map_key":
+                if member is not None:
+                    members.add(member)
+                member = value
+                if decided is None:
+                    decided = self.decide(builder.value, members, complete=False)
+                    if decided is False:
+                        skipping = True  # skip the remaining members unbuilt
+                        builder = None
+            elif depth == 0:
+                if decided is None:
+                    decided = self.decide(builder.value, members | {member})
+                if decided:
+                    yield builder.value
+                builder = None
@@ -14,48 +14,590 @@ document starting at the `features` item. This assumes that a geojson is in the
         "properties
     }
 
+Sequences of features, newline delimited or separated by RS characters (RFC 8142), are
+detected from their first bytes and read feature by feature instead. Since their records
+can be told apart without parsing what comes before, they can also be split into byte
+ranges parsed in parallel by worker processes.
+
+Many documents can be streamed one after the other as if they were one, see
+`GeoJSONMultiStreamer`, so that batches carry on across documents.
+
+Streamers given a `metrics.Metrics` instance count the bytes they read and measure how
+long producing every feature or batch takes, see `metrics`.
 """
+import glob
+import io
+import mmap
+import sys
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import ExitStack, contextmanager
 from pathlib import Path
-from typing import Any, Dict, Iterator, List, Optional, Union
+from typing import (
+    IO,
+    Any,
+    BinaryIO,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
 import geojson
-import ijson
+
+from . import compression, scanner
+from .backends import Backend, get_backend
+from .filters import FeatureFilter
+from .index import FeatureIndex, sidecar_path
+from .metrics import CountingReader, Metrics
+from .transform import CoordinateTransform
+from .writers import ENVELOPE_SIZE
+
+SNIFF_SIZE: int = 1 << 16  # bytes first read to tell sequences from documents
+RANGE_SIZE: int = 1 << 24  # bytes of a sequence parsed at once by a worker process
 
 
 class GeoJSONBatchStreamer:
     """Wrapper class around ijson iterable, allowing iteration in batches
 
     Attributes:
-        geojson (Union[str, Path]): Filepath for a valid geojson document.
+        geojson (Optional[Path]): Filepath for a valid geojson document, or None when
+            reading from a file object.
+        name (Path): Filename of the document without any compression suffix, used to
+            name split files. `stdin.geojson` for file objects without a name.
+        use_mmap (bool): Whether the document is read through a memory mapping.
+        backend (Backend): Parsing backend used to decode features.
+        sequence (Optional[bool]): Whether the document is a sequence of features rather
+            than a Feature Collection, see `scanner.is_sequence`. None until a file
+            object or compressed document is first read.
+        metrics (Optional[Metrics]): Metrics updated while the document is streamed.
     """
 
-    def __init__(self, geojson: Union[str, Path]) -> None:
+    def __init__(
+        self,
+        geojson: Union[str, Path, IO],
+        use_mmap: bool = False,
+        backend: Optional[Union[str, Backend]] = None,
+        metrics: Optional[Metrics] = None,
+    ) -> None:
         """
         Constructor for GeoJSONBatchStreamer
         
         Args:
-            geojson (Union[str, Path]): Filepath for a valid geojson document. Will
-                attempt to convert to a Path object regardless of input type.
+            geojson (Union[str, Path, IO]): Filepath for a valid geojson document, `'-'`
+                for stdin, or a file object. gzip, bz2, xz and zstd compressed documents
+                are decompressed on the fly. Documents read from file objects can only be
+                streamed once, and do not support random access.
+            use_mmap (bool, optional): Read the document through a read only memory
+                mapping instead of buffered reads. Bytes are handed to ijson without
+                decoding them to text first, and `stream_raw` yields `memoryview` slices
+                of the mapping instead of copies. Documents which can not be mapped, such
+                as empty files or pipes, silently fall back to regular reads. Defaults to
+                False.
+            backend (Optional[Union[str, Backend]], optional): Name of the parsing backend,
+                see `backends.get_backend`. Defaults to the fastest available one.
+            metrics (Optional[Metrics], optional): Metrics counting the bytes read and
+                timing the features and batches yielded by the streaming methods. The
+                size of the document is added to their `total_bytes`. Defaults to
+                measuring nothing.
         
         Raises:
             FileNotFoundError: If `geojson` does not exist.
+            ValueError: If `backend` is unknown or not available.
+        """
+        self._source: Optional[IO] = None
+        self._compression: Optional[str] = None
+        self._consumed: bool = False
+        self.sequence: Optional[bool] = None
+        if isinstance(geojson, str) and geojson == "-":
+            self._source = sys.stdin.buffer
+        elif hasattr(geojson, "read"):
+            self._source = geojson
+        if self._source is not None:
+            self.geojson: Optional[Path] = None
+            name: Any = getattr(self._source, "name", None)
+            self.name: Path = compression.strip_suffix(
+                Path(name)
+                if isinstance(name, str) and not name.startswith("<")
+                else Path("stdin.geojson")
+            )
+        else:
+            self.geojson = Path(geojson)
+            if not self.geojson.exists():
+                raise FileNotFoundError(f"file {self.geojson.name} does not exist")
+            with self.geojson.open("rb") as fp:
+                self._compression, _ = compression.sniff(fp)
+                if self._compression is None:
+                    self._sniff_sequence(fp)
+            self.name = compression.strip_suffix(self.geojson)
+        self.use_mmap = use_mmap
+        self.backend = get_backend(backend)
+        self.metrics = metrics
+        if metrics is not None and self.geojson is not None:
+            size: int = self.geojson.stat().st_size
+            metrics.total_bytes = (metrics.total_bytes or 0) + size
+        self._index: Optional[FeatureIndex] = None
+
+    @property
+    def seekable(self) -> bool:
+        """Whether the document is an uncompressed file, allowing random access."""
+        return self.geojson is not None and self._compression is None
+
+    def _require_seekable(self) -> None:
+        if not self.seekable:
+            raise ValueError(
+                "random access requires an uncompressed geojson file, not a stream"
+            )
+
+    def _sniff_sequence(self, fp: BinaryIO) -> BinaryIO:
+        """Detect whether the decompressed document is a sequence, see `sequence`."""
+        sequence: Optional[bool] = None
+        size: int
+        for size in (SNIFF_SIZE, scanner.CHUNK_SIZE):
+            head: bytes
+            head, fp = compression.read_head(fp, size)
+            sequence = scanner.is_sequence(head, eof=len(head) < size)
+            if sequence is not None:
+                break
+        self.sequence = bool(sequence)
+        return fp
+
+    def _counted(self, fp: BinaryIO) -> BinaryIO:
+        """Wrap a file object to count the bytes read from it, when measuring."""
+        if self.metrics is None:
+            return fp
+        return CountingReader(fp, self.metrics)
+
+    def _measured(
+        self, items: Iterator[Any], count: Optional[Callable[[Any], int]] = None
+    ) -> Iterator[Any]:
+        """Time the items yielded to the caller when measuring, see `Metrics.measure`."""
+        if self.metrics is None:
+            return items
+        return self.metrics.measure(items, count)
+
+    def _is_text_source(self) -> bool:
+        return self._source is not None and isinstance(self._source.read(0), str)
+
+    @contextmanager
+    def _open(self) -> Iterator[BinaryIO]:
+        """Open the document for binary reads, decompressing it if needed."""
+        if self._source is None:
+            with self.geojson.open("rb") as fp:
+                _, decompressed = compression.open_decompressed(self._counted(fp))
+                with decompressed:
+                    if self.sequence is None:
+                        decompressed = self._sniff_sequence(decompressed)
+                    yield decompressed
+            return
+
+        if self._is_text_source():
+            raise ValueError("scanning raw features requires a binary file object")
+        if self._consumed:
+            raise ValueError("a file object can only be streamed once")
+        self._consumed = True
+        source: BinaryIO = self._counted(self._source)
+        self._compression, decompressed = compression.open_decompressed(source)
+        if self.sequence is None:
+            decompressed = self._sniff_sequence(decompressed)
+        try:
+            yield decompressed
+        finally:
+            if decompressed is not source:
+                decompressed.close()
+
+    @contextmanager
+    def _open_mapping(self, fp: BinaryIO) -> Iterator[Optional[mmap.mmap]]:
+        """Memory map an open document, yielding None if it can not be mapped."""
+        mapping: Optional[mmap.mmap] = None
+        if self.use_mmap and self.seekable:
+            try:
+                mapping = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                mapping = None  # empty file, pipe or otherwise not mappable
+        try:
+            yield mapping
+        finally:
+            if mapping is not None:
+                try:
+                    mapping.close()
+                except BufferError:
+                    pass  # views are still referenced, unmapped once they are released
+
+    @contextmanager
+    def _open_raw_features(
+        self, key: bytes, offset: Optional[int] = None
+    ) -> Iterator[Iterator[Tuple[int, Union[bytes, memoryview]]]]:
+        """Open the document and scan the raw features of its `key` array."""
+        with self._open() as fp, self._open_mapping(fp) as mapping:
+            if mapping is not None:
+                yield self._mapped_features(mapping, key, offset)
+            else:
+                yield scanner.iter_raw_features(
+                    fp, key, offset=offset, sequence=bool(self.sequence)
+                )
+
+    def _mapped_features(
+        self, mapping: mmap.mmap, key: bytes, offset: Optional[int] = None
+    ) -> Iterator[Tuple[int, memoryview]]:
+        """Scan the raw features of the `key` array of a mapped document."""
+        features: Iterator[Tuple[int, memoryview]] = scanner.iter_mapped_features(
+            mapping, key, offset=offset, sequence=bool(self.sequence)
+        )
+        if self.metrics is not None:
+            # pages of the mapping are read without going through `fp`
+            features = self._count_mapped(features, offset or 0)
+        return features
+
+    def _count_mapped(
+        self, features: Iterator[Tuple[int, memoryview]], position: int
+    ) -> Iterator[Tuple[int, memoryview]]:
+        """Count the bytes of a mapping scanned up to the end of every feature."""
+        start: int
+        raw: memoryview
+        for start, raw in features:
+            self.metrics.bytes_read += start + len(raw) - position
+            position = start + len(raw)
+            yield start, raw
+
+    def __len__(self) -> int:
+        """Number of features in the document, read from the feature index."""
+        return len(self.index())
+
+    def __getitem__(
+        self, i: Union[int, slice]
+    ) -> Union[Dict[str, Any], geojson.feature.FeatureCollection]:
+        """
+        Random access to a single feature, or to a Feature Collection when given a slice.
+
+        Raises:
+            IndexError: If `i` is out of range.
+            ValueError: If a slice with a step is given.
+        """
+        if isinstance(i, slice):
+            if i.step not in (None, 1):
+                raise ValueError("slices with a step are not supported")
+            return self.slice(i.start, i.stop)
+        self._require_seekable()
+        start, end = self.index()[i]
+        with self.geojson.open("rb") as fp:
+            fp.seek(start)
+            return self.backend.loads(fp.read(end - start))
+
+    def features(
+        self,
+        prefix: Optional[str] = None,
+        bbox: Optional[Sequence[float]] = None,
+        where: Any = None,
+        transform: Optional[CoordinateTransform] = None,
+        jobs: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Generator method to yield every geojson Feature of the document, one at a time.
+
+        Filters are evaluated before features are fully parsed, see `filters`. Features
+        of documents which can be scanned are rejected from their raw bytes, decoding
+        only their `properties` or `bbox` member, otherwise they are rejected from the
+        parsing events of their first members.
+
+        Args:
+            prefix (Optional[str], optional): The prefix of the element of interest in the
+                geojson document. Defaults to `'features.item'`.
+            bbox (Optional[Sequence[float]], optional): Only yield features intersecting
+                this minimum x, minimum y, maximum x and maximum y. Defaults to None.
+            where (Any, optional): Only yield features whose properties match, given as a
+                dict of values, conditions such as `'status=active'` or a function of the
+                properties, see `filters.where_function`. Defaults to None.
+            transform (Optional[CoordinateTransform], optional): Transform applied to the
+                coordinates of every feature, vectorized over batches of features.
+                Defaults to None.
+            jobs (Optional[int], optional): Number of worker processes parsing, filtering
+                and transforming the features of an uncompressed sequence in parallel,
+                each from its own byte range of the document. `where` functions must
+                then be picklable. Defaults to reading the document sequentially.
+
+        Raises:
+            ValueError: If `bbox` or `where` is invalid, or `jobs` is given for a
+                document which is not an uncompressed sequence.
+
+        Yields:
+            (Iterator[Dict[str, Any]]): The next parsed feature.
+        """
+        yield from self._measured(self._features(prefix, bbox, where, transform, jobs))
+
+    def _features(
+        self,
+        prefix: Optional[str],
+        bbox: Optional[Sequence[float]],
+        where: Any,
+        transform: Optional[CoordinateTransform],
+        jobs: Optional[int],
+    ) -> Iterator[Dict[str, Any]]:
+        """Parse every feature, see `features`, without measuring them."""
+        if jobs is not None and jobs > 1:
+            yield from self._parallel_features(jobs, bbox, where, transform)
+            return
+
+        features: Iterator[Dict[str, Any]] = self._parse_features(prefix, bbox, where)
+        if transform:
+            features = transform.apply_iter(features)
+        yield from features
+
+    def _parse_features(
+        self,
+        prefix: Optional[str],
+        bbox: Optional[Sequence[float]],
+        where: Any,
+    ) -> Iterator[Dict[str, Any]]:
+        """Parse the features under `prefix`, see `features`."""
+        if prefix is None:
+            prefix = "features.item"
+        feature_filter: FeatureFilter = FeatureFilter(bbox, where)
+        if (feature_filter or self.sequence) and not self._is_text_source():
+            try:
+                key: Optional[bytes] = scanner.key_from_prefix(prefix)
+            except ValueError:
+                key = None  # not supported by the scanner, filter parsing events
+            if key is not None:
+                raw: Union[bytes, memoryview]
+                for raw in self._raw_features(prefix, bbox, where):
+                    yield self.backend.loads(raw)
+                return
+
+        with ExitStack() as stack:
+            fp: IO
+            if self._is_text_source():
+                fp = self._source
+            elif self.seekable and not self.use_mmap and self.metrics is None:
+                fp = stack.enter_context(self.geojson.open("rb"))
+            else:
+                fp = stack.enter_context(self._open())
+                if self.sequence:  # only known once a file object is opened
+                    raw: Union[bytes, memoryview]
+                    for _, raw in scanner.iter_raw_features(fp, sequence=True):
+                        if not feature_filter or feature_filter.matches_raw(raw):
+                            yield self.backend.loads(raw)
+                    return
+            mapping: Optional[mmap.mmap] = stack.enter_context(self._open_mapping(fp))
+            source: Any = mapping if mapping is not None else fp
+            if mapping is not None and self.metrics is not None:
+                source = CountingReader(mapping, self.metrics)
+            if feature_filter:
+                yield from feature_filter.filter(self.backend.parse(source), prefix)
+            else:
+                yield from self.backend.items(source, prefix)
+
+    def _parallel_features(
+        self,
+        jobs: int,
+        bbox: Optional[Sequence[float]],
+        where: Any,
+        transform: Optional[CoordinateTransform],
+        wrap: bool = False,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Parse the features of a sequence across `jobs` worker processes, see `features`.
+
+        The document is split into byte ranges of about `RANGE_SIZE` bytes aligned to
+        record boundaries (see `scanner.record_ranges`), which workers read, filter,
+        parse and transform independently, handing back whole ranges of features. At
+        most twice `jobs` ranges are parsed ahead of the feature being yielded. With
+        `wrap`, workers also convert features into `geojson.Feature` instances, so that
+        wrapping them into Feature Collections costs nothing.
+        """
+        self._require_seekable()
+        if not self.sequence:
+            raise ValueError(
+                "parallel parsing requires a sequence of features, such as newline "
+                "delimited geojson"
+            )
+        with self.geojson.open("rb") as fp:
+            ranges: Iterator[Tuple[int, int]] = iter(
+                scanner.record_ranges(fp, RANGE_SIZE)
+            )
+
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            pending: Deque[Tuple[int, int, Future]] = deque()
+
+            def submit() -> None:
+                span: Optional[Tuple[int, int]] = next(ranges, None)
+                if span is not None:
+                    pending.append(
+                        (
+                            span[0],
+                            span[1],
+                            executor.submit(
+                                parse_range,
+                                self.geojson,
+                                span[0],
+                                span[1],
+                                self.backend.name,
+                                bbox,
+                                where,
+                                transform,
+                                wrap,
+                            ),
+                        )
+                    )
+
+            for _ in range(2 * jobs):
+                submit()
+            while pending:
+                start, end, future = pending.popleft()
+                features: List[Dict[str, Any]] = future.result()
+                submit()
+                if self.metrics is not None:
+                    self.metrics.bytes_read += end - start
+                yield from features
+
+    def raw_features(
+        self,
+        prefix: Optional[str] = None,
+        bbox: Optional[Sequence[float]] = None,
+        where: Any = None,
+    ) -> Iterator[Union[bytes, memoryview]]:
+        """
+        Generator method to yield the raw bytes of every feature, one at a time.
+
+        Filtered features are only decoded as far as needed to reject them, see
+        `filters.FeatureFilter.matches_raw`.
+
+        Args:
+            prefix (Optional[str], optional): The prefix of the element of interest in the
+                geojson document. Only prefixes of the form `'<key>.item'` are supported.
+                Defaults to `'features.item'`.
+            bbox (Optional[Sequence[float]], optional): Only yield features intersecting
+                this minimum x, minimum y, maximum x and maximum y. Defaults to None.
+            where (Any, optional): Only yield features whose properties match, given as a
+                dict of values, conditions such as `'status=active'` or a function of the
+                properties, see `filters.where_function`. Defaults to None.
+
+        Raises:
+            ValueError: If `prefix`, `bbox` or `where` is not supported or the document
+                is malformed.
+
+        Yields:
+            (Iterator[Union[bytes, memoryview]]): The raw bytes of the next feature, see
+                `stream_raw`.
+        """
+        yield from self._measured(self._raw_features(prefix, bbox, where))
+
+    def _raw_features(
+        self, prefix: Optional[str], bbox: Optional[Sequence[float]], where: Any
+    ) -> Iterator[Union[bytes, memoryview]]:
+        """Scan the raw bytes of every feature, see `raw_features`, without measuring."""
+        key: bytes = scanner.key_from_prefix(prefix)
+        feature_filter: FeatureFilter = FeatureFilter(bbox, where)
+
+        with self._open_raw_features(key) as features:
+            raw: Union[bytes, memoryview]
+            for _, raw in features:
+                if not feature_filter or feature_filter.matches_raw(raw):
+                    yield raw
+
+    def stream_by(
+        self,
+        key: Union[str, Callable[[Dict[str, Any]], Any]],
+        prefix: Optional[str] = None,
+        raw: bool = False,
+        bbox: Optional[Sequence[float]] = None,
+        where: Any = None,
+        transform: Optional[CoordinateTransform] = None,
+    ) -> Iterator[Tuple[Any, Union[Dict[str, Any], bytes, memoryview]]]:
+        """
+        Generator method to yield every feature together with the key it is routed to.
+
+        Args:
+            key (Union[str, Callable[[Dict[str, Any]], Any]]): Name of the property to
+                route features by, or a function returning the key of a parsed feature.
+            prefix (Optional[str], optional): The prefix of the element of interest in the
+                geojson document. Defaults to `'features.item'`.
+            raw (bool, optional): Yield the raw bytes of each feature instead of the parsed
+                feature. Matching features are still parsed to compute their key.
+                Defaults to False.
+            bbox (Optional[Sequence[float]], optional): Only yield features intersecting
+                this bounding box, see `features`. Defaults to None.
+            where (Any, optional): Only yield features whose properties match, see
+                `features`. Defaults to None.
+            transform (Optional[CoordinateTransform], optional): Transform applied to the
+                coordinates of every feature before computing its key, see `features`.
+                Not supported with `raw`. Defaults to None.
+
+        Raises:
+            ValueError: If both `raw` and `transform` are given.
+
+        Yields:
+            (Iterator[Tuple[Any, Union[Dict[str, Any], bytes, memoryview]]]): The key of
+                the next feature and the feature itself.
         """
-        self.geojson = Path(geojson)
-        if not self.geojson.exists():
-            raise FileNotFoundError(f"file {self.geojson.name} does not exist")
+        if isinstance(key, str):
+            key = property_key(key)
+        if raw and transform:
+            raise ValueError("raw features can not be transformed")
+
+        yield from self._measured(
+            self._stream_by(key, prefix, raw, bbox, where, transform)
+        )
+
+    def _stream_by(
+        self,
+        key: Callable[[Dict[str, Any]], Any],
+        prefix: Optional[str],
+        raw: bool,
+        bbox: Optional[Sequence[float]],
+        where: Any,
+        transform: Optional[CoordinateTransform],
+    ) -> Iterator[Tuple[Any, Union[Dict[str, Any], bytes, memoryview]]]:
+        """Route every feature, see `stream_by`, without measuring them."""
+        if raw:
+            data: Union[bytes, memoryview]
+            for data in self._raw_features(prefix, bbox, where):
+                yield key(self.backend.loads(data)), data
+            return
+
+        for feature in self._features(prefix, bbox, where, transform, None):
+            yield key(feature), feature
 
     def stream(
-        self, batch: Optional[int] = None, prefix: Optional[str] = None
+        self,
+        batch: Optional[int] = None,
+        prefix: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        bbox: Optional[Sequence[float]] = None,
+        where: Any = None,
+        transform: Optional[CoordinateTransform] = None,
+        jobs: Optional[int] = None,
     ) -> Iterator[geojson.feature.FeatureCollection]:
         """
         Generator method to yield batches of geojson Features in a Feature Collection.
         
         Args:
-            batch (Optional[int], optional): The number of features in a single batch. Defaults to 100.
+            batch (Optional[int], optional): The number of features in a single batch. Defaults to 100,
+                or to no limit when `max_bytes` is given.
             prefix (Optional[str], optional): The prefix of the element of interest in the
                 geojson document. Usually this should be `'features.item'`. Only change this if
                 you now what you are doing. See https://github.com/ICRAR/ijson for more info.
                 Defaults to `'features.item'`.
+            max_bytes (Optional[int], optional): Maximum size of a batch, measured as the
+                features serialized by `backend` within a Feature Collection written by
+                `scanner.dump_raw`. A feature larger than the limit is yielded alone.
+                Defaults to no limit.
+            bbox (Optional[Sequence[float]], optional): Only yield features intersecting
+                this bounding box, see `features`. Defaults to None.
+            where (Any, optional): Only yield features whose properties match, see
+                `features`. Defaults to None.
+            transform (Optional[CoordinateTransform], optional): Transform applied to the
+                coordinates of each batch in a single vectorized call, see
+                `transform.CoordinateTransform`. Defaults to None.
+            jobs (Optional[int], optional): Number of worker processes parsing the
+                features of a sequence in parallel, see `features`. Defaults to reading
+                the document sequentially.
         
         Yields:
             (Iterator[geojson.feature.FeatureCollection]): 
@@ -65,20 +607,662 @@ class GeoJSONBatchStreamer:
                 whatever has been gathered so far in the `data` variable to ensure all
                 features are collected.
         """
+        yield from self._measured(
+            self._stream(batch, prefix, max_bytes, bbox, where, transform, jobs),
+            lambda fc: len(fc["features"]),
+        )
+
+    def _stream(
+        self,
+        batch: Optional[int],
+        prefix: Optional[str],
+        max_bytes: Optional[int],
+        bbox: Optional[Sequence[float]],
+        where: Any,
+        transform: Optional[CoordinateTransform],
+        jobs: Optional[int],
+    ) -> Iterator[geojson.feature.FeatureCollection]:
+        """Batch features into Feature Collections, see `stream`, without measuring."""
+        if batch is None and max_bytes is None:
+            batch = 100
+
+        if max_bytes is not None:
+            # features are measured once transformed
+            features: Iterator[Dict[str, Any]] = self._features(
+                prefix, bbox, where, transform, jobs
+            )
+            data: List[Dict[str, Any]]
+            for data in _batch_by_size(
+                features, batch, max_bytes, lambda f: len(self.backend.dumps(f))
+            ):
+                yield geojson.FeatureCollection(data)
+            return
+
+        if jobs is not None and jobs > 1:
+            features = self._parallel_features(jobs, bbox, where, transform, wrap=True)
+            transform = None  # already applied by the workers
+        else:
+            features = self._parse_features(prefix, bbox, where)
+        try:
+            while True:
+                data = []
+                for _ in range(batch):
+                    data.append(next(features))
+                yield self._transformed(data, transform)
+        except StopIteration:
+            if data:
+                yield self._transformed(data, transform)  # yield remainder of data
+            return
+
+    @staticmethod
+    def _transformed(
+        data: List[Dict[str, Any]], transform: Optional[CoordinateTransform]
+    ) -> geojson.feature.FeatureCollection:
+        """Wrap a batch in a Feature Collection, transforming it first if needed."""
+        if transform:
+            transform.apply(data)
+        return geojson.FeatureCollection(data)
+
+    def stream_raw(
+        self,
+        batch: Optional[int] = None,
+        prefix: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        bbox: Optional[Sequence[float]] = None,
+        where: Any = None,
+    ) -> Iterator[List[Union[bytes, memoryview]]]:
+        """
+        Generator method to yield batches of raw, unparsed features.
+
+        Unlike `stream`, features are never decoded into python objects. Their original
+        bytes are located with a byte level scanner and can be written back out with
+        `scanner.dump_raw`, which is much faster when features do not need to be
+        inspected or modified.
+
+        Args:
+            batch (Optional[int], optional): The number of features in a single batch. Defaults to 100,
+                or to no limit when `max_bytes` is given.
+            prefix (Optional[str], optional): The prefix of the element of interest in the
+                geojson document. Only prefixes of the form `'<key>.item'` are supported.
+                Defaults to `'features.item'`.
+            max_bytes (Optional[int], optional): Maximum size of the Feature Collection
+                written by `scanner.dump_raw` for a batch. A feature larger than the limit
+                is yielded alone. Defaults to no limit.
+            bbox (Optional[Sequence[float]], optional): Only yield features intersecting
+                this bounding box, see `features`. Defaults to None.
+            where (Any, optional): Only yield features whose properties match, see
+                `features`. Defaults to None.
+
+        Raises:
+            ValueError: If `prefix` is not supported or the document is malformed.
+
+        Yields:
+            (Iterator[List[Union[bytes, memoryview]]]): The raw bytes of the next batch
+                of features. When `use_mmap` is set these are views of the mapped
+                document, which keep the mapping alive for as long as they are referenced.
+        """
+        if batch is None and max_bytes is None:
+            batch = 100
+
+        yield from self._measured(
+            _batch_by_size(
+                self._raw_features(prefix, bbox, where), batch, max_bytes, len
+            ),
+            len,
+        )
+
+    def stream_resumable(
+        self,
+        batch: Optional[int] = None,
+        prefix: Optional[str] = None,
+        offset: Optional[int] = None,
+        bbox: Optional[Sequence[float]] = None,
+        where: Any = None,
+    ) -> Iterator[Tuple[int, List[Union[bytes, memoryview]]]]:
+        """
+        Generator method to yield batches of raw features together with the byte offset
+        streaming can be resumed from once the batch is handled.
+
+        Unlike the other streaming methods, streaming can start in the middle of the
+        document: the bytes before `offset` are skipped without being scanned or parsed.
+
+        Args:
+            batch (Optional[int], optional): The number of features in a single batch.
+                Defaults to 100.
+            prefix (Optional[str], optional): The prefix of the element of interest in the
+                geojson document. Only prefixes of the form `'<key>.item'` are supported.
+                Defaults to `'features.item'`.
+            offset (Optional[int], optional): Byte offset yielded with a previous batch,
+                to resume streaming after that batch. Defaults to the first feature.
+            bbox (Optional[Sequence[float]], optional): Only yield features intersecting
+                this bounding box, see `features`. Defaults to None.
+            where (Any, optional): Only yield features whose properties match, see
+                `features`. Defaults to None.
+
+        Raises:
+            ValueError: If `prefix` is not supported or the document is malformed.
+
+        Yields:
+            (Iterator[Tuple[int, List[Union[bytes, memoryview]]]]): The byte offset right
+                after the last feature of the batch, and the raw bytes of the batch, see
+                `stream_raw`.
+        """
+        yield from self._measured(
+            self._stream_resumable(batch, prefix, offset, bbox, where),
+            lambda item: len(item[1]),
+        )
+
+    def _stream_resumable(
+        self,
+        batch: Optional[int],
+        prefix: Optional[str],
+        offset: Optional[int],
+        bbox: Optional[Sequence[float]],
+        where: Any,
+    ) -> Iterator[Tuple[int, List[Union[bytes, memoryview]]]]:
+        """Batch raw features from `offset`, see `stream_resumable`, without measuring."""
         if batch is None:
             batch = 100
-        if prefix is None:
-            prefix = "features.item"
+        if self.metrics is not None and offset and self.seekable and not self.use_mmap:
+            self.metrics.bytes_read += offset  # skipped by seeking, not reading
+        key: bytes = scanner.key_from_prefix(prefix)
+        feature_filter: FeatureFilter = FeatureFilter(bbox, where)
 
-        with self.geojson.open("r") as fp:
-            features: Iterator[Dict[str, Any]] = ijson.items(fp, prefix)
-            try:
-                while True:
-                    data: List[Dict[str, Any]] = []
-                    for _ in range(batch):
-                        data.append(next(features))
-                    yield geojson.FeatureCollection(data)
-            except StopIteration:
-                if data:
-                    yield geojson.FeatureCollection(data)  # yield remainder of data
+        with self._open_raw_features(key, offset=offset) as features:
+            data: List[Union[bytes, memoryview]] = []
+            start: int
+            raw: Union[bytes, memoryview]
+            for start, raw in features:
+                if feature_filter and not feature_filter.matches_raw(raw):
+                    continue
+                data.append(raw)
+                if len(data) >= batch:
+                    yield start + len(raw), data
+                    data = []
+            if data:
+                yield start + len(raw), data
+
+    def spans(self, prefix: Optional[str] = None) -> Iterator[Tuple[int, int]]:
+        """
+        Generator method to yield the byte range of every feature in the document.
+
+        Args:
+            prefix (Optional[str], optional): The prefix of the element of interest in the
+                geojson document. Only prefixes of the form `'<key>.item'` are supported.
+                Defaults to `'features.item'`.
+
+        Raises:
+            ValueError: If `prefix` is not supported or the document is malformed.
+
+        Yields:
+            (Iterator[Tuple[int, int]]): The start and end byte offsets of the next
+                feature, such that `document[start:end]` are its raw bytes.
+        """
+        key: bytes = scanner.key_from_prefix(prefix)
+
+        with self._open() as fp, self._open_mapping(fp) as mapping:
+            if mapping is None:
+                # features are never copied out of the buffers they are read into
+                yield from scanner.iter_spans(fp, key, sequence=bool(self.sequence))
                 return
+            offset: int
+            raw: memoryview
+            for offset, raw in self._mapped_features(mapping, key):
+                yield offset, offset + len(raw)
+
+    def count(self, prefix: Optional[str] = None) -> int:
+        """
+        Count the features of the document without parsing them.
+
+        Only the nesting depth of objects and the bounds of strings are tracked, see
+        `scanner`, so counting runs at the speed of scanning the document, and no
+        feature is ever built. The feature index is used instead when it is already
+        loaded.
+
+        Args:
+            prefix (Optional[str], optional): The prefix of the element of interest in the
+                geojson document. Only prefixes of the form `'<key>.item'` are supported.
+                Defaults to `'features.item'`.
+
+        Raises:
+            ValueError: If `prefix` is not supported or the document is malformed.
+
+        Returns:
+            int: The number of features.
+        """
+        key: bytes = scanner.key_from_prefix(prefix)
+        if self._index is not None and self._index.key == key:
+            return len(self._index)
+
+        count: int = 0
+        for _ in self.spans(prefix):
+            count += 1
+        return count
+
+    def index(
+        self, prefix: Optional[str] = None, rebuild: bool = False, save: bool = True
+    ) -> FeatureIndex:
+        """
+        Load or build the feature index of the document.
+
+        The index is first looked for in a sidecar file next to the document (see
+        `index.sidecar_path`). If it is missing, stale or was built for another prefix, the
+        document is scanned once and, unless `save` is False, the new index is saved for
+        later runs.
+
+        Args:
+            prefix (Optional[str], optional): The prefix of the element of interest in the
+                geojson document. Only prefixes of the form `'<key>.item'` are supported.
+                Defaults to `'features.item'`.
+            rebuild (bool, optional): Always scan the document. Defaults to False.
+            save (bool, optional): Save a newly built index to the sidecar file. Defaults
+                to True.
+
+        Raises:
+            ValueError: If `prefix` is not supported, the document is malformed or it is
+                not an uncompressed file.
+
+        Returns:
+            FeatureIndex: The index of the document.
+        """
+        self._require_seekable()
+        key: bytes = scanner.key_from_prefix(prefix)
+        if not rebuild and self._index is not None and self._index.key == key:
+            return self._index
+
+        path: Path = sidecar_path(self.geojson)
+        index: Optional[FeatureIndex] = None
+        if not rebuild and path.exists():
+            try:
+                index = FeatureIndex.load(path)
+            except ValueError:
+                index = None
+            if index is not None and not index.is_valid_for(self.geojson, key):
+                index = None
+        if index is None:
+            index = FeatureIndex.build(self.geojson, key, sequence=bool(self.sequence))
+            if save:
+                try:
+                    index.save(path)
+                except OSError:
+                    pass  # read only location, the index is still usable in memory
+
+        self._index = index
+        return index
+
+    def slice_raw(
+        self, start: Optional[int] = None, stop: Optional[int] = None
+    ) -> List[bytes]:
+        """
+        Read the raw bytes of features `start` to `stop` using the feature index.
+
+        Features are read with a single seek and read, without scanning the document.
+
+        Args:
+            start (Optional[int], optional): Index of the first feature. Defaults to 0.
+            stop (Optional[int], optional): Index after the last feature. Defaults to the
+                number of features.
+
+        Returns:
+            List[bytes]: The raw bytes of each feature.
+        """
+        spans: List[Tuple[int, int]] = list(self.index().spans(start, stop))
+        if not spans:
+            return []
+        with self.geojson.open("rb") as fp:
+            first: int = spans[0][0]
+            fp.seek(first)
+            buf: bytes = fp.read(spans[-1][1] - first)
+        if self.metrics is not None:
+            self.metrics.bytes_read += len(buf)
+
+        return [buf[s - first : e - first] for s, e in spans]
+
+    def slice(
+        self, start: Optional[int] = None, stop: Optional[int] = None
+    ) -> geojson.feature.FeatureCollection:
+        """
+        Read features `start` to `stop` into a Feature Collection using the feature index.
+
+        Args:
+            start (Optional[int], optional): Index of the first feature. Defaults to 0.
+            stop (Optional[int], optional): Index after the last feature. Defaults to the
+                number of features.
+
+        Returns:
+            geojson.feature.FeatureCollection: The features wrapped in a new Feature
+                Collection.
+        """
+        return geojson.FeatureCollection(
+            [self.backend.loads(raw) for raw in self.slice_raw(start, stop)]
+        )
+
+
+class GeoJSONMultiStreamer:
+    """Streamer of many geojson documents, read one after the other as a single one
+
+    Batches carry on across documents, so that every batch but the last one is full, and
+    split files are numbered in a single sequence named after the first document.
+
+    Attributes:
+        streamers (List[GeoJSONBatchStreamer]): Streamers of the documents, in the order
+            they are read.
+        counts (List[int]): Number of features yielded from each document so far.
+        backend (Backend): Parsing backend used to decode features.
+        metrics (Optional[Metrics]): Metrics updated while the documents are streamed,
+            shared by all streamers.
+    """
+
+    def __init__(
+        self,
+        geojsons: Sequence[Union[str, Path]],
+        use_mmap: bool = False,
+        backend: Optional[Union[str, Backend]] = None,
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        """
+        Constructor for GeoJSONMultiStreamer
+
+        Args:
+            geojsons (Sequence[Union[str, Path]]): Filepaths of geojson documents, or glob
+                patterns matching them, see `expand_paths`.
+            use_mmap (bool, optional): Read the documents through memory mappings, see
+                `GeoJSONBatchStreamer`. Defaults to False.
+            backend (Optional[Union[str, Backend]], optional): Name of the parsing backend,
+                see `backends.get_backend`. Defaults to the fastest available one.
+            metrics (Optional[Metrics], optional): Metrics shared by the streamers of all
+                documents, see `GeoJSONBatchStreamer`. Defaults to measuring nothing.
+
+        Raises:
+            FileNotFoundError: If a document does not exist or a pattern matches nothing.
+            ValueError: If no document is given, or `backend` is unknown or not available.
+        """
+        self.backend = get_backend(backend)
+        self.metrics = metrics
+        self.streamers: List[GeoJSONBatchStreamer] = [
+            GeoJSONBatchStreamer(path, use_mmap, self.backend, metrics)
+            for path in expand_paths(geojsons)
+        ]
+        if not self.streamers:
+            raise ValueError("at least one geojson document is required")
+        self.counts: List[int] = [0] * len(self.streamers)
+
+    @property
+    def name(self) -> Path:
+        """Filename of the first document, used to name split files."""
+        return self.streamers[0].name
+
+    @property
+    def sequence(self) -> bool:
+        """Whether every document is a sequence of features."""
+        return all(streamer.sequence for streamer in self.streamers)
+
+    @property
+    def seekable(self) -> bool:
+        """Always False, documents are only read one after the other."""
+        return False
+
+    def count(self, prefix: Optional[str] = None) -> int:
+        """Count the features of every document, see `GeoJSONBatchStreamer.count`."""
+        return sum(streamer.count(prefix) for streamer in self.streamers)
+
+    def _chain(
+        self, items: Callable[[GeoJSONBatchStreamer], Iterator[Any]]
+    ) -> Iterator[Any]:
+        """Yield the items of every document in turn, counting them in `counts`."""
+        i: int
+        streamer: GeoJSONBatchStreamer
+        for i, streamer in enumerate(self.streamers):
+            item: Any
+            for item in items(streamer):
+                self.counts[i] += 1
+                yield item
+
+    def _measured(
+        self, items: Iterator[Any], count: Optional[Callable[[Any], int]] = None
+    ) -> Iterator[Any]:
+        """Time the items yielded to the caller when measuring, see `Metrics.measure`."""
+        if self.metrics is None:
+            return items
+        return self.metrics.measure(items, count)
+
+    def features(
+        self,
+        prefix: Optional[str] = None,
+        bbox: Optional[Sequence[float]] = None,
+        where: Any = None,
+        transform: Optional[CoordinateTransform] = None,
+        jobs: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Generator method to yield every feature of every document, see
+        `GeoJSONBatchStreamer.features`. `jobs` applies to each document in turn.
+        """
+        yield from self._measured(
+            self._chain(lambda s: s._features(prefix, bbox, where, transform, jobs))
+        )
+
+    def raw_features(
+        self,
+        prefix: Optional[str] = None,
+        bbox: Optional[Sequence[float]] = None,
+        where: Any = None,
+    ) -> Iterator[Union[bytes, memoryview]]:
+        """
+        Generator method to yield the raw bytes of every feature of every document, see
+        `GeoJSONBatchStreamer.raw_features`.
+        """
+        yield from self._measured(
+            self._chain(lambda s: s._raw_features(prefix, bbox, where))
+        )
+
+    def stream_by(
+        self,
+        key: Union[str, Callable[[Dict[str, Any]], Any]],
+        prefix: Optional[str] = None,
+        raw: bool = False,
+        bbox: Optional[Sequence[float]] = None,
+        where: Any = None,
+        transform: Optional[CoordinateTransform] = None,
+    ) -> Iterator[Tuple[Any, Union[Dict[str, Any], bytes, memoryview]]]:
+        """
+        Generator method to yield every feature of every document together with the key
+        it is routed to, see `GeoJSONBatchStreamer.stream_by`.
+
+        Raises:
+            ValueError: If both `raw` and `transform` are given.
+        """
+        if isinstance(key, str):
+            key = property_key(key)
+        if raw and transform:
+            raise ValueError("raw features can not be transformed")
+
+        route: Callable[[Dict[str, Any]], Any] = key
+        yield from self._measured(
+            self._chain(
+                lambda s: s._stream_by(route, prefix, raw, bbox, where, transform)
+            )
+        )
+
+    def stream(
+        self,
+        batch: Optional[int] = None,
+        prefix: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        bbox: Optional[Sequence[float]] = None,
+        where: Any = None,
+        transform: Optional[CoordinateTransform] = None,
+        jobs: Optional[int] = None,
+    ) -> Iterator[geojson.feature.FeatureCollection]:
+        """
+        Generator method to yield batches of features in Feature Collections, batches
+        spanning documents, see `GeoJSONBatchStreamer.stream`.
+        """
+        if batch is None and max_bytes is None:
+            batch = 100
+
+        features: Iterator[Dict[str, Any]] = self._chain(
+            lambda s: s._features(prefix, bbox, where, transform, jobs)
+        )
+        yield from self._measured(
+            (
+                geojson.FeatureCollection(data)
+                for data in _batch_by_size(
+                    features, batch, max_bytes, lambda f: len(self.backend.dumps(f))
+                )
+            ),
+            lambda fc: len(fc["features"]),
+        )
+
+    def stream_raw(
+        self,
+        batch: Optional[int] = None,
+        prefix: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        bbox: Optional[Sequence[float]] = None,
+        where: Any = None,
+    ) -> Iterator[List[Union[bytes, memoryview]]]:
+        """
+        Generator method to yield batches of raw features, batches spanning documents,
+        see `GeoJSONBatchStreamer.stream_raw`.
+        """
+        if batch is None and max_bytes is None:
+            batch = 100
+
+        yield from self._measured(
+            _batch_by_size(
+                self._chain(lambda s: s._raw_features(prefix, bbox, where)),
+                batch,
+                max_bytes,
+                len,
+            ),
+            len,
+        )
+
+
+def expand_paths(patterns: Sequence[Union[str, Path]]) -> List[Path]:
+    """
+    Expand filepaths and glob patterns into the files they name.
+
+    Patterns are expanded with `glob.glob`, `**` matching any number of directories, and
+    their matches sorted. Files named more than once are only listed the first time.
+
+    Args:
+        patterns (Sequence[Union[str, Path]]): Filepaths or glob patterns.
+
+    Raises:
+        FileNotFoundError: If a filepath does not exist or a pattern matches no file.
+
+    Returns:
+        List[Path]: The files, in the order they are named.
+    """
+    paths: List[Path] = []
+    seen: Set[Path] = set()
+    pattern: Union[str, Path]
+    for pattern in patterns:
+        matches: List[Path]
+        if glob.has_magic(str(pattern)):
+            matches = [
+                Path(match)
+                for match in sorted(glob.glob(str(pattern), recursive=True))
+                if Path(match).is_file()
+            ]
+            if not matches:
+                raise FileNotFoundError(f"no file matches {pattern}")
+        else:
+            matches = [Path(pattern)]
+            if not matches[0].exists():
+                raise FileNotFoundError(f"file {matches[0].name} does not exist")
+        path: Path
+        for path in matches:
+            if path.resolve() not in seen:
+                seen.add(path.resolve())
+                paths.append(path)
+
+    return paths
+
+
+def property_key(name: str) -> Callable[[Dict[str, Any]], Any]:
+    """Return a key function reading property `name` of a feature, None if missing."""
+
+    def key(feature: Dict[str, Any]) -> Any:
+        return (feature.get("properties") or {}).get(name)
+
+    return key
+
+
+def parse_range(
+    geojson_file: Path,
+    start: int,
+    end: int,
+    backend: Optional[str] = None,
+    bbox: Optional[Sequence[float]] = None,
+    where: Any = None,
+    transform: Optional[CoordinateTransform] = None,
+    wrap: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Worker function parsing the features of a byte range of a sequence.
+
+    Args:
+        geojson_file (Path): Filepath of the sequence.
+        start (int): Byte offset of the range, at a record boundary.
+        end (int): Byte offset after the range, at a record boundary.
+        backend (Optional[str], optional): Name of the parsing backend. Defaults to the
+            fastest available one.
+        bbox (Optional[Sequence[float]], optional): Only keep features intersecting this
+            bounding box. Defaults to None.
+        where (Any, optional): Only keep features whose properties match. Defaults to
+            None.
+        transform (Optional[CoordinateTransform], optional): Transform applied to the
+            coordinates of the features. Defaults to None.
+        wrap (bool, optional): Convert the features into `geojson.Feature` instances, as
+            done when wrapping them into a Feature Collection. Defaults to False.
+
+    Returns:
+        List[Dict[str, Any]]: The matching features of the range, in order.
+    """
+    resolved_backend: Backend = get_backend(backend)
+    feature_filter: FeatureFilter = FeatureFilter(bbox, where)
+    with geojson_file.open("rb") as fp:
+        fp.seek(start)
+        buf: bytes = fp.read(end - start)
+    features: List[Dict[str, Any]] = []
+    raw: bytes
+    for _, raw in scanner.iter_raw_features(io.BytesIO(buf), sequence=True):
+        if not feature_filter or feature_filter.matches_raw(raw):
+            features.append(resolved_backend.loads(raw))
+    if transform:
+        transform.apply(features)
+    if wrap:
+        return geojson.FeatureCollection(features)["features"]
+
+    return features
+
+
+def _batch_by_size(
+    items: Iterator[Any],
+    batch: Optional[int],
+    max_bytes: Optional[int],
+    size: Callable[[Any], int],
+) -> Iterator[List[Any]]:
+    """
+    Group items into lists of at most `batch` items, whose total size, once written as a
+    Feature Collection, stays within `max_bytes` whenever possible.
+    """
+    data: List[Any] = []
+    data_size: int = ENVELOPE_SIZE
+    item: Any
+    for item in items:
+        item_size: int = size(item) if max_bytes is not None else 0
+        if data and (
+            (batch is not None and len(data) >= batch)
+            or (max_bytes is not None and data_size + 1 + item_size > max_bytes)
+        ):
+            yield data
+            data = []
+            data_size = ENVELOPE_SIZE
+        data_size += item_size + (1 if data else 0)
+        data.append(item)
+    if data:
+        yield data  # yield remainder of data
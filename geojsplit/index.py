@@ -0,0 +1,213 @@
+"""Module for persistent feature offset indexes
+
+A `FeatureIndex` holds the start and end byte offsets of every feature of a geojson
+document in two packed arrays. Once built, it is saved next to the document as a sidecar
+file so that later runs can seek straight to any feature without scanning the document
+again. The index is keyed by a fingerprint of the document (size, modification time and a
+hash of its first and last bytes) so that a stale sidecar is detected and rebuilt.
+
+The sidecar layout is
+
+::
+
+    GJSPLIDX                   8 byte magic
+    <header length>            unsigned 32 bit little endian integer
+    {"version": 1, ...}        JSON header with the key, fingerprint and feature count
+    <starts>                   feature count unsigned 64 bit little endian integers
+    <ends>                     feature count unsigned 64 bit little endian integers
+
+"""
+import hashlib
+import json
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from . import scanner
+
+MAGIC: bytes = b"GJSPLIDX"
+VERSION: int = 1
+SAMPLE_SIZE: int = 1 << 16
+
+
+def sidecar_path(geojson: Path) -> Path:
+    """Return the default sidecar index path for a geojson document."""
+    return geojson.with_name(geojson.name + ".idx")
+
+
+def fingerprint(geojson: Path) -> Dict[str, Any]:
+    """
+    Compute a cheap fingerprint of a geojson document.
+
+    Hashing the whole document would cost as much as scanning it, so only the first and
+    last `SAMPLE_SIZE` bytes are hashed, together with the size and modification time.
+
+    Args:
+        geojson (Path): Filepath of the geojson document.
+
+    Returns:
+        Dict[str, Any]: The size, modification time and sample hash of the document.
+    """
+    stat = geojson.stat()
+    digest = hashlib.blake2b(digest_size=16)
+    with geojson.open("rb") as fp:
+        digest.update(fp.read(SAMPLE_SIZE))
+        if stat.st_size > SAMPLE_SIZE:
+            fp.seek(max(SAMPLE_SIZE, stat.st_size - SAMPLE_SIZE))
+            digest.update(fp.read(SAMPLE_SIZE))
+
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "hash": digest.hexdigest(),
+    }
+
+
+class FeatureIndex:
+    """Packed start and end byte offsets of every feature of a geojson document
+
+    Attributes:
+        key (bytes): Top level key of the indexed array, usually `b'features'`.
+        fingerprint (Dict[str, Any]): Fingerprint of the indexed document.
+        starts (array): Start byte offset of every feature.
+        ends (array): End byte offset of every feature.
+    """
+
+    def __init__(
+        self,
+        key: bytes,
+        fingerprint: Dict[str, Any],
+        starts: Optional[array] = None,
+        ends: Optional[array] = None,
+    ) -> None:
+        self.key = key
+        self.fingerprint = fingerprint
+        self.starts = starts if starts is not None else array("Q")
+        self.ends = ends if ends is not None else array("Q")
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, i: int) -> Tuple[int, int]:
+        """Return the start and end byte offsets of feature `i`."""
+        return self.starts[i], self.ends[i]
+
+    def spans(
+        self, start: Optional[int] = None, stop: Optional[int] = None
+    ) -> Iterator[Tuple[int, int]]:
+        """Generator method to yield the byte offsets of features `start` to `stop`."""
+        i: int
+        for i in range(*slice(start, stop).indices(len(self))):
+            yield self.starts[i], self.ends[i]
+
+    def is_valid_for(self, geojson: Path, key: bytes) -> bool:
+        """Whether this index was built from the current state of `geojson` and `key`."""
+        return self.key == key and self.fingerprint == fingerprint(geojson)
+
+    @classmethod
+    def build(
+        cls, geojson: Path, key: Optional[bytes] = None, sequence: bool = False
+    ) -> "FeatureIndex":
+        """
+        Build an index by scanning a geojson document once.
+
+        Args:
+            geojson (Path): Filepath of the geojson document.
+            key (Optional[bytes], optional): Top level key of the array to index.
+                Defaults to `b'features'`.
+            sequence (bool, optional): Index the features of a sequence instead, see
+                `scanner.is_sequence`. Defaults to False.
+
+        Raises:
+            ValueError: If the document is malformed.
+
+        Returns:
+            FeatureIndex: The new index.
+        """
+        if key is None:
+            key = b"features"
+        index: FeatureIndex = cls(key, fingerprint(geojson))
+        with geojson.open("rb") as fp:
+            start: int
+            end: int
+            for start, end in scanner.iter_spans(fp, key, sequence=sequence):
+                index.starts.append(start)
+                index.ends.append(end)
+
+        return index
+
+    def save(self, path: Path) -> None:
+        """
+        Save the index to a sidecar file.
+
+        The index is written to a temporary file first and renamed, so that a partially
+        written index is never picked up.
+
+        Args:
+            path (Path): Filepath of the sidecar index.
+        """
+        header: bytes = json.dumps(
+            {
+                "version": VERSION,
+                "key": self.key.decode("utf-8"),
+                "fingerprint": self.fingerprint,
+                "count": len(self),
+            }
+        ).encode("utf-8")
+        tmp: Path = path.with_name(path.name + ".tmp")
+        with tmp.open("wb") as fp:
+            fp.write(MAGIC)
+            fp.write(struct.pack("<I", len(header)))
+            fp.write(header)
+            offsets: array
+            for offsets in (self.starts, self.ends):
+                if sys.byteorder == "big":
+                    offsets = array("Q", offsets)
+                    offsets.byteswap()
+                offsets.tofile(fp)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "FeatureIndex":
+        """
+        Load an index from a sidecar file.
+
+        Args:
+            path (Path): Filepath of the sidecar index.
+
+        Raises:
+            ValueError: If the file is not a sidecar index of a supported version.
+
+        Returns:
+            FeatureIndex: The loaded index.
+        """
+        with path.open("rb") as fp:
+            if fp.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"file {path.name} is not a geojsplit index")
+            length: bytes = fp.read(4)
+            if len(length) < 4:
+                raise ValueError(f"index {path.name} is truncated")
+            (header_length,) = struct.unpack("<I", length)
+            data: bytes = fp.read(header_length)
+            if len(data) < header_length:
+                raise ValueError(f"index {path.name} is truncated")
+            header: Dict[str, Any] = json.loads(data)
+            if header.get("version") != VERSION:
+                raise ValueError(
+                    f"unsupported index version {header.get('version')} in {path.name}"
+                )
+            index: FeatureIndex = cls(
+                header["key"].encode("utf-8"), header["fingerprint"]
+            )
+            try:
+                index.starts.fromfile(fp, header["count"])
+                index.ends.fromfile(fp, header["count"])
+            except EOFError as e:
+                raise ValueError(f"index {path.name} is truncated") from e
+        if sys.byteorder == "big":
+            index.starts.byteswap()
+            index.ends.byteswap()
+
+        return index
@@ -0,0 +1,545 @@
+"""Module for measuring the progress and throughput of a split
+
+A `Metrics` instance given to `GeoJSONBatchStreamer` counts the bytes read from the
+document through `CountingReader`, the features and batches it produces, and the time
+spent producing them. The command line tool adds the files and bytes written, and how
+long serializing and writing them took. Time is split into three stages:
+
+- parse: producing the next feature or batch from the document, which includes reading,
+  decompressing, filtering, parsing and transforming it.
+- serialize: turning features into the bytes of an output file.
+- write: writing those bytes, compressing them if needed.
+
+The time taken by every batch is recorded in a `Histogram` of batch latencies. Hooks
+added with `Metrics.add_hook` are called with the name of an event and the metrics after
+every batch (`'batch'`), every output file (`'file'`), every split merged with `add`,
+such as the split of one of many documents by a worker process (`'source'`), and once
+the split is over (`'close'`). `ProgressBar` and `StatsWriter` are such hooks.
+
+Nothing is measured without a `Metrics` instance: documents are read through their file
+objects directly and no clock is read, so splits which are not measured do not pay for
+it.
+"""
+import json
+import sys
+import threading
+import time
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    TextIO,
+    Tuple,
+)
+
+STAGES: List[str] = ["parse", "serialize", "write"]
+EVENTS: List[str] = ["batch", "file", "source", "close"]
+# features measured one at a time are reported in groups of this many, as one batch
+REPORT_SIZE: int = 1000
+
+Hook = Callable[[str, "Metrics"], None]
+
+clock: Callable[[], float] = time.perf_counter
+
+
+class Histogram:
+    """Histogram of durations in buckets of powers of two
+
+    Attributes:
+        bounds (List[float]): Upper bound of every bucket in seconds, from 1 millisecond
+            to about 33 seconds. Longer durations fall in an extra last bucket.
+        counts (List[int]): Number of durations in every bucket.
+        count (int): Number of durations recorded.
+        total (float): Sum of the durations recorded.
+        min (Optional[float]): Shortest duration recorded.
+        max (Optional[float]): Longest duration recorded.
+    """
+
+    def __init__(self) -> None:
+        self.bounds: List[float] = [0.001 * 2 ** i for i in range(16)]
+        self.counts: List[int] = [0] * (len(self.bounds) + 1)
+        self.count: int = 0
+        self.total: float = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def add(self, seconds: float) -> None:
+        """Record a duration."""
+        i: int = 0
+        while i < len(self.bounds) and seconds > self.bounds[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def merge(self, other: "Histogram") -> None:
+        """Add the durations recorded by another histogram."""
+        self.counts = [n + m for n, m in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        if other.max is not None:
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Approximate quantile `q` of the durations, between 0 and 1.
+
+        Returns:
+            Optional[float]: Upper bound of the bucket holding the quantile, capped by
+                the longest duration, or None if no duration was recorded.
+        """
+        if not self.count:
+            return None
+        rank: float = q * self.count
+        seen: int = 0
+        i: int
+        n: int
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                if i < len(self.bounds):
+                    return min(self.bounds[i], self.max)
+                break
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Summary of the histogram, with the counts of the non empty buckets as pairs of
+        their upper bound, None for the last one, and their count.
+        """
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "buckets": [
+                [self.bounds[i] if i < len(self.bounds) else None, n]
+                for i, n in enumerate(self.counts)
+                if n
+            ],
+        }
+
+
+class Metrics:
+    """Counters and timings of a split, reported to hooks as they change
+
+    Counters are updated from the thread reading the document, except for files which
+    may be recorded by writer threads, see `record_file`.
+
+    Attributes:
+        total_bytes (Optional[int]): Size of the documents read, on disk, or None when
+            unknown, e.g. for stdin.
+        bytes_read (int): Bytes read from the documents so far, before decompression.
+        features (int): Features produced by the streamer.
+        batches (int): Batches produced by the streamer. Features produced one at a time
+            count as a batch every `REPORT_SIZE` features.
+        files (int): Output files written.
+        features_written (int): Features written to output files.
+        bytes_written (int): Bytes written to output files, before compression.
+        timings (Dict[str, float]): Seconds spent in each of `STAGES`.
+        latencies (Histogram): Seconds taken to produce every batch.
+        hooks (List[Hook]): Functions called with the name of an event and the metrics.
+        started (float): Value of `clock` when the metrics were created.
+    """
+
+    def __init__(
+        self, total_bytes: Optional[int] = None, hooks: Optional[List[Hook]] = None
+    ) -> None:
+        """
+        Constructor for Metrics
+
+        Args:
+            total_bytes (Optional[int], optional): Size of the documents which will be
+                read. Streamers add the size of their document when given the metrics.
+                Defaults to None.
+            hooks (Optional[List[Hook]], optional): Hooks to call on every event.
+                Defaults to None.
+        """
+        self.total_bytes = total_bytes
+        self.bytes_read: int = 0
+        self.features: int = 0
+        self.batches: int = 0
+        self.files: int = 0
+        self.features_written: int = 0
+        self.bytes_written: int = 0
+        self.timings: Dict[str, float] = {stage: 0.0 for stage in STAGES}
+        self.latencies: Histogram = Histogram()
+        self.hooks: List[Hook] = list(hooks or [])
+        self.started: float = clock()
+        self._lock = threading.RLock()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """Pickle the counters and timings only, e.g. to return them from a worker."""
+        state: Dict[str, Any] = dict(self.__dict__)
+        del state["_lock"]
+        state["hooks"] = []
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    def add_hook(self, hook: Hook) -> None:
+        """Call `hook(event, metrics)` on every event, see `EVENTS`."""
+        self.hooks.append(hook)
+
+    def emit(self, event: str) -> None:
+        """Call every hook with `event`, one at a time."""
+        with self._lock:
+            hook: Hook
+            for hook in self.hooks:
+                hook(event, self)
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the metrics were created."""
+        return clock() - self.started
+
+    @property
+    def features_per_second(self) -> float:
+        elapsed: float = self.elapsed
+        return self.features / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        elapsed: float = self.elapsed
+        return self.bytes_read / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def progress(self) -> Optional[float]:
+        """Fraction of `total_bytes` read so far, or None if unknown."""
+        if not self.total_bytes:
+            return None
+        return min(1.0, self.bytes_read / self.total_bytes)
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Estimated seconds until every byte is read, at the current throughput."""
+        rate: float = self.bytes_per_second
+        if not self.total_bytes or not rate:
+            return None
+        return max(0.0, (self.total_bytes - self.bytes_read) / rate)
+
+    def record_batch(self, count: int, seconds: Optional[float] = None) -> None:
+        """
+        Record a batch of `count` features produced in `seconds`, and notify hooks.
+
+        Batches produced by worker processes, whose timings are not known, are recorded
+        without `seconds`.
+        """
+        with self._lock:
+            self.features += count
+            self.batches += 1
+            if seconds is not None:
+                self.timings["parse"] += seconds
+                self.latencies.add(seconds)
+            self.emit("batch")
+
+    def record_file(
+        self, count: int, size: int = 0, serialize: float = 0.0, write: float = 0.0
+    ) -> None:
+        """
+        Record an output file, and notify hooks. Safe to call from any thread.
+
+        Args:
+            count (int): Number of features of the file.
+            size (int, optional): Size of the file before compression, in bytes.
+                Defaults to 0, when unknown.
+            serialize (float, optional): Seconds spent serializing the features of the
+                file. Defaults to 0.
+            write (float, optional): Seconds spent writing the file. Defaults to 0.
+        """
+        with self._lock:
+            self.files += 1
+            self.features_written += count
+            self.bytes_written += size
+            self.timings["serialize"] += serialize
+            self.timings["write"] += write
+            self.emit("file")
+
+    def add(self, other: "Metrics") -> None:
+        """
+        Add the counters and timings of another split, e.g. of one document among many
+        split by a worker process, and notify hooks of a `'source'` event. The size of
+        its documents is left out of `total_bytes`, which is expected to include it.
+        """
+        with self._lock:
+            self.bytes_read += other.bytes_read
+            self.features += other.features
+            self.batches += other.batches
+            self.files += other.files
+            self.features_written += other.features_written
+            self.bytes_written += other.bytes_written
+            stage: str
+            for stage in STAGES:
+                self.timings[stage] += other.timings[stage]
+            self.latencies.merge(other.latencies)
+            self.emit("source")
+
+    def timed(self, stage: str, function: Callable[..., Any]) -> Callable[..., Any]:
+        """
+        Wrap `function` to add the time spent in every call to the timing of `stage`.
+
+        Meant for functions called once per feature from a single thread, such as
+        serializing or writing features one at a time, so no lock is taken.
+        """
+
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            start: float = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.timings[stage] += clock() - start
+
+        return wrapper
+
+    def measure(
+        self, items: Iterator[Any], count: Optional[Callable[[Any], int]] = None
+    ) -> Iterator[Any]:
+        """
+        Generator method to yield `items`, recording the time taken to produce each one.
+
+        Args:
+            items (Iterator[Any]): Batches, or single features when `count` is None.
+            count (Optional[Callable[[Any], int]], optional): Function returning the
+                number of features of a batch. Defaults to items being single features,
+                recorded in groups of `REPORT_SIZE`.
+
+        Yields:
+            (Iterator[Any]): The next item.
+        """
+        items = iter(items)
+        pending: int = 0
+        seconds: float = 0.0
+        try:
+            while True:
+                start: float = clock()
+                try:
+                    item: Any = next(items)
+                except StopIteration:
+                    break
+                seconds += clock() - start
+                if count is None:
+                    pending += 1
+                    if pending >= REPORT_SIZE:
+                        self.record_batch(pending, seconds)
+                        pending, seconds = 0, 0.0
+                else:
+                    self.record_batch(count(item), seconds)
+                    seconds = 0.0
+                yield item
+            if pending:
+                self.record_batch(pending, seconds)
+        finally:
+            close: Optional[Callable[[], None]] = getattr(items, "close", None)
+            if close is not None:
+                close()  # e.g. when the consumer stops early, close files right away
+
+    def close(self) -> None:
+        """Notify hooks that the split is over."""
+        self.emit("close")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Snapshot of the metrics which can be serialized to JSON."""
+        with self._lock:
+            return {
+                "elapsed": self.elapsed,
+                "total_bytes": self.total_bytes,
+                "bytes_read": self.bytes_read,
+                "progress": self.progress,
+                "eta": self.eta,
+                "features": self.features,
+                "batches": self.batches,
+                "features_per_second": self.features_per_second,
+                "bytes_per_second": self.bytes_per_second,
+                "files": self.files,
+                "features_written": self.features_written,
+                "bytes_written": self.bytes_written,
+                "timings": dict(self.timings),
+                "batch_latency": self.latencies.to_dict(),
+            }
+
+
+class CountingReader:
+    """Binary file object wrapper adding the bytes read through it to `Metrics.bytes_read`
+
+    Every other attribute is looked up on the wrapped file object, so that the wrapper
+    can be memory mapped, decompressed or handed to ijson like the file itself, and only
+    has the reading methods the file object has.
+    """
+
+    _READS: Tuple[str, ...] = ("read1", "readinto", "readinto1", "readline")
+
+    def __init__(self, fp: Any, metrics: Metrics) -> None:
+        self._fp = fp
+        self._metrics = metrics
+
+    def __getattr__(self, name: str) -> Any:
+        attribute: Any = getattr(self._fp, name)
+        if name not in self._READS:
+            return attribute
+
+        def read(*args: Any) -> Any:
+            result: Any = attribute(*args)
+            # `readinto` methods return the number of bytes read, others the bytes
+            self._metrics.bytes_read += (
+                result if isinstance(result, int) else len(result or b"")
+            )
+            return result
+
+        return read
+
+    def __enter__(self) -> "CountingReader":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._fp.close()
+
+    def read(self, size: int = -1) -> bytes:
+        data: bytes = self._fp.read(size)
+        self._metrics.bytes_read += len(data)
+        return data
+
+
+class TimedWriter:
+    """Binary file object wrapper measuring the bytes written through it and how long it
+    took
+
+    Attributes:
+        bytes_written (int): Bytes written so far.
+        seconds (float): Seconds spent in `write` so far.
+    """
+
+    def __init__(self, fp: BinaryIO) -> None:
+        self._fp = fp
+        self.bytes_written: int = 0
+        self.seconds: float = 0.0
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._fp, name)
+
+    def write(self, data: Any) -> int:
+        start: float = clock()
+        n: int = self._fp.write(data)
+        self.seconds += clock() - start
+        self.bytes_written += memoryview(data).nbytes
+        return n
+
+
+def format_bytes(size: float) -> str:
+    """Human readable size, e.g. `'1.5 GB'`."""
+    unit: str
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}" if unit != "B" else f"{int(size)} B"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def format_duration(seconds: float) -> str:
+    """Duration as hours, minutes and seconds, e.g. `'1:02:03'`."""
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}"
+
+
+class ProgressBar:
+    """Hook drawing a progress bar with throughput and time left on a single line
+
+    The bar is only drawn when the size of the input is known, throughput and counts are
+    shown either way.
+
+    Attributes:
+        fp (TextIO): Text stream the bar is drawn to.
+        interval (float): Minimum number of seconds between two redraws.
+        width (int): Number of characters of the bar itself.
+    """
+
+    def __init__(
+        self, fp: Optional[TextIO] = None, interval: float = 0.2, width: int = 20
+    ) -> None:
+        if fp is None:
+            fp = sys.stderr
+        self.fp = fp
+        self.interval = interval
+        self.width = width
+        self._drawn: Optional[float] = None
+        self._length: int = 0
+
+    def format(self, metrics: Metrics) -> str:
+        """Text of the progress bar."""
+        parts: List[str] = []
+        progress: Optional[float] = metrics.progress
+        if progress is not None:
+            done: int = int(progress * self.width)
+            parts.append(
+                f"{progress:6.1%} |{'#' * done}{' ' * (self.width - done)}| "
+                f"{format_bytes(metrics.bytes_read)}/{format_bytes(metrics.total_bytes)}"
+            )
+        else:
+            parts.append(format_bytes(metrics.bytes_read))
+        parts.append(f"{metrics.features:,} features")
+        parts.append(f"{metrics.features_per_second:,.0f} features/s")
+        parts.append(f"{format_bytes(metrics.bytes_per_second)}/s")
+        parts.append(f"{metrics.files:,} files")
+        eta: Optional[float] = metrics.eta
+        if eta is not None:
+            parts.append(f"ETA {format_duration(eta)}")
+        return "  ".join(parts)
+
+    def __call__(self, event: str, metrics: Metrics) -> None:
+        now: float = clock()
+        if (
+            event != "close"
+            and self._drawn is not None
+            and now - self._drawn < self.interval
+        ):
+            return
+        self._drawn = now
+        line: str = self.format(metrics)
+        # pad with spaces to erase the end of a longer previous line
+        self.fp.write("\r" + line.ljust(self._length))
+        self._length = len(line)
+        if event == "close":
+            self.fp.write("\n")
+        self.fp.flush()
+
+
+class StatsWriter:
+    """Hook periodically writing the metrics as JSON lines, see `Metrics.to_dict`
+
+    Every line also holds the `event` which triggered it. The last line is always written
+    when the split is over.
+
+    Attributes:
+        fp (TextIO): Text stream the lines are written to.
+        interval (float): Minimum number of seconds between two lines.
+    """
+
+    def __init__(self, fp: TextIO, interval: float = 5.0) -> None:
+        self.fp = fp
+        self.interval = interval
+        self._written: Optional[float] = None
+
+    def __call__(self, event: str, metrics: Metrics) -> None:
+        now: float = clock()
+        if (
+            event != "close"
+            and self._written is not None
+            and now - self._written < self.interval
+        ):
+            return
+        self._written = now
+        self.fp.write(json.dumps({"event": event, **metrics.to_dict()}) + "\n")
+        self.fp.flush()
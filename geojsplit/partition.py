@@ -0,0 +1,410 @@
+"""Module for spatial partitioning of features
+
+Features are assigned to partitions by the centre of their bounding box, so that each
+output file covers a compact area and spatial queries only need to read the files whose
+extent they intersect. Partitioning happens in a single pass over the document, without
+knowing its extent or density up front.
+
+A partitioning scheme is named `'<scheme>'` or `'<scheme>:<parameter>'`:
+
+* `grid:<size>` regular grid of `size` by `size` cells, in the units of the coordinates
+  (default 1)
+* `quadtree:<capacity>` adaptive quadtree over the longitude and latitude range, where a
+  cell is split into four once it holds `capacity` features (default 10000). Features
+  written before a split stay in the file of the parent cell
+* `geohash:<precision>` geohash of `precision` characters (default 4)
+* `tile:<zoom>` XYZ web mercator tile at `zoom` (default 10)
+
+Every partition is described in a manifest listing its file, feature count, the bounding
+box of its features and the extent of its cell.
+"""
+import json
+import math
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+BBox = Tuple[float, float, float, float]
+WORLD: BBox = (-180.0, -90.0, 180.0, 90.0)
+MAX_LATITUDE: float = 85.0511287798066  # latitude limit of web mercator
+GEOHASH_ALPHABET: str = "0123456789bcdefghjkmnpqrstuvwxyz"
+# partition of features without a geometry
+EMPTY_KEY: str = "empty"
+
+
+def _iter_positions(coordinates: Any) -> Iterator[Sequence[Union[float, Decimal]]]:
+    """Generator function to yield every position of nested geojson coordinates."""
+    if not coordinates:
+        return
+    if isinstance(coordinates[0], (int, float, Decimal)):
+        yield coordinates
+        return
+    part: Any
+    for part in coordinates:
+        yield from _iter_positions(part)
+
+
+def _iter_geometry_positions(
+    geometry: Dict[str, Any]
+) -> Iterator[Sequence[Union[float, Decimal]]]:
+    if geometry.get("type") == "GeometryCollection":
+        member: Dict[str, Any]
+        for member in geometry.get("geometries") or []:
+            yield from _iter_geometry_positions(member)
+        return
+    yield from _iter_positions(geometry.get("coordinates"))
+
+
+def feature_bbox(feature: Dict[str, Any]) -> Optional[BBox]:
+    """
+    Compute the two dimensional bounding box of a feature.
+
+    The `bbox` member of the feature is used when present, otherwise the bounding box is
+    computed from the coordinates of its geometry. Bare geometries found in place of
+    features are accepted as well.
+
+    Args:
+        feature (Dict[str, Any]): A geojson Feature.
+
+    Returns:
+        Optional[BBox]: The minimum x, minimum y, maximum x and maximum y of the
+            feature, or None if it has no geometry.
+    """
+    bbox: Optional[Sequence[Any]] = feature.get("bbox")
+    if bbox:
+        half: int = len(bbox) // 2
+        return (
+            float(bbox[0]),
+            float(bbox[1]),
+            float(bbox[half]),
+            float(bbox[half + 1]),
+        )
+
+    geometry: Optional[Dict[str, Any]] = (
+        feature.get("geometry") if "geometry" in feature else feature
+    )
+    if not geometry:
+        return None
+    min_x: float = math.inf
+    min_y: float = math.inf
+    max_x: float = -math.inf
+    max_y: float = -math.inf
+    position: Sequence[Union[float, Decimal]]
+    for position in _iter_geometry_positions(geometry):
+        x: float = float(position[0])
+        y: float = float(position[1])
+        min_x = min(min_x, x)
+        min_y = min(min_y, y)
+        max_x = max(max_x, x)
+        max_y = max(max_y, y)
+    if min_x > max_x:
+        return None  # empty geometry
+
+    return min_x, min_y, max_x, max_y
+
+
+def merge_bbox(bbox: Optional[BBox], other: Optional[BBox]) -> Optional[BBox]:
+    """Return the bounding box covering both `bbox` and `other`."""
+    if bbox is None:
+        return other
+    if other is None:
+        return bbox
+    return (
+        min(bbox[0], other[0]),
+        min(bbox[1], other[1]),
+        max(bbox[2], other[2]),
+        max(bbox[3], other[3]),
+    )
+
+
+def _centre(bbox: BBox) -> Tuple[float, float]:
+    return (bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2
+
+
+class Partitioner:
+    """Base class of partitioning schemes
+
+    Attributes:
+        scheme (str): Name of the scheme.
+        parameter (Union[int, float]): Cell size, capacity, precision or zoom, depending
+            on the scheme.
+    """
+
+    scheme: str = ""
+
+    def __init__(self, parameter: Union[int, float]) -> None:
+        self.parameter = parameter
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.parameter!r})"
+
+    def key(self, bbox: Optional[BBox]) -> str:
+        """Return the partition key of a feature with bounding box `bbox`."""
+        if bbox is None:
+            return EMPTY_KEY
+        return self._key(*_centre(bbox))
+
+    def _key(self, x: float, y: float) -> str:
+        raise NotImplementedError
+
+    def extent(self, key: str) -> Optional[BBox]:
+        """Return the extent of the cell of partition `key`, if it has one."""
+        raise NotImplementedError
+
+
+class GridPartitioner(Partitioner):
+    """Regular grid of square cells, keyed by `'<column>_<row>'`"""
+
+    scheme = "grid"
+
+    def __init__(self, parameter: float = 1.0) -> None:
+        if parameter <= 0:
+            raise ValueError("grid cell size must be positive")
+        super().__init__(parameter)
+
+    def _key(self, x: float, y: float) -> str:
+        return f"{math.floor(x / self.parameter)}_{math.floor(y / self.parameter)}"
+
+    def extent(self, key: str) -> Optional[BBox]:
+        if key == EMPTY_KEY:
+            return None
+        column, row = (int(part) for part in key.split("_"))
+        return (
+            column * self.parameter,
+            row * self.parameter,
+            (column + 1) * self.parameter,
+            (row + 1) * self.parameter,
+        )
+
+
+class QuadtreePartitioner(Partitioner):
+    """Adaptive quadtree over `WORLD`, keyed by quadkey strings prefixed with `q`
+
+    Cells are split into four children once `parameter` features were assigned to them,
+    down to `max_depth` levels. Features are never moved once assigned, so a split cell
+    keeps the features it received before the split, and its children receive all later
+    ones.
+    """
+
+    scheme = "quadtree"
+
+    def __init__(self, parameter: int = 10000, max_depth: int = 24) -> None:
+        if parameter <= 0:
+            raise ValueError("quadtree capacity must be positive")
+        super().__init__(parameter)
+        self.max_depth = max_depth
+        self._counts: Dict[str, int] = {}
+
+    def _key(self, x: float, y: float) -> str:
+        min_x, min_y, max_x, max_y = WORLD
+        quadkey: str = ""
+        while self._counts.get(quadkey, 0) >= self.parameter:
+            mid_x: float = (min_x + max_x) / 2
+            mid_y: float = (min_y + max_y) / 2
+            digit: int = 0
+            if x >= mid_x:
+                digit += 1
+                min_x = mid_x
+            else:
+                max_x = mid_x
+            if y < mid_y:
+                digit += 2
+                max_y = mid_y
+            else:
+                min_y = mid_y
+            quadkey += str(digit)
+        if len(quadkey) < self.max_depth:
+            self._counts[quadkey] = self._counts.get(quadkey, 0) + 1
+
+        return "q" + quadkey
+
+    def extent(self, key: str) -> Optional[BBox]:
+        if key == EMPTY_KEY:
+            return None
+        min_x, min_y, max_x, max_y = WORLD
+        digit: str
+        for digit in key[1:]:
+            mid_x: float = (min_x + max_x) / 2
+            mid_y: float = (min_y + max_y) / 2
+            if int(digit) & 1:
+                min_x = mid_x
+            else:
+                max_x = mid_x
+            if int(digit) & 2:
+                max_y = mid_y
+            else:
+                min_y = mid_y
+        return min_x, min_y, max_x, max_y
+
+
+class GeohashPartitioner(Partitioner):
+    """Geohash of the centre of each feature, at a fixed precision"""
+
+    scheme = "geohash"
+
+    def __init__(self, parameter: int = 4) -> None:
+        if not 1 <= parameter <= 12:
+            raise ValueError("geohash precision must be between 1 and 12")
+        super().__init__(int(parameter))
+
+    def _key(self, x: float, y: float) -> str:
+        return geohash_encode(x, y, self.parameter)
+
+    def extent(self, key: str) -> Optional[BBox]:
+        if key == EMPTY_KEY:
+            return None
+        return geohash_extent(key)
+
+
+class TilePartitioner(Partitioner):
+    """XYZ web mercator tile of the centre of each feature, keyed by `'<z>-<x>-<y>'`"""
+
+    scheme = "tile"
+
+    def __init__(self, parameter: int = 10) -> None:
+        if not 0 <= parameter <= 30:
+            raise ValueError("tile zoom must be between 0 and 30")
+        super().__init__(int(parameter))
+
+    def _key(self, x: float, y: float) -> str:
+        n: int = 1 << self.parameter
+        latitude: float = math.radians(max(-MAX_LATITUDE, min(MAX_LATITUDE, y)))
+        column: int = int((x + 180.0) / 360.0 * n)
+        row: int = int((1.0 - math.asinh(math.tan(latitude)) / math.pi) / 2.0 * n)
+        return (
+            f"{self.parameter}-{min(max(column, 0), n - 1)}-{min(max(row, 0), n - 1)}"
+        )
+
+    def extent(self, key: str) -> Optional[BBox]:
+        if key == EMPTY_KEY:
+            return None
+        zoom, column, row = (int(part) for part in key.split("-"))
+        n: int = 1 << zoom
+
+        def latitude(r: int) -> float:
+            return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * r / n))))
+
+        return (
+            column / n * 360.0 - 180.0,
+            latitude(row + 1),
+            (column + 1) / n * 360.0 - 180.0,
+            latitude(row),
+        )
+
+
+PARTITIONERS: Dict[str, type] = {
+    partitioner.scheme: partitioner
+    for partitioner in (
+        GridPartitioner,
+        QuadtreePartitioner,
+        GeohashPartitioner,
+        TilePartitioner,
+    )
+}
+
+
+def geohash_encode(x: float, y: float, precision: int) -> str:
+    """Encode a longitude and latitude into a geohash of `precision` characters."""
+    ranges: List[List[float]] = [[-180.0, 180.0], [-90.0, 90.0]]
+    values: Tuple[float, float] = (x, y)
+    chars: List[str] = []
+    bit: int = 0
+    char: int = 0
+    even: bool = True
+    while len(chars) < precision:
+        dimension: int = 0 if even else 1
+        mid: float = sum(ranges[dimension]) / 2
+        char <<= 1
+        if values[dimension] >= mid:
+            char |= 1
+            ranges[dimension][0] = mid
+        else:
+            ranges[dimension][1] = mid
+        even = not even
+        bit += 1
+        if bit == 5:
+            chars.append(GEOHASH_ALPHABET[char])
+            bit = 0
+            char = 0
+
+    return "".join(chars)
+
+
+def geohash_extent(geohash: str) -> BBox:
+    """Decode a geohash into the extent of its cell."""
+    ranges: List[List[float]] = [[-180.0, 180.0], [-90.0, 90.0]]
+    even: bool = True
+    c: str
+    for c in geohash:
+        value: int = GEOHASH_ALPHABET.index(c)
+        shift: int
+        for shift in range(4, -1, -1):
+            dimension: int = 0 if even else 1
+            mid: float = sum(ranges[dimension]) / 2
+            if value >> shift & 1:
+                ranges[dimension][0] = mid
+            else:
+                ranges[dimension][1] = mid
+            even = not even
+
+    return ranges[0][0], ranges[1][0], ranges[0][1], ranges[1][1]
+
+
+def get_partitioner(spec: Union[str, Partitioner]) -> Partitioner:
+    """
+    Resolve a partitioning scheme into a Partitioner.
+
+    Args:
+        spec (Union[str, Partitioner]): `'<scheme>'` or `'<scheme>:<parameter>'`, one of
+            `grid`, `quadtree`, `geohash` or `tile`.
+
+    Raises:
+        ValueError: If the scheme is unknown or its parameter is invalid.
+
+    Returns:
+        Partitioner: The resolved partitioner.
+    """
+    if isinstance(spec, Partitioner):
+        return spec
+    scheme, sep, parameter = spec.partition(":")
+    if scheme not in PARTITIONERS:
+        raise ValueError(
+            f"unknown partitioning scheme {scheme}, choose from {list(PARTITIONERS)}"
+        )
+    if not sep:
+        return PARTITIONERS[scheme]()
+    try:
+        value: Union[int, float] = (
+            float(parameter) if scheme == "grid" else int(parameter)
+        )
+    except ValueError:
+        raise ValueError(f"invalid parameter {parameter} for scheme {scheme}")
+
+    return PARTITIONERS[scheme](value)
+
+
+def write_manifest(
+    path: Path, partitioner: Partitioner, partitions: List[Dict[str, Any]]
+) -> None:
+    """
+    Write the manifest describing every partition as JSON.
+
+    Args:
+        path (Path): Filepath of the manifest.
+        partitioner (Partitioner): Partitioner used to assign the features.
+        partitions (List[Dict[str, Any]]): The `key`, `filename`, `count` and `bbox` of
+            each partition. The extent of its cell is added to each.
+    """
+    partition: Dict[str, Any]
+    for partition in partitions:
+        partition["extent"] = partitioner.extent(partition["key"])
+    with path.open("w") as fp:
+        json.dump(
+            {
+                "scheme": partitioner.scheme,
+                "parameter": partitioner.parameter,
+                "partitions": partitions,
+            },
+            fp,
+            indent=2,
+        )
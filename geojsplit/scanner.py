@@ -0,0 +1,651 @@
+"""Module for byte level scanning of geojson documents
+
+Rather than parsing every feature into python objects, the scanner only tracks enough
+state (nesting depth and whether it is inside a string) to find where each element of the
+top level `features` array starts and ends. The original bytes of every feature can then
+be copied as is, which is much cheaper than parsing and reserializing them. Features
+whose objects are nested at most `FEATURE_DEPTH` levels deep are found in a single
+regular expression search, others brace by brace.
+
+::
+
+    {
+        "type": "FeatureCollection",
+        "features": [
+            { ... },  <- (offset, raw bytes) of each element
+            ...
+        ]
+    }
+
+Sequences of features, either newline delimited (one feature per line) or GeoJSON text
+sequences (RFC 8142, every feature prefixed by a record separator), are scanned the same
+way, every top level object being an element, see `is_sequence`.
+"""
+import mmap
+import re
+from typing import (
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Pattern,
+    Tuple,
+    Union,
+)
+
+CHUNK_SIZE: int = 1 << 20
+RECORD_SEPARATOR: bytes = b"\x1e"
+
+FEATURE_COLLECTION_HEADER: bytes = b'{"type": "FeatureCollection", "features": ['
+FEATURE_COLLECTION_FOOTER: bytes = b"]}"
+
+# any byte that may change the nesting depth or start a string
+_STRUCTURAL = re.compile(rb'[{}\[\]"]')
+# inside a feature only object braces matter, since features are always objects
+_OBJECT = re.compile(rb'[{}"]')
+# remainder of a string, given the position right after its opening quote
+_STRING_END = re.compile(rb'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+# next element or end of the features array
+_ELEMENT = re.compile(rb"[^\s,]")
+# next element of a sequence
+_RECORD = re.compile(rb"[^\s\x1e]")
+# separator between a member name and its value
+_NAME_SEPARATOR = re.compile(rb"\s*:\s*")
+# a value other than an object or an array: string, number, true, false or null
+_SCALAR = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[^\s,\]}]+', re.DOTALL)
+# deepest nesting of objects within a feature matched by `_FEATURE` in one search
+FEATURE_DEPTH: int = 6
+
+
+def _nested_object(depth: int) -> bytes:
+    """Pattern of an object nesting at most `depth` levels of objects."""
+    # runs of other bytes are matched atomically, by capturing them in a lookahead and
+    # matching the capture, so that a failed match does not backtrack through them
+    member: bytes = rb'(?=(?P<run%d>[^{}"]+))(?P=run%d)|"[^"\\]*(?:\\.[^"\\]*)*"' % (
+        depth,
+        depth,
+    )
+    if depth:
+        member += b"|" + _nested_object(depth - 1)
+    return rb"\{(?:" + member + rb")*\}"
+
+
+# a whole feature, found in a single search instead of one per brace or string
+_FEATURE = re.compile(_nested_object(FEATURE_DEPTH), re.DOTALL)
+
+
+# `type` of the top level objects of sequences, as opposed to `"FeatureCollection"`
+_RECORD_TYPES: Tuple[bytes, ...] = (
+    b'"Feature"',
+    b'"Point"',
+    b'"MultiPoint"',
+    b'"LineString"',
+    b'"MultiLineString"',
+    b'"Polygon"',
+    b'"MultiPolygon"',
+    b'"GeometryCollection"',
+)
+
+
+def key_from_prefix(prefix: Optional[str] = None) -> bytes:
+    """
+    Convert an ijson style prefix into the top level key understood by the scanner.
+
+    Args:
+        prefix (Optional[str], optional): ijson prefix of the elements to scan, of the
+            form `'<key>.item'`. Defaults to `'features.item'`.
+
+    Raises:
+        ValueError: If `prefix` does not point at the items of a top level array.
+
+    Returns:
+        bytes: The encoded top level key.
+    """
+    if prefix is None:
+        prefix = "features.item"
+    key, sep, item = prefix.rpartition(".")
+    if not sep or item != "item" or not key or "." in key:
+        raise ValueError(
+            f"prefix {prefix} is not supported, expected the form '<key>.item'"
+        )
+
+    return key.encode("utf-8")
+
+
+def _iter_spans(
+    read: Callable[[int], bytes],
+    key: bytes,
+    chunk_size: int,
+    buf: Union[bytes, mmap.mmap] = b"",
+    base: int = 0,
+    pos: int = 0,
+    locate: bool = True,
+    sequence: bool = False,
+) -> Iterator[Tuple[int, Union[bytes, mmap.mmap], int, int]]:
+    """
+    Core scanning loop shared by `iter_raw_features` and `iter_mapped_features`.
+
+    Yields the absolute offset of the current buffer, the buffer itself and the start
+    and end of the next element within it. The buffer is only valid until the next
+    element is requested. `base` is the absolute offset of `buf[0]` and scanning starts
+    at `buf[pos]`, either locating the array first or, without `locate`, from within it.
+    With `sequence`, elements are the top level objects of the document instead.
+    """
+    eof: bool = False
+    element: Pattern = _RECORD if sequence else _ELEMENT
+    locate = locate and not sequence
+
+    def refill(keep: int) -> bool:
+        """Drop bytes before `keep` and read the next chunk. Return False on EOF."""
+        nonlocal buf, base, eof
+        if eof:
+            return False
+        # read at least as much as is kept, so that huge features grow the buffer
+        # geometrically rather than being copied once per chunk
+        data: bytes = read(max(chunk_size, len(buf) - keep))
+        if not data:
+            eof = True
+            return False
+        buf = buf[keep:] + data
+        base += keep
+        return True
+
+    # locate the array, tracking the last string seen directly in the root object
+    depth: int = 0
+    last_string: Optional[bytes] = None
+    while locate:
+        m = _STRUCTURAL.search(buf, pos)
+        if m is None:
+            if not refill(len(buf)):
+                return  # no such array, same as ijson yielding nothing
+            pos = 0
+            continue
+        char: bytes = m.group()
+        if char == b'"':
+            s = _STRING_END.match(buf, m.end())
+            if s is None:
+                if not refill(m.start()):
+                    raise ValueError("unexpected end of document inside a string")
+                pos = 0
+                continue
+            if depth == 1:
+                last_string = buf[m.end() : s.end() - 1]
+            pos = s.end()
+        elif char in b"{[":
+            depth += 1
+            pos = m.end()
+            if char == b"[" and depth == 2 and last_string == key:
+                break
+        else:
+            depth -= 1
+            pos = m.end()
+
+    # scan elements of the array
+    while True:
+        m = element.search(buf, pos)
+        if m is None:
+            if not refill(len(buf)):
+                if sequence:
+                    return
+                raise ValueError("unexpected end of document inside the array")
+            pos = 0
+            continue
+        char = m.group()
+        if char == b"]" and not sequence:
+            return
+        if char != b"{":
+            raise ValueError(
+                f"unexpected element starting with {char!r} at byte {base + m.start()}"
+            )
+
+        start: int = m.start()
+        whole = _FEATURE.match(buf, start)
+        if whole is not None:
+            pos = whole.end()
+            yield base, buf, start, pos
+            continue
+
+        # the feature is deeper than `FEATURE_DEPTH` or continues past the buffer
+        pos = m.end()
+        depth = 1
+        while depth:
+            m = _OBJECT.search(buf, pos)
+            if m is None:
+                scanned: int = len(buf)
+                if not refill(start):
+                    raise ValueError("unexpected end of document inside a feature")
+                pos = scanned - start
+                start = 0
+                continue
+            char = m.group()
+            if char == b'"':
+                s = _STRING_END.match(buf, m.end())
+                if s is None:
+                    if not refill(start):
+                        raise ValueError("unexpected end of document inside a string")
+                    pos = m.start() - start
+                    start = 0
+                    continue
+                pos = s.end()
+            else:
+                depth += 1 if char == b"{" else -1
+                pos = m.end()
+
+        yield base, buf, start, pos
+
+
+def iter_raw_features(
+    fp: BinaryIO,
+    key: Optional[bytes] = None,
+    chunk_size: Optional[int] = None,
+    offset: Optional[int] = None,
+    sequence: bool = False,
+) -> Iterator[Tuple[int, bytes]]:
+    """
+    Generator function to yield the raw bytes of every element of a top level array.
+
+    Args:
+        fp (BinaryIO): Binary file object positioned at the start of the document.
+        key (Optional[bytes], optional): Top level key of the array to scan. Defaults
+            to `b'features'`.
+        chunk_size (Optional[int], optional): Number of bytes read at once. Defaults
+            to 1 MiB.
+        offset (Optional[int], optional): Byte offset within the array to start
+            scanning from, e.g. the end of a previously scanned element. Bytes before it
+            are skipped without being scanned. Defaults to the start of the document.
+        sequence (bool, optional): Scan the top level objects of a sequence of features
+            instead of an array, ignoring `key`. Defaults to False.
+
+    Raises:
+        ValueError: If the document ends unexpectedly or the array contains an element
+            which is not an object.
+
+    Yields:
+        (Iterator[Tuple[int, bytes]]): The byte offset of the element in the document
+            and its raw bytes.
+    """
+    if key is None:
+        key = b"features"
+    if chunk_size is None:
+        chunk_size = CHUNK_SIZE
+
+    spans: Iterator[Tuple[int, bytes, int, int]]
+    if offset is None:
+        spans = _iter_spans(fp.read, key, chunk_size, sequence=sequence)
+    else:
+        _skip(fp, offset)
+        spans = _iter_spans(
+            fp.read, key, chunk_size, base=offset, locate=False, sequence=sequence
+        )
+    base: int
+    buf: bytes
+    start: int
+    end: int
+    for base, buf, start, end in spans:
+        yield base + start, buf[start:end]
+
+
+def iter_spans(
+    fp: BinaryIO,
+    key: Optional[bytes] = None,
+    chunk_size: Optional[int] = None,
+    sequence: bool = False,
+) -> Iterator[Tuple[int, int]]:
+    """
+    Generator function to yield the byte range of every element of a top level array.
+
+    Unlike `iter_raw_features` the bytes of the elements are never copied out of the
+    buffer they are read into, which is all counting or indexing them takes.
+
+    Args:
+        fp (BinaryIO): Binary file object positioned at the start of the document.
+        key (Optional[bytes], optional): Top level key of the array to scan. Defaults
+            to `b'features'`.
+        chunk_size (Optional[int], optional): Number of bytes read at once. Defaults
+            to 1 MiB.
+        sequence (bool, optional): Scan the top level objects of a sequence of features
+            instead of an array, ignoring `key`. Defaults to False.
+
+    Raises:
+        ValueError: If the document ends unexpectedly or the array contains an element
+            which is not an object.
+
+    Yields:
+        (Iterator[Tuple[int, int]]): The start and end byte offsets of the element in
+            the document.
+    """
+    if key is None:
+        key = b"features"
+    if chunk_size is None:
+        chunk_size = CHUNK_SIZE
+
+    base: int
+    start: int
+    end: int
+    for base, _, start, end in _iter_spans(fp.read, key, chunk_size, sequence=sequence):
+        yield base + start, base + end
+
+
+def _skip(fp: BinaryIO, offset: int) -> None:
+    """Move a binary file object positioned at its start to `offset`, reading if needed."""
+    if fp.seekable():
+        fp.seek(offset)
+        return
+    while offset > 0:
+        data: bytes = fp.read(min(offset, CHUNK_SIZE))
+        if not data:
+            raise ValueError("unexpected end of document before the offset")
+        offset -= len(data)
+
+
+def iter_mapped_features(
+    mapping: mmap.mmap,
+    key: Optional[bytes] = None,
+    offset: Optional[int] = None,
+    sequence: bool = False,
+) -> Iterator[Tuple[int, memoryview]]:
+    """
+    Generator function to yield zero copy views of every element of a top level array.
+
+    The whole mapping is scanned in place, so pages are only touched once by the scanner
+    and features are never copied. The views must be released before the mapping can be
+    closed.
+
+    Args:
+        mapping (mmap.mmap): Memory mapped geojson document.
+        key (Optional[bytes], optional): Top level key of the array to scan. Defaults
+            to `b'features'`.
+        offset (Optional[int], optional): Byte offset within the array to start
+            scanning from, see `iter_raw_features`. Defaults to the start of the
+            document.
+        sequence (bool, optional): Scan the top level objects of a sequence of features
+            instead of an array, ignoring `key`. Defaults to False.
+
+    Raises:
+        ValueError: If the document ends unexpectedly or the array contains an element
+            which is not an object.
+
+    Yields:
+        (Iterator[Tuple[int, memoryview]]): The byte offset of the element in the
+            document and a view of its raw bytes.
+    """
+    if key is None:
+        key = b"features"
+
+    view: memoryview = memoryview(mapping)
+    try:
+        start: int
+        end: int
+        spans: Iterator[Tuple[int, mmap.mmap, int, int]] = _iter_spans(
+            lambda n: b"",
+            key,
+            0,
+            mapping,
+            pos=offset or 0,
+            locate=offset is None,
+            sequence=sequence,
+        )
+        for _, _, start, end in spans:
+            yield start, view[start:end]
+    finally:
+        view.release()
+
+
+def member_offsets(
+    raw: Union[bytes, memoryview], names: Optional[List[bytes]] = None
+) -> Dict[bytes, int]:
+    """
+    Locate the values of the members of a raw object, without parsing the object.
+
+    Only members of the object itself are located, not those of nested objects. Since
+    only braces and strings are looked at, arrays such as coordinates are skipped in a
+    single regular expression search.
+
+    Args:
+        raw (Union[bytes, memoryview]): Raw bytes of a JSON object, as yielded by
+            `iter_raw_features`.
+        names (Optional[List[bytes]], optional): Encoded names of the members of
+            interest. Scanning stops as soon as all of them are found. Defaults to all
+            members.
+
+    Returns:
+        Dict[bytes, int]: Offset of the first byte of the value of each member within
+            `raw`, by encoded member name.
+    """
+    remaining: int = len(names) if names is not None else -1
+    offsets: Dict[bytes, int] = {}
+    depth: int = 0
+    pos: int = 0
+    while True:
+        m = _OBJECT.search(raw, pos)
+        if m is None:
+            return offsets
+        char: bytes = m.group()
+        if char == b'"':
+            s = _STRING_END.match(raw, m.end())
+            if s is None:
+                return offsets
+            pos = s.end()
+            if depth == 1:
+                # strings of arrays are never followed by a colon
+                separator = _NAME_SEPARATOR.match(raw, pos)
+                if separator is not None:
+                    name: bytes = bytes(raw[m.end() : pos - 1])
+                    offsets[name] = separator.end()
+                    pos = separator.end()
+                    if names is not None and name in names:
+                        remaining -= 1
+                        if remaining == 0:
+                            return offsets
+        else:
+            if depth == 1 and char == b"{":
+                # values such as properties are skipped in a single search
+                whole = _FEATURE.match(raw, m.start())
+                if whole is not None:
+                    pos = whole.end()
+                    continue
+            depth += 1 if char == b"{" else -1
+            pos = m.end()
+            if depth == 0:
+                return offsets
+
+
+def object_end(raw: Union[bytes, memoryview], start: int) -> int:
+    """
+    Find the end of the JSON object starting at `start` within `raw`.
+
+    Raises:
+        ValueError: If the object is not terminated.
+
+    Returns:
+        int: Offset right after the closing brace of the object.
+    """
+    whole = _FEATURE.match(raw, start)
+    if whole is not None:
+        return whole.end()
+    depth: int = 0
+    pos: int = start
+    while True:
+        m = _OBJECT.search(raw, pos)
+        if m is None:
+            raise ValueError("unexpected end of object")
+        if m.group() == b'"':
+            s = _STRING_END.match(raw, m.end())
+            if s is None:
+                raise ValueError("unexpected end of object inside a string")
+            pos = s.end()
+            continue
+        depth += 1 if m.group() == b"{" else -1
+        pos = m.end()
+        if depth == 0:
+            return pos
+
+
+def value_end(raw: Union[bytes, memoryview], start: int) -> int:
+    """
+    Find the end of the JSON value starting at `start` within `raw`, such as the value
+    of a member located by `member_offsets`, so that only its bytes are decoded.
+
+    Raises:
+        ValueError: If there is no value at `start` or it is not terminated.
+
+    Returns:
+        int: Offset right after the last byte of the value.
+    """
+    first: bytes = bytes(raw[start : start + 1])
+    if first == b"{":
+        return object_end(raw, start)
+    if first != b"[":
+        scalar = _SCALAR.match(raw, start)
+        if scalar is None:
+            raise ValueError("expected a value")
+        return scalar.end()
+    depth: int = 0
+    pos: int = start
+    while True:
+        m = _STRUCTURAL.search(raw, pos)
+        if m is None:
+            raise ValueError("unexpected end of array")
+        char: bytes = m.group()
+        if char == b'"':
+            s = _STRING_END.match(raw, m.end())
+            if s is None:
+                raise ValueError("unexpected end of array inside a string")
+            pos = s.end()
+            continue
+        depth += 1 if char in (b"[", b"{") else -1
+        pos = m.end()
+        if depth == 0:
+            return pos
+
+
+def is_sequence(head: Union[bytes, memoryview], eof: bool = False) -> Optional[bool]:
+    """
+    Tell a sequence of features from a single document, given its first bytes.
+
+    Sequences start with a record separator, or with an object whose `type` is
+    `Feature` or a geometry type, or which is followed by another object. Documents
+    start with any other value, or with an object of another type, usually
+    `FeatureCollection`.
+
+    Args:
+        head (Union[bytes, memoryview]): First bytes of the decompressed document.
+        eof (bool, optional): Whether `head` is the whole document. Defaults to False.
+
+    Returns:
+        Optional[bool]: Whether the document is a sequence, or None if more bytes are
+            needed to tell.
+    """
+    m = _RECORD.search(head)
+    if m is None:
+        return False if eof else None
+    if RECORD_SEPARATOR in head[: m.start()]:
+        return True
+    if m.group() != b"{":
+        return False
+
+    start: int = m.start()
+    offsets: Dict[bytes, int] = member_offsets(head[start:], [b"type"])
+    if b"type" in offsets:
+        value: bytes = bytes(head[start + offsets[b"type"] :][:32])
+        if value.startswith(b'"FeatureCollection"'):
+            return False
+        if value.startswith(_RECORD_TYPES):
+            return True
+    try:
+        end: int = object_end(head, start)
+    except ValueError:
+        return False if eof else None
+    m = _RECORD.search(head, end)
+    if m is None:
+        return False if eof else None
+
+    return m.group() == b"{"
+
+
+def _records_on_one_line(head: Union[bytes, memoryview]) -> bool:
+    """Whether no record of a sequence, among those complete in `head`, spans lines."""
+    m = _RECORD.search(head)
+    while m is not None:
+        if m.group() != b"{":
+            return False
+        try:
+            end: int = object_end(head, m.start())
+        except ValueError:
+            return True  # the last record continues past `head`
+        if b"\n" in head[m.start() : end]:
+            return False
+        m = _RECORD.search(head, end)
+    return True
+
+
+def record_ranges(fp: BinaryIO, size: int) -> List[Tuple[int, int]]:
+    """
+    Split a sequence of features into byte ranges of about `size` bytes, which can be
+    scanned independently.
+
+    Ranges end where a record separator, or a line feed for newline delimited
+    documents, follows `size` bytes after the start of the range. Records of newline
+    delimited documents must therefore not contain line breaks: the whole document is
+    a single range when the records of its first chunk span several lines, e.g. when
+    pretty-printed, or when a line feed where a range would end is not followed by a
+    record.
+
+    Args:
+        fp (BinaryIO): Seekable binary file object of an uncompressed sequence.
+        size (int): Minimum size of every range but the last one.
+
+    Returns:
+        List[Tuple[int, int]]: Start and end byte offsets of every range, covering the
+            whole document in order.
+    """
+    fp.seek(0)
+    head: bytes = fp.read(CHUNK_SIZE)
+    first = _RECORD.search(head)
+    delimiter: bytes = (
+        RECORD_SEPARATOR
+        if first is not None and RECORD_SEPARATOR in head[: first.start()]
+        else b"\n"
+    )
+    end: int = fp.seek(0, 2)
+    if delimiter == b"\n" and not _records_on_one_line(head):
+        return [(0, end)]
+
+    boundaries: List[int] = [0]
+    position: int = size
+    while position < end:
+        fp.seek(position)
+        found: int = -1
+        while found == -1:
+            data: bytes = fp.read(CHUNK_SIZE)
+            if not data:
+                break
+            found = data.find(delimiter)
+            position += found if found != -1 else len(data)
+        if found == -1:
+            break
+        if delimiter == b"\n":
+            record = _RECORD.search(data, found)
+            if record is not None and record.group() != b"{":
+                return [(0, end)]
+        boundaries.append(position)
+        position += size
+    boundaries.append(end)
+
+    return list(zip(boundaries, boundaries[1:]))
+
+
+def dump_raw(features: List[Union[bytes, memoryview]], fp: BinaryIO) -> None:
+    """
+    Write raw features to a binary file object as a new Feature Collection.
+
+    Args:
+        features (List[Union[bytes, memoryview]]): Raw bytes of each feature, as
+            produced by `iter_raw_features` or `iter_mapped_features`.
+        fp (BinaryIO): Binary file object to write to.
+    """
+    fp.write(FEATURE_COLLECTION_HEADER)
+    fp.write(b",".join(features))
+    fp.write(FEATURE_COLLECTION_FOOTER)
@@ -0,0 +1,492 @@
+"""Module for the output formats split features are written in
+
+A sink writes a batch of features to an open binary file. Text sinks write serialized
+features between a header and a footer, and can also write features one at a time (see
+`writers.FeatureCollectionWriter`):
+
+* `geojson`: a Feature Collection, the default.
+* `geojsonseq`: a GeoJSON text sequence (RFC 8142), every feature prefixed by a record
+  separator and followed by a newline.
+* `ndjson`: newline delimited GeoJSON, one feature per line.
+
+Columnar sinks convert a whole batch into a table at once, with one column per property
+and the geometry encoded as WKB, so that split files load straight into dataframes
+without parsing JSON again. They require the optional `pyarrow` package:
+
+* `arrow`: an Arrow IPC file, the geometry column tagged as `geoarrow.wkb`.
+* `parquet`: a GeoParquet file.
+
+Column types are inferred from the first batch, and widened for later batches when they
+hold values which do not fit, e.g. from integers to floats, or to strings when values
+have nothing in common or integers do not fit in 64 bits. Nested property values are
+written as JSON strings.
+
+Schemas are per file: each file has the columns and types of the batches written by its
+sink so far, so earlier files may lack columns or have narrower types than later ones.
+Worker processes each have their own sink, so with `--jobs` schemas also depend on which
+batches a worker wrote before. A sink may be shared by writer threads.
+"""
+import json
+import struct
+import threading
+from decimal import Decimal
+from typing import Any, BinaryIO, Dict, List, Optional, Set, Union
+
+import geojson
+import simplejson
+
+from .backends import Backend, get_backend
+from .scanner import FEATURE_COLLECTION_FOOTER, FEATURE_COLLECTION_HEADER, dump_raw
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+Batch = Union[geojson.feature.FeatureCollection, List[Union[bytes, memoryview]]]
+
+GEOMETRY_COLUMN: str = "geometry"
+GEOPARQUET_VERSION: str = "1.0.0"
+WKB_TYPES: Dict[str, int] = {
+    "Point": 1,
+    "LineString": 2,
+    "Polygon": 3,
+    "MultiPoint": 4,
+    "MultiLineString": 5,
+    "MultiPolygon": 6,
+    "GeometryCollection": 7,
+}
+# pyarrow type of each column kind
+ARROW_TYPES: Dict[str, str] = {
+    "null": "null",
+    "bool": "bool_",
+    "int": "int64",
+    "float": "float64",
+    "string": "string",
+}
+# range of integers held by int64 columns
+INT64_MIN: int = -(2 ** 63)
+INT64_MAX: int = 2 ** 63 - 1
+_WKB_MEMBERS: Dict[str, str] = {
+    "MultiPoint": "Point",
+    "MultiLineString": "LineString",
+    "MultiPolygon": "Polygon",
+}
+
+
+def _require_pyarrow() -> None:
+    if pyarrow is None:
+        raise ValueError("columnar formats require the pyarrow package")
+
+
+def _batch_features(batch: Batch, raw: bool, backend: Backend) -> List[Dict[str, Any]]:
+    if raw:
+        return [backend.loads(feature) for feature in batch]
+    return batch["features"]
+
+
+class Sink:
+    """Output format of split files
+
+    Attributes:
+        name (str): Name of the format, one of `SINKS`.
+        suffix (str): Extension of the files written, e.g. `'.geojson'`.
+    """
+
+    name: str = ""
+    suffix: str = ""
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}()"
+
+    def write(
+        self,
+        fp: BinaryIO,
+        batch: Batch,
+        raw: bool = False,
+        backend: Optional[Backend] = None,
+    ) -> int:
+        """
+        Write a batch of features to an open binary file.
+
+        Args:
+            fp (BinaryIO): File object to write to.
+            batch (Batch): Either a Feature Collection or the raw bytes of each feature.
+            raw (bool, optional): Whether `batch` holds raw feature bytes. Defaults to
+                False.
+            backend (Optional[Backend], optional): Backend used to parse and serialize
+                features. Defaults to the fastest available one.
+
+        Returns:
+            int: The number of features written.
+        """
+        raise NotImplementedError
+
+
+class TextSink(Sink):
+    """Sink writing serialized features one after the other
+
+    Attributes:
+        header (bytes): Bytes written before the first feature.
+        footer (bytes): Bytes written after the last feature.
+        separator (bytes): Bytes written between two features.
+        record_prefix (bytes): Bytes written before every feature.
+        record_suffix (bytes): Bytes written after every feature.
+    """
+
+    header: bytes = b""
+    footer: bytes = b""
+    separator: bytes = b""
+    record_prefix: bytes = b""
+    record_suffix: bytes = b""
+
+    @property
+    def envelope_size(self) -> int:
+        """Size of a file without any feature, in bytes."""
+        return len(self.header) + len(self.footer)
+
+    def record_size(self, size: int, first: bool = False) -> int:
+        """Number of bytes written for a serialized feature of `size` bytes."""
+        separator: int = 0 if first else len(self.separator)
+        return separator + len(self.record_prefix) + size + len(self.record_suffix)
+
+    def record(self, raw: Union[bytes, memoryview]) -> Union[bytes, memoryview]:
+        """Serialized bytes of a feature as they are written, given its raw bytes."""
+        return raw
+
+    def write(
+        self,
+        fp: BinaryIO,
+        batch: Batch,
+        raw: bool = False,
+        backend: Optional[Backend] = None,
+    ) -> int:
+        if backend is None:
+            backend = get_backend()
+        features: List[Any] = batch if raw else batch["features"]
+        fp.write(self.header)
+        i: int
+        feature: Any
+        for i, feature in enumerate(features):
+            if i:
+                fp.write(self.separator)
+            fp.write(self.record_prefix)
+            fp.write(self.record(feature if raw else backend.dumps(feature)))
+            fp.write(self.record_suffix)
+        fp.write(self.footer)
+        return len(features)
+
+
+class GeoJSONSink(TextSink):
+    name: str = "geojson"
+    suffix: str = ".geojson"
+    header: bytes = FEATURE_COLLECTION_HEADER
+    footer: bytes = FEATURE_COLLECTION_FOOTER
+    separator: bytes = b","
+
+    def write(
+        self,
+        fp: BinaryIO,
+        batch: Batch,
+        raw: bool = False,
+        backend: Optional[Backend] = None,
+    ) -> int:
+        if raw:
+            dump_raw(batch, fp)
+            return len(batch)
+
+        if backend is None:
+            backend = get_backend()
+        backend.dump(batch, fp)
+        return len(batch["features"])
+
+
+class GeoJSONSeqSink(TextSink):
+    name: str = "geojsonseq"
+    suffix: str = ".geojsons"
+    record_prefix: bytes = b"\x1e"
+    record_suffix: bytes = b"\n"
+
+
+class NDJSONSink(TextSink):
+    name: str = "ndjson"
+    suffix: str = ".geojsonl"
+    record_suffix: bytes = b"\n"
+
+    def record(self, raw: Union[bytes, memoryview]) -> Union[bytes, memoryview]:
+        # line breaks can only be whitespace between tokens, strings escape them
+        data: bytes = bytes(raw)
+        if b"\n" in data or b"\r" in data:
+            return data.replace(b"\r", b" ").replace(b"\n", b" ")
+        return raw
+
+
+def _wkb_coordinates(positions: List[Any], dimension: int) -> bytes:
+    """Pack positions as `dimension` doubles each, padding missing values with NaN."""
+    if not positions:
+        return b""
+    values: List[Any] = []
+    if all(len(position) == dimension for position in positions):
+        for position in positions:
+            values.extend(position)
+    else:
+        for position in positions:
+            values.extend(position[:dimension])
+            values.extend([float("nan")] * (dimension - len(position)))
+    return struct.pack(f"<{len(values)}d", *values)
+
+
+def _wkb_dimension(geometry: Dict[str, Any]) -> int:
+    """2, or 3 if the first position of the geometry has a Z value."""
+    coordinates: Any = geometry.get("coordinates")
+    while coordinates and isinstance(coordinates[0], list):
+        coordinates = coordinates[0]
+    return 3 if coordinates and len(coordinates) > 2 else 2
+
+
+def _write_wkb(
+    geometry_type: str, coordinates: Any, dimension: int, parts: List[bytes]
+) -> None:
+    code: int = WKB_TYPES[geometry_type] + (1000 if dimension == 3 else 0)
+    if geometry_type == "Point":
+        position: List[Any] = coordinates or [float("nan")] * dimension
+        parts.append(struct.pack("<BI", 1, code))
+        parts.append(_wkb_coordinates([position], dimension))
+    elif geometry_type == "LineString":
+        parts.append(struct.pack("<BII", 1, code, len(coordinates)))
+        parts.append(_wkb_coordinates(coordinates, dimension))
+    elif geometry_type == "Polygon":
+        parts.append(struct.pack("<BII", 1, code, len(coordinates)))
+        ring: List[Any]
+        for ring in coordinates:
+            parts.append(struct.pack("<I", len(ring)))
+            parts.append(_wkb_coordinates(ring, dimension))
+    else:
+        parts.append(struct.pack("<BII", 1, code, len(coordinates)))
+        member: Any
+        for member in coordinates:
+            _write_wkb(_WKB_MEMBERS[geometry_type], member, dimension, parts)
+
+
+def to_wkb(geometry: Optional[Dict[str, Any]]) -> Optional[bytes]:
+    """
+    Encode a geojson geometry as little endian ISO WKB.
+
+    Args:
+        geometry (Optional[Dict[str, Any]]): The geometry, or None.
+
+    Raises:
+        ValueError: If the geometry type is unknown.
+
+    Returns:
+        Optional[bytes]: The WKB geometry, or None for a null geometry.
+    """
+    if geometry is None:
+        return None
+    geometry_type: str = geometry.get("type")
+    if geometry_type not in WKB_TYPES:
+        raise ValueError(f"unknown geometry type {geometry_type}")
+    parts: List[bytes] = []
+    if geometry_type == "GeometryCollection":
+        members: List[Dict[str, Any]] = geometry.get("geometries") or []
+        parts.append(struct.pack("<BII", 1, WKB_TYPES[geometry_type], len(members)))
+        member: Dict[str, Any]
+        for member in members:
+            parts.append(to_wkb(member))
+    else:
+        _write_wkb(
+            geometry_type,
+            geometry.get("coordinates") or [],
+            _wkb_dimension(geometry),
+            parts,
+        )
+    return b"".join(parts)
+
+
+def _kind(value: Any) -> str:
+    """Column kind of a property value."""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int" if INT64_MIN <= value <= INT64_MAX else "string"
+    if isinstance(value, (float, Decimal)):
+        return "float"
+    return "string"
+
+
+def widen(kind: str, other: str) -> str:
+    """Narrowest column kind holding values of both kinds."""
+    if kind == other or other == "null":
+        return kind
+    if kind == "null":
+        return other
+    if {kind, other} == {"int", "float"}:
+        return "float"
+    return "string"
+
+
+def _to_string(value: Any) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    return simplejson.dumps(value)
+
+
+class ArrowSink(Sink):
+    """Sink writing batches as Arrow IPC files
+
+    Attributes:
+        kinds (Dict[str, str]): Kind of every property column seen so far, in order,
+            widened as needed by the batches written, by any thread.
+    """
+
+    name: str = "arrow"
+    suffix: str = ".arrow"
+
+    def __init__(self) -> None:
+        _require_pyarrow()
+        self.kinds: Dict[str, str] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def table(self, features: List[Dict[str, Any]]) -> Any:
+        """
+        Convert a batch of features into a table in one step.
+
+        Args:
+            features (List[Dict[str, Any]]): The features.
+
+        Returns:
+            pyarrow.Table: One column per property, widening `kinds` as needed, and a
+                WKB `geometry` column.
+        """
+        properties: List[Dict[str, Any]] = [
+            feature.get("properties") or {} for feature in features
+        ]
+        kinds: Dict[str, str] = {}
+        name: str
+        with self._lock:
+            names: Dict[str, None] = dict.fromkeys(self.kinds)
+            for row in properties:
+                names.update(dict.fromkeys(row))
+            for name in names:
+                kind: str = self.kinds.get(name, "null")
+                for other in {_kind(row.get(name)) for row in properties}:
+                    kind = widen(kind, other)
+                self.kinds[name] = kinds[name] = kind
+
+        columns: Dict[str, Any] = {}
+        for name, kind in kinds.items():
+            values: List[Any] = [row.get(name) for row in properties]
+            if kind == "string":
+                values = [_to_string(value) for value in values]
+            elif kind == "float":
+                values = [None if value is None else float(value) for value in values]
+            columns[name] = pyarrow.array(
+                values, type=getattr(pyarrow, ARROW_TYPES[kind])()
+            )
+        fields: List[Any] = [pyarrow.field(name, columns[name].type) for name in kinds]
+        fields.append(self.geometry_field())
+        columns[GEOMETRY_COLUMN] = pyarrow.array(
+            [to_wkb(feature.get("geometry")) for feature in features],
+            type=pyarrow.binary(),
+        )
+
+        return pyarrow.Table.from_arrays(
+            list(columns.values()), schema=pyarrow.schema(fields)
+        )
+
+    def geometry_field(self) -> Any:
+        """Field of the WKB geometry column, tagged with its GeoArrow extension name."""
+        return pyarrow.field(
+            GEOMETRY_COLUMN,
+            pyarrow.binary(),
+            metadata={
+                "ARROW:extension:name": "geoarrow.wkb",
+                "ARROW:extension:metadata": "{}",
+            },
+        )
+
+    def write(
+        self,
+        fp: BinaryIO,
+        batch: Batch,
+        raw: bool = False,
+        backend: Optional[Backend] = None,
+    ) -> int:
+        if backend is None:
+            backend = get_backend()
+        features: List[Dict[str, Any]] = _batch_features(batch, raw, backend)
+        table = self.table(features)
+        with pyarrow.ipc.new_file(fp, table.schema) as writer:
+            writer.write_table(table)
+        return len(features)
+
+
+class ParquetSink(ArrowSink):
+    """Sink writing batches as GeoParquet files, with WKB geometries"""
+
+    name: str = "parquet"
+    suffix: str = ".parquet"
+
+    def write(
+        self,
+        fp: BinaryIO,
+        batch: Batch,
+        raw: bool = False,
+        backend: Optional[Backend] = None,
+    ) -> int:
+        if backend is None:
+            backend = get_backend()
+        features: List[Dict[str, Any]] = _batch_features(batch, raw, backend)
+        geometry_types: Set[str] = {
+            feature["geometry"]["type"]
+            for feature in features
+            if feature.get("geometry") is not None
+        }
+        geo: Dict[str, Any] = {
+            "version": GEOPARQUET_VERSION,
+            "primary_column": GEOMETRY_COLUMN,
+            "columns": {
+                GEOMETRY_COLUMN: {
+                    "encoding": "WKB",
+                    "geometry_types": sorted(geometry_types),
+                }
+            },
+        }
+        table = self.table(features)
+        table = table.replace_schema_metadata({"geo": json.dumps(geo)})
+        pyarrow.parquet.write_table(table, fp)
+        return len(features)
+
+
+SINKS: Dict[str, type] = {
+    sink.name: sink
+    for sink in (GeoJSONSink, GeoJSONSeqSink, NDJSONSink, ArrowSink, ParquetSink)
+}
+
+
+def get_sink(name: Optional[Union[str, Sink]] = None) -> Sink:
+    """
+    Resolve a format name into a new sink.
+
+    Args:
+        name (Optional[Union[str, Sink]], optional): One of `SINKS`. Defaults to
+            `'geojson'`.
+
+    Raises:
+        ValueError: If the name is unknown, or a columnar format is asked for and
+            pyarrow is not installed.
+
+    Returns:
+        Sink: The sink.
+    """
+    if isinstance(name, Sink):
+        return name
+    if name is None:
+        name = "geojson"
+    if name not in SINKS:
+        raise ValueError(f"unknown format {name}, choose from {list(SINKS)}")
+
+    return SINKS[name]()
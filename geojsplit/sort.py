@@ -0,0 +1,364 @@
+"""Module for sorting features within bounded memory
+
+Features can be ordered along a space filling curve through the centre of their bounding
+box, so that features close to each other in space end up close to each other in the
+split files, or by the value of one of their properties. A sort order is named
+`'<order>'` or `'<order>:<parameter>'`:
+
+* `hilbert:<bits>` Hilbert curve over the longitude and latitude range, with `bits` bits
+  per axis (default 16), through the centre of the bounding box of the geometry of
+  features. Features without a geometry come last
+* `zorder:<bits>` Z-order (Morton) curve, cheaper to compute than the Hilbert curve but
+  with larger jumps between neighbouring cells
+* `property:<name>` value of property `name`: numbers, then strings, then booleans, then
+  other values, and features without the property last
+
+Keys are computed from the raw bytes of features, matching the positions of their
+geometry, see `filters.raw_geometry_bbox`, or decoding only their `properties` member.
+
+Documents larger than memory are sorted with an external merge sort. `ExternalSorter`
+holds keys and raw features until about `memory_limit` bytes are gathered, sorts them and
+spills them to a temporary file as a sorted run. Once every feature is added, runs are
+merged with a heap, at most `MERGE_WIDTH` at once, so that only one feature per run is
+held in memory while the merged features are written. Features with equal keys keep the
+order in which they were added.
+"""
+import heapq
+import json
+import pickle
+import re
+import tempfile
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple, Type, Union
+
+from .filters import raw_geometry_bbox
+from .partition import WORLD, BBox, _centre, feature_bbox
+from .scanner import member_offsets, object_end, value_end
+
+DEFAULT_MEMORY_LIMIT: int = 256 << 20
+# estimated bytes of memory taken by a feature besides its raw bytes: the record tuple,
+# its key and the bytes object itself
+RECORD_OVERHEAD: int = 160
+MERGE_WIDTH: int = 128  # maximum number of runs merged at once
+RUN_BUFFER_SIZE: int = 1 << 16  # read buffer of every run while merging
+
+Record = Tuple[Any, int, bytes]
+
+_DECODER = json.JSONDecoder()
+# object without nested objects, unless its strings hold braces
+_FLAT_OBJECT = re.compile(rb"\{[^{}]*\}")
+
+
+def _grid(x: float, y: float, bits: int) -> Tuple[int, int]:
+    """Cell of a longitude and latitude in a grid of `2 ** bits` cells per axis."""
+    size: int = 1 << bits
+    column: int = int((x - WORLD[0]) / (WORLD[2] - WORLD[0]) * size)
+    row: int = int((y - WORLD[1]) / (WORLD[3] - WORLD[1]) * size)
+    return min(max(column, 0), size - 1), min(max(row, 0), size - 1)
+
+
+def hilbert_index(x: int, y: int, bits: int) -> int:
+    """Distance along the Hilbert curve of the cell `x`, `y` of a `2 ** bits` grid."""
+    size: int = 1 << bits
+    index: int = 0
+    s: int = size >> 1
+    while s:
+        rx: int = 1 if x & s else 0
+        ry: int = 1 if y & s else 0
+        index += s * s * ((3 * rx) ^ ry)
+        # rotate the quadrant so that the curve within it starts and ends at its edges
+        if not ry:
+            if rx:
+                x = size - 1 - x
+                y = size - 1 - y
+            x, y = y, x
+        s >>= 1
+
+    return index
+
+
+def zorder_index(x: int, y: int, bits: int) -> int:
+    """Z-order index of the cell `x`, `y` of a `2 ** bits` grid, interleaving bits."""
+    index: int = 0
+    bit: int
+    for bit in range(bits):
+        index |= ((x >> bit) & 1) << (2 * bit) | ((y >> bit) & 1) << (2 * bit + 1)
+
+    return index
+
+
+def raw_bbox(raw: Union[bytes, memoryview]) -> Optional[BBox]:
+    """
+    Compute the bounding box of the geometry of the raw bytes of a feature, without
+    parsing its coordinates, see `filters.raw_geometry_bbox`. Members following the
+    geometry, such as a `bbox`, are never scanned. Bare geometries are decoded whole.
+    """
+    offsets: Dict[bytes, int] = member_offsets(raw, [b"geometry"])
+    if b"geometry" in offsets:
+        offset: int = offsets[b"geometry"]
+        if raw[offset : offset + 1] != b"{":
+            return None  # null geometry
+        return raw_geometry_bbox(raw[offset : object_end(raw, offset)])
+
+    return feature_bbox(json.loads(bytes(raw).decode()))
+
+
+class SortKey:
+    """Base class of sort orders
+
+    Attributes:
+        order (str): Name of the sort order.
+        parameter (Union[int, str]): Bits per axis of curves or name of the property,
+            depending on the order.
+    """
+
+    order: str = ""
+
+    def __init__(self, parameter: Union[int, str]) -> None:
+        self.parameter = parameter
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.parameter!r})"
+
+    def key(self, raw: Union[bytes, memoryview]) -> Any:
+        """Return the sort key of a feature, given its raw bytes."""
+        raise NotImplementedError
+
+
+class CurveKey(SortKey):
+    """Index of the centre of features along a space filling curve"""
+
+    def __init__(self, parameter: int = 16) -> None:
+        if not 1 <= parameter <= 31:
+            raise ValueError(f"invalid number of bits {parameter}, expected 1 to 31")
+        super().__init__(parameter)
+
+    def key(self, raw: Union[bytes, memoryview]) -> int:
+        bbox: Optional[BBox] = raw_bbox(raw)
+        if bbox is None:
+            return 1 << (2 * self.parameter)  # after every cell
+        return self._index(*_grid(*_centre(bbox), self.parameter))
+
+    def _index(self, x: int, y: int) -> int:
+        raise NotImplementedError
+
+
+class HilbertKey(CurveKey):
+    """Index of the centre of features along a Hilbert curve"""
+
+    order = "hilbert"
+
+    def _index(self, x: int, y: int) -> int:
+        return hilbert_index(x, y, self.parameter)
+
+
+class ZOrderKey(CurveKey):
+    """Index of the centre of features along a Z-order curve"""
+
+    order = "zorder"
+
+    def _index(self, x: int, y: int) -> int:
+        return zorder_index(x, y, self.parameter)
+
+
+def _decode_value(raw: Union[bytes, memoryview], start: int) -> Any:
+    """
+    Decode only the bytes of the JSON value starting at `start` within `raw`.
+
+    Objects are first assumed to hold no nested objects and to end at the next closing
+    brace, which is much cheaper to find than with `value_end`. The guess is right if
+    those bytes decode, since the first closing brace outside strings ends the object.
+    """
+    flat = _FLAT_OBJECT.match(raw, start)
+    if flat is not None:
+        try:
+            return _DECODER.raw_decode(bytes(raw[start : flat.end()]).decode())[0]
+        except ValueError:
+            pass
+    return _DECODER.raw_decode(bytes(raw[start : value_end(raw, start)]).decode())[0]
+
+
+class PropertyKey(SortKey):
+    """Value of a property of features, ranked by type so that any values compare"""
+
+    order = "property"
+
+    def __init__(self, parameter: str) -> None:
+        if not parameter:
+            raise ValueError("property sort order requires a property name")
+        super().__init__(parameter)
+
+    def key(self, raw: Union[bytes, memoryview]) -> Tuple[int, Any]:
+        offsets: Dict[bytes, int] = member_offsets(raw, [b"properties"])
+        value: Any = None
+        if b"properties" in offsets:
+            value = (_decode_value(raw, offsets[b"properties"]) or {}).get(
+                self.parameter
+            )
+        if isinstance(value, bool):
+            return 2, value
+        if isinstance(value, (int, float)):
+            return 0, value
+        if isinstance(value, str):
+            return 1, value
+        if value is None:
+            return 4, 0
+        return 3, json.dumps(value, sort_keys=True)
+
+
+SORT_KEYS: Dict[str, Type[SortKey]] = {
+    sort_key.order: sort_key for sort_key in (HilbertKey, ZOrderKey, PropertyKey)
+}
+
+
+def get_sort_key(spec: Union[str, SortKey]) -> SortKey:
+    """
+    Resolve a sort order into a SortKey.
+
+    Args:
+        spec (Union[str, SortKey]): `'<order>'` or `'<order>:<parameter>'`, one of
+            `hilbert`, `zorder` or `property`.
+
+    Raises:
+        ValueError: If the order is unknown or its parameter is invalid.
+
+    Returns:
+        SortKey: The resolved sort key.
+    """
+    if isinstance(spec, SortKey):
+        return spec
+    order, sep, parameter = spec.partition(":")
+    if order not in SORT_KEYS:
+        raise ValueError(f"unknown sort order {order}, choose from {list(SORT_KEYS)}")
+    if order == "property":
+        return PropertyKey(parameter)
+    if not sep:
+        return SORT_KEYS[order]()
+    try:
+        bits: int = int(parameter)
+    except ValueError:
+        raise ValueError(f"invalid parameter {parameter} for sort order {order}")
+
+    return SORT_KEYS[order](bits)
+
+
+class ExternalSorter:
+    """Sorter of raw features by key, spilling sorted runs to temporary files
+
+    Attributes:
+        memory_limit (int): Approximate number of bytes of features and keys held in
+            memory before they are spilled as a sorted run.
+        directory (Optional[str]): Directory of the temporary files.
+        runs (List[IO[bytes]]): Temporary files of the runs spilled so far.
+        count (int): Number of features added.
+    """
+
+    def __init__(
+        self, memory_limit: Optional[int] = None, directory: Optional[str] = None
+    ) -> None:
+        """
+        Constructor for ExternalSorter
+
+        Args:
+            memory_limit (Optional[int], optional): Approximate size of every run, in
+                bytes, see `RECORD_OVERHEAD`. Defaults to 256 MiB.
+            directory (Optional[str], optional): Directory of the temporary files.
+                Defaults to the directory of `tempfile`.
+        """
+        self.memory_limit = (
+            memory_limit if memory_limit is not None else DEFAULT_MEMORY_LIMIT
+        )
+        self.directory = directory
+        self.runs: List[IO[bytes]] = []
+        self.count: int = 0
+        self._records: List[Record] = []
+        self._size: int = 0
+
+    def __enter__(self) -> "ExternalSorter":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def add(self, key: Any, raw: Union[bytes, memoryview]) -> None:
+        """Add a feature, spilling a run first if the memory limit is reached."""
+        data: bytes = bytes(raw)
+        size: int = len(data) + RECORD_OVERHEAD
+        if self._records and self._size + size > self.memory_limit:
+            self._spill()
+        # the position of every feature breaks ties, so that raw bytes are never compared
+        self._records.append((key, self.count, data))
+        self._size += size
+        self.count += 1
+
+    def _spill(self) -> None:
+        """Sort the features held in memory and write them to a new run."""
+        self._records.sort()
+        self.runs.append(self._write_run(iter(self._records)))
+        self._records = []
+        self._size = 0
+
+    def _write_run(self, records: Iterator[Record]) -> IO[bytes]:
+        run: IO[bytes] = tempfile.TemporaryFile(
+            prefix="geojsplit-", suffix=".run", dir=self.directory
+        )
+        pickler: pickle.Pickler = pickle.Pickler(run, protocol=pickle.HIGHEST_PROTOCOL)
+        record: Record
+        for record in records:
+            pickler.dump(record)
+            pickler.clear_memo()  # records are independent, do not grow the memo
+        run.flush()
+        return run
+
+    @staticmethod
+    def _read_run(run: IO[bytes]) -> Iterator[Record]:
+        run.seek(0)
+        reader: IO[bytes] = open(run.fileno(), "rb", RUN_BUFFER_SIZE, closefd=False)
+        with reader:
+            unpickler: pickle.Unpickler = pickle.Unpickler(reader)
+            while True:
+                try:
+                    yield unpickler.load()
+                except EOFError:
+                    return
+
+    def _merge(self, runs: List[IO[bytes]]) -> Iterator[Record]:
+        return heapq.merge(*(self._read_run(run) for run in runs))
+
+    def sorted(self) -> Iterator[bytes]:
+        """
+        Generator method to yield the raw bytes of every feature added, by key.
+
+        Features still held in memory are merged with the spilled runs directly, without
+        being spilled first. Runs are closed, and their temporary files removed, once
+        every feature is yielded.
+
+        Yields:
+            (Iterator[bytes]): The raw bytes of the next feature.
+        """
+        self._records.sort()
+        records: List[Record] = self._records
+        self._records = []
+        self._size = 0
+        try:
+            while len(self.runs) > MERGE_WIDTH:
+                merged: List[IO[bytes]] = self.runs[:MERGE_WIDTH]
+                self.runs = self.runs[MERGE_WIDTH:] + [
+                    self._write_run(self._merge(merged))
+                ]
+                run: IO[bytes]
+                for run in merged:
+                    run.close()
+
+            record: Record
+            for record in heapq.merge(self._merge(self.runs), records):
+                yield record[2]
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """Remove the temporary files of the runs."""
+        run: IO[bytes]
+        for run in self.runs:
+            run.close()
+        self.runs = []
+        self._records = []
@@ -0,0 +1,382 @@
+"""Module for vectorized coordinate transforms applied while splitting
+
+Rounding, dropping Z values or reprojecting coordinates one position at a time over the
+nested lists of `Decimal` built by ijson is slow. Instead, the coordinates of a whole
+batch of features are flattened into a single contiguous array of positions together
+with the lengths of every nested list (`FlatCoordinates`), transformed in one vectorized
+call, and only nested back into lists once the batch is about to be serialized.
+
+The `bbox` members of transformed features and geometries are computed again from their
+transformed coordinates, with as many dimensions as before unless Z values are dropped.
+
+Transforms require the optional `numpy` package. Only coordinates are converted from
+`Decimal` to floats, while they are flattened, so that the numbers of properties and other
+members are written back exactly as they were read.
+"""
+import gc
+import itertools
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set, Union
+
+from .partition import MAX_LATITUDE, _iter_geometry_positions
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+EARTH_RADIUS: float = 6378137.0  # semi-major axis of WGS 84, used by web mercator
+
+# nesting depth of the coordinates of each geometry type, above single positions
+DEPTHS: Dict[str, int] = {
+    "Point": 0,
+    "MultiPoint": 1,
+    "LineString": 1,
+    "MultiLineString": 2,
+    "Polygon": 2,
+    "MultiPolygon": 3,
+}
+
+Function = Callable[[Any], Any]
+
+
+def _require_numpy() -> None:
+    if numpy is None:
+        raise ValueError("coordinate transforms require the numpy package")
+
+
+def to_mercator(positions: Any) -> Any:
+    """Project longitudes and latitudes to web mercator (EPSG:4326 to EPSG:3857)."""
+    projected = positions.copy()
+    projected[:, 0] = numpy.radians(positions[:, 0]) * EARTH_RADIUS
+    latitudes = numpy.radians(numpy.clip(positions[:, 1], -MAX_LATITUDE, MAX_LATITUDE))
+    projected[:, 1] = numpy.log(numpy.tan(numpy.pi / 4 + latitudes / 2)) * EARTH_RADIUS
+    return projected
+
+
+def from_mercator(positions: Any) -> Any:
+    """Unproject web mercator to longitudes and latitudes (EPSG:3857 to EPSG:4326)."""
+    unprojected = positions.copy()
+    unprojected[:, 0] = numpy.degrees(positions[:, 0] / EARTH_RADIUS)
+    unprojected[:, 1] = numpy.degrees(
+        2 * numpy.arctan(numpy.exp(positions[:, 1] / EARTH_RADIUS)) - numpy.pi / 2
+    )
+    return unprojected
+
+
+def swap_xy(positions: Any) -> Any:
+    """Swap the first two axes, e.g. latitude, longitude positions to longitude, latitude."""
+    swapped = positions.copy()
+    swapped[:, [0, 1]] = positions[:, [1, 0]]
+    return swapped
+
+
+TRANSFORMS: Dict[str, Function] = {
+    "to-mercator": to_mercator,
+    "from-mercator": from_mercator,
+    "swap-xy": swap_xy,
+}
+
+
+def _geometry_depth(geometry: Dict[str, Any]) -> int:
+    """Nesting depth of the coordinates of a geometry, inferred for unknown types."""
+    depth: Optional[int] = DEPTHS.get(geometry.get("type"))
+    if depth is None:
+        depth = 0
+        coordinates: Any = geometry["coordinates"]
+        while coordinates and isinstance(coordinates[0], list):
+            coordinates = coordinates[0]
+            depth += 1
+    return depth
+
+
+def _iter_geometries(geometry: Optional[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Geometries holding coordinates, descending into geometry collections."""
+    if not geometry:
+        return
+    if "geometries" in geometry:
+        member: Dict[str, Any]
+        for member in geometry["geometries"] or []:
+            yield from _iter_geometries(member)
+    elif geometry.get("coordinates") is not None:
+        yield geometry
+
+
+def _update_bbox(obj: Dict[str, Any]) -> None:
+    """
+    Compute the `bbox` member of a feature or geometry, and of the geometries it holds,
+    from their coordinates. Bounding boxes of objects without positions are removed.
+    """
+    geometry: Any = obj.get("geometry") if "geometry" in obj else obj
+    if geometry is not obj and geometry:
+        _update_bbox(geometry)
+    member: Dict[str, Any]
+    for member in obj.get("geometries") or []:
+        _update_bbox(member)
+    if "bbox" not in obj:
+        return
+
+    positions: List[Sequence[float]] = (
+        list(_iter_geometry_positions(geometry)) if geometry else []
+    )
+    if not positions:
+        del obj["bbox"]
+        return
+    dimensions: int = min(
+        len(obj["bbox"] or []) // 2 or 2, min(len(position) for position in positions)
+    )
+    axis: int
+    obj["bbox"] = [
+        min(position[axis] for position in positions) for axis in range(dimensions)
+    ] + [max(position[axis] for position in positions) for axis in range(dimensions)]
+
+
+@contextmanager
+def _gc_paused() -> Iterator[None]:
+    enabled: bool = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _flatten(
+    coordinates: Any, depth: int, positions: List[Any], lengths: List[int]
+) -> None:
+    if depth == 0:
+        positions.append(coordinates)
+        return
+    lengths.append(len(coordinates))
+    if depth == 1:
+        positions.extend(coordinates)  # innermost lists are copied without a loop
+        return
+    child: Any
+    for child in coordinates:
+        _flatten(child, depth - 1, positions, lengths)
+
+
+def _nest(
+    depth: int, positions: List[Any], lengths: Iterator[int], start: int
+) -> Any:
+    """Inverse of `_flatten`, returning the nested coordinates and the next position."""
+    if depth == 0:
+        return positions[start], start + 1
+    count: int = next(lengths)
+    if depth == 1:
+        return positions[start : start + count], start + count
+    nested: List[Any] = []
+    for _ in range(count):
+        child: Any
+        child, start = _nest(depth - 1, positions, lengths, start)
+        nested.append(child)
+    return nested, start
+
+
+class FlatCoordinates:
+    """Coordinates of many geometries flattened into a single array of positions
+
+    Attributes:
+        positions (numpy.ndarray): Array of shape `(n, dimensions)` of every position,
+            in the order they appear in the geometries. Positions with fewer dimensions
+            than others are padded with NaN.
+        sizes (Optional[numpy.ndarray]): Number of dimensions of every position, or None
+            when all positions have the same number of dimensions.
+        lengths (List[int]): Length of every nested list of coordinates above positions,
+            depth first, e.g. the number of rings of a polygon followed by the number of
+            positions of each ring.
+        depths (List[int]): Nesting depth of the coordinates of each geometry.
+    """
+
+    def __init__(
+        self,
+        positions: Any,
+        sizes: Optional[Any],
+        lengths: List[int],
+        depths: List[int],
+    ) -> None:
+        self.positions = positions
+        self.sizes = sizes
+        self.lengths = lengths
+        self.depths = depths
+
+    @classmethod
+    def from_geometries(cls, geometries: List[Dict[str, Any]]) -> "FlatCoordinates":
+        """
+        Flatten the coordinates of geometries, touching every nested list but not every
+        position from python.
+
+        Args:
+            geometries (List[Dict[str, Any]]): Geometries with a `coordinates` member.
+
+        Raises:
+            ValueError: If numpy is not installed.
+
+        Returns:
+            FlatCoordinates: The flattened coordinates.
+        """
+        _require_numpy()
+        positions: List[Any] = []
+        lengths: List[int] = []
+        depths: List[int] = []
+        geometry: Dict[str, Any]
+        for geometry in geometries:
+            depth: int = _geometry_depth(geometry)
+            _flatten(geometry["coordinates"], depth, positions, lengths)
+            depths.append(depth)
+
+        if not positions:
+            return cls(numpy.empty((0, 2)), None, lengths, depths)
+        dimensions: Set[int] = set(map(len, positions))
+        if len(dimensions) == 1:
+            dimension: int = dimensions.pop()
+            array = numpy.fromiter(
+                itertools.chain.from_iterable(positions),
+                dtype=numpy.float64,
+                count=len(positions) * dimension,
+            )
+            return cls(array.reshape(-1, dimension), None, lengths, depths)
+
+        # positions of different dimensions are padded one at a time
+        sizes = numpy.array([len(p) for p in positions], dtype=numpy.intp)
+        array = numpy.full((len(positions), sizes.max()), numpy.nan)
+        i: int
+        position: Any
+        for i, position in enumerate(positions):
+            array[i, : len(position)] = position
+
+        return cls(array, sizes, lengths, depths)
+
+    def nest(self) -> List[Any]:
+        """
+        Nest positions back into the coordinates of every geometry.
+
+        The garbage collector is paused meanwhile: the many lists built here can not
+        form cycles, and would otherwise trigger repeated collections scanning every
+        feature held in memory.
+        """
+        with _gc_paused():
+            return self._nest()
+
+    def _nest(self) -> List[Any]:
+        positions: List[Any] = self.positions.tolist()
+        if self.sizes is not None:
+            positions = [p[:size] for p, size in zip(positions, self.sizes.tolist())]
+        lengths: Iterator[int] = iter(self.lengths)
+        coordinates: List[Any] = []
+        start: int = 0
+        depth: int
+        for depth in self.depths:
+            nested: Any
+            nested, start = _nest(depth, positions, lengths, start)
+            coordinates.append(nested)
+        return coordinates
+
+
+class CoordinateTransform:
+    """Vectorized transform of the coordinates of batches of features
+
+    Transforms are applied in order: dropping Z values, then `function`, then rounding.
+
+    Attributes:
+        precision (Optional[int]): Number of decimals coordinates are rounded to.
+        drop_z (bool): Whether only the first two dimensions of positions are kept.
+        function (Optional[Function]): Function of an array of positions of shape
+            `(n, dimensions)` returning the transformed array, e.g. one of `TRANSFORMS`.
+    """
+
+    def __init__(
+        self,
+        precision: Optional[int] = None,
+        drop_z: bool = False,
+        function: Optional[Union[str, Function]] = None,
+    ) -> None:
+        """
+        Constructor for CoordinateTransform
+
+        Args:
+            precision (Optional[int], optional): Number of decimals coordinates are
+                rounded to. Defaults to no rounding.
+            drop_z (bool, optional): Keep only the first two dimensions of positions.
+                Defaults to False.
+            function (Optional[Union[str, Function]], optional): Name of one of
+                `TRANSFORMS`, or a vectorized function of an array of positions, e.g.
+                wrapping `pyproj.Transformer.transform`. Defaults to None.
+
+        Raises:
+            ValueError: If `function` is an unknown name or numpy is not installed.
+        """
+        if isinstance(function, str):
+            if function not in TRANSFORMS:
+                raise ValueError(
+                    f"unknown transform {function}, choose from {list(TRANSFORMS)}"
+                )
+            function = TRANSFORMS[function]
+        self.precision = precision
+        self.drop_z = drop_z
+        self.function: Optional[Function] = function
+        if self:
+            _require_numpy()
+
+    def __bool__(self) -> bool:
+        return self.precision is not None or self.drop_z or self.function is not None
+
+    def transform(self, positions: Any) -> Any:
+        """Transform an array of positions of shape `(n, dimensions)` at once."""
+        if self.drop_z:
+            positions = positions[:, :2]
+        if self.function is not None:
+            positions = self.function(positions)
+        if self.precision is not None:
+            positions = numpy.round(positions, self.precision)
+        return positions
+
+    def apply(self, features: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Transform the coordinates of a batch of features with a single vectorized call.
+
+        Args:
+            features (List[Dict[str, Any]]): Features, or bare geometries. Their
+                geometries, and `bbox` members, are updated in place.
+
+        Returns:
+            List[Dict[str, Any]]: `features`.
+        """
+        geometries: List[Dict[str, Any]] = []
+        feature: Dict[str, Any]
+        for feature in features:
+            geometry: Any = feature.get("geometry") if "geometry" in feature else feature
+            geometries.extend(_iter_geometries(geometry))
+        if not self or not geometries:
+            return features
+
+        flat: FlatCoordinates = FlatCoordinates.from_geometries(geometries)
+        flat.positions = self.transform(flat.positions)
+        if self.drop_z and flat.sizes is not None:
+            flat.sizes = numpy.minimum(flat.sizes, 2)
+        coordinates: Any
+        for geometry, coordinates in zip(geometries, flat.nest()):
+            geometry["coordinates"] = coordinates
+        for feature in features:
+            _update_bbox(feature)
+        return features
+
+    def apply_iter(
+        self, features: Iterator[Dict[str, Any]], batch: int = 1000
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Generator method to transform features one batch of `batch` at a time.
+
+        Yields:
+            (Iterator[Dict[str, Any]]): The next transformed feature.
+        """
+        data: List[Dict[str, Any]] = []
+        feature: Dict[str, Any]
+        for feature in features:
+            data.append(feature)
+            if len(data) >= batch:
+                yield from self.apply(data)
+                data = []
+        if data:
+            yield from self.apply(data)
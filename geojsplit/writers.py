@@ -0,0 +1,436 @@
+"""Module for writing Feature Collections one feature at a time
+
+Batches of features are normally gathered in memory and written at once. The writers of
+this module instead write every feature as soon as it is read, between the header and
+footer of a Feature Collection (see `scanner.dump_raw`), so that memory use stays at a
+single feature however large the output files are.
+
+Writers can also be suspended, closing their file without finishing the Feature
+Collection, and resumed later by appending to it. `WriterCache` relies on this to write
+to many more files than there are file descriptors available.
+
+Files are written atomically: their content goes to a `.part` file next to them, which is
+only renamed to the output filename once complete, so that a file which is interrupted
+while being written never looks complete. Writers used as context managers abort their
+files that are not closed yet, removing the `.part` files, when an exception is raised.
+"""
+import logging
+import os
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterator, Optional, Union
+
+from .compression import open_compressed
+from .scanner import FEATURE_COLLECTION_FOOTER, FEATURE_COLLECTION_HEADER
+from .sinks import GeoJSONSink, TextSink
+
+# bytes of an empty Feature Collection, the smallest file which can be written
+ENVELOPE_SIZE: int = len(FEATURE_COLLECTION_HEADER) + len(FEATURE_COLLECTION_FOOTER)
+PARTIAL_SUFFIX: str = ".part"
+
+
+def partial_path(filename: Path) -> Path:
+    """Filename of the incomplete content of `filename`, e.g. `a.geojson.part`."""
+    return filename.with_name(filename.name + PARTIAL_SUFFIX)
+
+
+def _make_parent(filename: Path) -> None:
+    if not filename.parent.exists():
+        logging.getLogger(__name__).debug(
+            f"creating output directory {filename.parent}"
+        )
+        filename.parent.mkdir(parents=True, exist_ok=True)
+
+
+@contextmanager
+def atomic_open(
+    filename: Path, compress: Optional[str] = None, level: Optional[int] = None
+) -> Iterator[BinaryIO]:
+    """
+    Open a file for writing, replacing `filename` only once it is completely written.
+
+    Args:
+        filename (Path): Output filename. Missing parent directories are created.
+        compress (Optional[str], optional): Compression of the file, one of
+            `compression.COMPRESSIONS`. Defaults to None.
+        level (Optional[int], optional): Compression level. Defaults to the library
+            default.
+
+    Yields:
+        (Iterator[BinaryIO]): A binary file object writing to `partial_path(filename)`.
+            The partial file is removed if an exception is raised.
+    """
+    _make_parent(filename)
+    partial: Path = partial_path(filename)
+    try:
+        with open_compressed(partial, compress, level) as fp:
+            yield fp
+    except BaseException:
+        if partial.exists():
+            partial.unlink()
+        raise
+    os.replace(str(partial), str(filename))
+
+
+class FeatureCollectionWriter:
+    """Incremental writer of a single Feature Collection file, or of a file in another
+    text format
+
+    Attributes:
+        filename (Path): Output filename.
+        sink (TextSink): Format of the file.
+        count (int): Number of features written so far.
+        size (int): Uncompressed size of the file once closed, in bytes.
+    """
+
+    def __init__(
+        self,
+        filename: Path,
+        dry_run: bool = False,
+        compress: Optional[str] = None,
+        level: Optional[int] = None,
+        sink: Optional[TextSink] = None,
+    ) -> None:
+        """
+        Constructor for FeatureCollectionWriter, opening the file and writing its header.
+
+        Args:
+            filename (Path): Output filename. Missing parent directories are created.
+                Features are written to `partial_path(filename)` until the file is
+                closed.
+            dry_run (bool, optional): Count features without writing anything. Defaults
+                to False.
+            compress (Optional[str], optional): Compression of the file, one of
+                `compression.COMPRESSIONS`. Defaults to None.
+            level (Optional[int], optional): Compression level. Defaults to the library
+                default.
+            sink (Optional[TextSink], optional): Format of the file, see `sinks`.
+                Defaults to a Feature Collection.
+        """
+        if sink is None:
+            sink = GeoJSONSink()
+        self.filename = filename
+        self.sink = sink
+        self.count: int = 0
+        self.size: int = sink.envelope_size
+        self._dry_run = dry_run
+        self._compress = compress
+        self._level = level
+        self._fp: Optional[BinaryIO] = None
+        self._suspended: bool = False
+        self._closed: bool = False
+        if not dry_run:
+            _make_parent(filename)
+            self._fp = open_compressed(partial_path(filename), compress, level)
+            self._fp.write(sink.header)
+
+    def __enter__(self) -> "FeatureCollectionWriter":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if exc_info[0] is not None:
+            self.abort()
+        else:
+            self.close()
+
+    def size_with(self, size: int) -> int:
+        """Size of the file if a feature of `size` bytes was written next."""
+        return self.size + self.sink.record_size(size, first=not self.count)
+
+    @property
+    def suspended(self) -> bool:
+        return self._suspended
+
+    def write(self, raw: Union[bytes, memoryview]) -> None:
+        """Append the serialized bytes of a single feature, resuming the file if needed."""
+        if self._suspended:
+            self.resume()
+        self.size = self.size_with(len(raw))
+        if self._fp is not None:
+            if self.count:
+                self._fp.write(self.sink.separator)
+            self._fp.write(self.sink.record_prefix)
+            self._fp.write(self.sink.record(raw))
+            self._fp.write(self.sink.record_suffix)
+        self.count += 1
+
+    def suspend(self) -> None:
+        """Close the file without writing the footer, releasing its file descriptor."""
+        if self._suspended or self._closed:
+            return
+        self._suspended = True
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+    def resume(self) -> None:
+        """Reopen a suspended file to append more features to it."""
+        if not self._suspended:
+            return
+        self._suspended = False
+        if not self._dry_run:
+            self._fp = open_compressed(
+                partial_path(self.filename), self._compress, self._level, append=True
+            )
+
+    def close(self) -> None:
+        """Write the footer, close the file and rename it to its output filename."""
+        if self._closed:
+            return
+        self.resume()
+        self._closed = True
+        if self._fp is not None:
+            try:
+                self._fp.write(self.sink.footer)
+            finally:
+                self._fp.close()
+                self._fp = None
+            os.replace(str(partial_path(self.filename)), str(self.filename))
+
+    def abort(self) -> None:
+        """Close the file without finishing it and remove its partial content."""
+        if self._closed:
+            return
+        self._closed = True
+        self._suspended = False
+        if self._fp is not None:
+            try:
+                self._fp.close()
+            finally:
+                self._fp = None
+        if not self._dry_run:
+            partial: Path = partial_path(self.filename)
+            if partial.exists():
+                partial.unlink()
+
+
+class RollingWriter:
+    """Writer spreading features over as many files as needed to respect size limits
+
+    Features are appended to the current file until the next one would make it larger
+    than `max_bytes` or hold more than `max_features` features, at which point the file
+    is closed and the next one is opened. A feature larger than `max_bytes` on its own is
+    written alone to a file which exceeds the limit, since features are never split.
+
+    Attributes:
+        max_bytes (Optional[int]): Maximum uncompressed size of each file, in bytes.
+        max_features (Optional[int]): Maximum number of features of each file.
+        file_count (int): Number of files opened so far.
+    """
+
+    def __init__(
+        self,
+        filename: Callable[[int], Path],
+        max_bytes: Optional[int] = None,
+        max_features: Optional[int] = None,
+        dry_run: bool = False,
+        compress: Optional[str] = None,
+        level: Optional[int] = None,
+        on_close: Optional[Callable[[FeatureCollectionWriter], None]] = None,
+        sink: Optional[TextSink] = None,
+    ) -> None:
+        """
+        Constructor for RollingWriter
+
+        Args:
+            filename (Callable[[int], Path]): Function returning the filename of the
+                n-th file, starting from 0.
+            max_bytes (Optional[int], optional): Maximum uncompressed size of each file,
+                in bytes. Defaults to no limit.
+            max_features (Optional[int], optional): Maximum number of features of each
+                file. Defaults to no limit.
+            dry_run (bool, optional): Count features without writing anything. Defaults
+                to False.
+            compress (Optional[str], optional): Compression of the files. Defaults to
+                None.
+            level (Optional[int], optional): Compression level. Defaults to the library
+                default.
+            on_close (Optional[Callable[[FeatureCollectionWriter], None]], optional):
+                Called with the writer of every file once it is closed. Defaults to None.
+            sink (Optional[TextSink], optional): Format of the files. Defaults to
+                Feature Collections.
+        """
+        self.max_bytes = max_bytes
+        self.max_features = max_features
+        self.file_count: int = 0
+        self._filename = filename
+        self._dry_run = dry_run
+        self._compress = compress
+        self._level = level
+        self._on_close = on_close
+        self._sink = sink
+        self._current: Optional[FeatureCollectionWriter] = None
+
+    def __enter__(self) -> "RollingWriter":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if exc_info[0] is not None:
+            self.abort()
+        else:
+            self.close()
+
+    def fits(self, size: int) -> bool:
+        """Whether a feature of `size` bytes can be appended to the current file."""
+        current: Optional[FeatureCollectionWriter] = self._current
+        if current is None:
+            return False
+        if current.count == 0:
+            return True
+        if self.max_features is not None and current.count >= self.max_features:
+            return False
+        if self.max_bytes is not None and current.size_with(size) > self.max_bytes:
+            return False
+        return True
+
+    def write(self, raw: Union[bytes, memoryview]) -> None:
+        """
+        Append the serialized bytes of a single feature, opening a new file if needed.
+
+        Raises:
+            TypeError: If no unique filename can be generated for a new file.
+        """
+        if not self.fits(len(raw)):
+            self._roll()
+        self._current.write(raw)
+
+    def _roll(self) -> None:
+        """Close the current file and open the next one."""
+        self.close()
+        filename: Path = self._filename(self.file_count)
+        self._current = FeatureCollectionWriter(
+            filename,
+            dry_run=self._dry_run,
+            compress=self._compress,
+            level=self._level,
+            sink=self._sink,
+        )
+        self.file_count += 1
+
+    def close(self) -> None:
+        """Close the current file, if any."""
+        current: Optional[FeatureCollectionWriter] = self._current
+        if current is None:
+            return
+        self._current = None
+        current.close()
+        if self._on_close is not None:
+            self._on_close(current)
+
+    def abort(self) -> None:
+        """Abort the current file, if any, keeping the files already closed."""
+        current: Optional[FeatureCollectionWriter] = self._current
+        if current is None:
+            return
+        self._current = None
+        current.abort()
+
+
+class WriterCache:
+    """Writers of many files, keeping only the most recently used ones open
+
+    Every key is written to its own file. At most `max_open` files are open at once:
+    when one more is needed, the least recently used writer is suspended and resumed
+    by appending to its file the next time its key is written to.
+
+    Attributes:
+        max_open (int): Maximum number of files open at once.
+        writers (Dict[str, FeatureCollectionWriter]): Writer of every key seen so far,
+            in the order keys were first written to.
+    """
+
+    def __init__(
+        self,
+        filename: Callable[[str], Path],
+        max_open: Optional[int] = None,
+        dry_run: bool = False,
+        compress: Optional[str] = None,
+        level: Optional[int] = None,
+        sink: Optional[TextSink] = None,
+    ) -> None:
+        """
+        Constructor for WriterCache
+
+        Args:
+            filename (Callable[[str], Path]): Function returning the filename of a key.
+            max_open (Optional[int], optional): Maximum number of files open at once.
+                Defaults to 256.
+            dry_run (bool, optional): Count features without writing anything. Defaults
+                to False.
+            compress (Optional[str], optional): Compression of the files. Defaults to
+                None.
+            level (Optional[int], optional): Compression level. Defaults to the library
+                default.
+            sink (Optional[TextSink], optional): Format of the files. Defaults to
+                Feature Collections.
+        """
+        if max_open is None:
+            max_open = 256
+        self.max_open = max_open
+        self.writers: Dict[str, FeatureCollectionWriter] = {}
+        self._filename = filename
+        self._dry_run = dry_run
+        self._compress = compress
+        self._level = level
+        self._sink = sink
+        self._open: "OrderedDict[str, FeatureCollectionWriter]" = OrderedDict()
+
+    def __enter__(self) -> "WriterCache":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if exc_info[0] is not None:
+            self.abort()
+        else:
+            self.close()
+
+    def _get(self, key: str) -> FeatureCollectionWriter:
+        """Return the writer of `key`, making room for it among the open files."""
+        writer: Optional[FeatureCollectionWriter] = self._open.get(key)
+        if writer is not None:
+            self._open.move_to_end(key)
+            return writer
+
+        if len(self._open) >= self.max_open:
+            _, evicted = self._open.popitem(last=False)
+            evicted.suspend()
+        writer = self.writers.get(key)
+        if writer is None:
+            writer = FeatureCollectionWriter(
+                self._filename(key),
+                dry_run=self._dry_run,
+                compress=self._compress,
+                level=self._level,
+                sink=self._sink,
+            )
+            self.writers[key] = writer
+        else:
+            writer.resume()
+        self._open[key] = writer
+        return writer
+
+    def write(self, key: str, raw: Union[bytes, memoryview]) -> None:
+        """Append the serialized bytes of a single feature to the file of `key`."""
+        self._get(key).write(raw)
+
+    def finish(self, key: str) -> None:
+        """Close the file of `key` for good, once no more features will be written to it."""
+        self._open.pop(key, None)
+        writer: Optional[FeatureCollectionWriter] = self.writers.get(key)
+        if writer is not None:
+            writer.close()
+
+    def close(self) -> None:
+        """Finish and close every file, one at a time."""
+        self._open.clear()
+        writer: FeatureCollectionWriter
+        for writer in self.writers.values():
+            writer.close()
+
+    def abort(self) -> None:
+        """Abort every file not finished yet, keeping the files already finished."""
+        self._open.clear()
+        writer: FeatureCollectionWriter
+        for writer in self.writers.values():
+            writer.abort()
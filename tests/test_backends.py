@@ -0,0 +1,42 @@
+import io
+import itertools
+from decimal import Decimal
+
+import pytest
+from geojsplit import backends
+
+geojson_bytes = b"""{"type": "FeatureCollection", "features": [{"type": "Feature", "properties": {"a": 1.10, "b": 1e5, "c": -118.25463812345678901, "d": 3, "e": 123456789012345678901234567890, "name": "\\u00e9"}, "geometry": {"type": "Point", "coordinates": [0.1, 0.2]}}]}"""
+
+
+def test_get_backend_auto():
+    backend = backends.get_backend()
+    assert backend.parser == backends.available_parsers()[0]
+    assert backend.serializer == "simplejson"
+
+
+def test_get_backend_partial_names():
+    assert backends.get_backend("python").parser == "python"
+    assert backends.get_backend("simplejson").serializer == "simplejson"
+    assert backends.get_backend("python+simplejson").name == "python+simplejson"
+
+
+@pytest.mark.parametrize("name", ["nope", "python+nope"])
+def test_get_backend_unknown(name):
+    with pytest.raises(ValueError):
+        backends.get_backend(name)
+
+
+@pytest.mark.parametrize(
+    "parser,serializer",
+    itertools.product(backends.available_parsers(), backends.available_serializers()),
+)
+def test_roundtrip_is_identical_across_backends(parser, serializer):
+    backend = backends.Backend(parser, serializer)
+    reference = backends.Backend("python", "simplejson")
+    features = list(backend.items(io.BytesIO(geojson_bytes), "features.item"))
+
+    assert features == list(reference.items(io.BytesIO(geojson_bytes), "features.item"))
+    assert features[0]["properties"]["c"] == Decimal("-118.25463812345678901")
+    assert reference.loads(backend.dumps(features)) == features
+    assert str(reference.loads(backend.dumps(features))[0]["properties"]["a"]) == "1.10"
+    assert features[0]["properties"]["e"] == 123456789012345678901234567890
@@ -0,0 +1,50 @@
+import json
+
+import geojson
+import pytest
+from geojsplit import bench, cli
+
+
+def test_generate_geojson_is_reproducible(tmp_path):
+    first = tmp_path / "first.geojson"
+    second = tmp_path / "second.geojson"
+    count = bench.generate_geojson(first, 0.05, seed=1)
+    bench.generate_geojson(second, 0.05, seed=1)
+
+    assert first.read_bytes() == second.read_bytes()
+    assert first.stat().st_size >= 0.05 * 10 ** 6
+    with first.open() as f:
+        feature_collection = geojson.load(f)
+    assert feature_collection.is_valid
+    assert len(feature_collection["features"]) == count
+
+
+def test_generate_features_geometry_types():
+    features = bench.generate_features(geometry_types=["MultiPolygon"], properties=3)
+    feature = next(features)
+
+    assert feature["geometry"]["type"] == "MultiPolygon"
+    assert len(feature["properties"]) == 3
+    with pytest.raises(ValueError):
+        next(bench.generate_features(geometry_types=["Circle"]))
+
+
+@pytest.mark.parametrize("mode", bench.MODES)
+def test_run_case(tmp_path, mode):
+    geojson_file = tmp_path / "synthetic.geojson"
+    count = bench.generate_geojson(geojson_file, 0.05)
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    result = bench.run_case(geojson_file, mode, "auto", 10, output_dir)
+
+    assert result["features"] == count
+    assert result["files"] == len(list(output_dir.iterdir())) == -(-count // 10)
+    assert set(result["stages"]) == set(bench.STAGES)
+
+
+def test_bench_subcommand_json(tmp_path, capsys):
+    cli.main(args=["bench", "--size", "0.02", "--modes", "raw", "--json", "-"])
+    report = json.loads(capsys.readouterr().out)
+
+    assert [result["mode"] for result in report["results"]] == ["raw"]
+    assert report["results"][0]["features"] > 0
@@ -0,0 +1,28 @@
+import pytest
+from geojsplit import checkpoint
+
+fingerprint = {"size": 10, "mtime_ns": 1, "hash": "abc"}
+settings = {"geometry_count": 2, "bbox": (0, 0, 1, 1)}
+
+
+def test_checkpoint_roundtrip(tmp_path):
+    path = tmp_path / "a_checkpoint.json"
+    saved = checkpoint.Checkpoint(fingerprint, settings)
+    saved.advance(120, 2)
+    saved.advance(250, 1)
+    saved.save(path)
+
+    loaded = checkpoint.Checkpoint.load(path)
+    assert (loaded.file_count, loaded.feature_count, loaded.offset) == (2, 3, 250)
+    assert loaded.matches(fingerprint, settings)
+    assert not loaded.matches({**fingerprint, "size": 11}, settings)
+    assert not loaded.matches(fingerprint, {**settings, "geometry_count": 3})
+    assert list(tmp_path.iterdir()) == [path]
+
+
+@pytest.mark.parametrize("content", ["[]", "{}", '{"version": 0}', "{"])
+def test_checkpoint_load_invalid(tmp_path, content):
+    path = tmp_path / "a_checkpoint.json"
+    path.write_text(content)
+    with pytest.raises(ValueError):
+        checkpoint.Checkpoint.load(path)
@@ -1,11 +1,20 @@
+import gzip
+import io
+import json
 import logging
+import pstats
+import sys
 from argparse import ArgumentTypeError
 from pathlib import Path
 import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import geojson
 import pytest
 from geojsplit import cli
+from geojsplit.backends import Backend
+from geojsplit.geojsplit import GeoJSONBatchStreamer
 
 
 @pytest.fixture
@@ -108,3 +117,807 @@ def test_input_geojson_geometry_count(random_geojson_file):
     outputs = list(parent.glob("*x*.geojson"))
 
     assert len(outputs) == int(25 // 2 + 1)
+
+
+@pytest.mark.parametrize("extra_args", [[], ["--mmap"]])
+def test_input_geojson_raw_roundtrip(random_geojson_file, extra_args):
+    geojson_file = random_geojson_file(25)
+    tmp_path = geojson_file.parent
+    cli.main(args=["--raw", "--geometry-count", "10", *extra_args, str(geojson_file)])
+    data = []
+    for path in sorted(tmp_path.glob("*_x*.geojson")):
+        with path.open() as f:
+            data.append(geojson.load(f))
+
+    with geojson_file.open() as f:
+        whole_file = geojson.load(f)
+
+    assert len(data) == 3
+    assert whole_file.features == list(
+        itertools.chain.from_iterable(
+            feature_collection.features for feature_collection in data
+        )
+    )
+
+
+@pytest.mark.parametrize("raw", [False, True])
+def test_input_geojson_jobs_matches_sequential(random_geojson_file, raw):
+    geojson_file = random_geojson_file(25)
+    parent = geojson_file.parent
+    extra_args = ["--raw"] if raw else []
+    sequential_dir = parent / "sequential"
+    parallel_dir = parent / "parallel"
+    cli.main(
+        args=["-l", "4", "-o", str(sequential_dir), *extra_args, str(geojson_file)]
+    )
+    cli.main(
+        args=[
+            "-l",
+            "4",
+            "-o",
+            str(parallel_dir),
+            "--jobs",
+            "3",
+            *extra_args,
+            str(geojson_file),
+        ]
+    )
+    sequential = sorted(sequential_dir.glob("*_x*.geojson"))
+    parallel = sorted(parallel_dir.glob("*_x*.geojson"))
+
+    assert [path.name for path in sequential] == [path.name for path in parallel]
+    for sequential_path, parallel_path in zip(sequential, parallel):
+        assert sequential_path.read_bytes() == parallel_path.read_bytes()
+
+
+def test_input_geojson_jobs_limit(random_geojson_file):
+    geojson_file = random_geojson_file(10)
+    parent = geojson_file.parent
+    cli.main(args=["-l", "2", "--limit", "3", "--jobs", "2", str(geojson_file)])
+
+    assert len(list(parent.glob("*x*.geojson"))) == 3
+
+
+def test_input_geojson_jobs_reads_spans_lazily(random_geojson_file, monkeypatch):
+    geojson_file = random_geojson_file(40)
+    spans = GeoJSONBatchStreamer.spans
+    write_span_batches = cli.write_span_batches
+    read = []
+    submitted = []
+
+    def counted_spans(self, *args, **kwargs):
+        for span in spans(self, *args, **kwargs):
+            read.append(span)
+            yield span
+
+    def write(geojson_file, batches, *args):
+        submitted.append(len(read))
+        return write_span_batches(geojson_file, batches, *args)
+
+    monkeypatch.setattr(GeoJSONBatchStreamer, "spans", counted_spans)
+    monkeypatch.setattr(cli, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(cli, "write_span_batches", write)
+    monkeypatch.setattr(cli, "TASK_BATCHES", 1)
+    cli.main(args=["-l", "2", "--jobs", "2", str(geojson_file)])
+
+    assert len(list(geojson_file.parent.glob("*x*.geojson"))) == 20
+    # at most five pending tasks and the batch being read when the first one runs
+    assert len(submitted) == 20 and submitted[0] <= 12
+
+
+@pytest.mark.parametrize("extra_args", [[], ["--raw"], ["--jobs", "2"]])
+def test_input_geojson_index(random_geojson_file, extra_args):
+    geojson_file = random_geojson_file(25)
+    parent = geojson_file.parent
+    cli.main(args=["-l", "4", "-o", str(parent / "scan"), str(geojson_file)])
+    cli.main(
+        args=["-l", "4", "-o", str(parent / "index"), "--index", *extra_args]
+        + [str(geojson_file)]
+    )
+    scanned = sorted((parent / "scan").glob("*_x*.geojson"))
+    indexed = sorted((parent / "index").glob("*_x*.geojson"))
+
+    assert (parent / "random.geojson.idx").exists()
+    assert [path.name for path in scanned] == [path.name for path in indexed]
+    for scanned_path, indexed_path in zip(scanned, indexed):
+        with scanned_path.open() as f, indexed_path.open() as g:
+            assert geojson.load(f) == geojson.load(g)
+
+
+def test_input_geojson_backend(random_geojson_file):
+    geojson_file = random_geojson_file(5)
+    parent = geojson_file.parent
+    cli.main(args=["--backend", "python+simplejson", str(geojson_file)])
+
+    with (parent / "random_xaaaa.geojson").open() as f, geojson_file.open() as g:
+        assert geojson.load(f) == geojson.load(g)
+
+
+def test_exit_on_invalid_backend(geojsplit_parser):
+    with pytest.raises(SystemExit) as cm:
+        geojsplit_parser.parse_args(["--backend", "nope", "some.geojson"])
+
+    assert cm.value.code == 2
+
+
+@pytest.mark.parametrize("extra_args", [[], ["--raw"], ["--queue-depth", "1"]])
+def test_input_geojson_writers(random_geojson_file, extra_args):
+    geojson_file = random_geojson_file(25)
+    parent = geojson_file.parent
+    cli.main(args=["-l", "4", "-o", str(parent / "inline"), str(geojson_file)])
+    cli.main(
+        args=["-l", "4", "-o", str(parent / "pool"), "--writers", "3", *extra_args]
+        + [str(geojson_file)]
+    )
+    inline = sorted((parent / "inline").glob("*_x*.geojson"))
+    pool = sorted((parent / "pool").glob("*_x*.geojson"))
+
+    assert [path.name for path in inline] == [path.name for path in pool]
+    for inline_path, pool_path in zip(inline, pool):
+        with inline_path.open() as f, pool_path.open() as g:
+            assert geojson.load(f) == geojson.load(g)
+
+
+def test_input_geojson_writers_dry_run_limit(random_geojson_file):
+    geojson_file = random_geojson_file(10)
+    parent = geojson_file.parent
+    cli.main(args=["-l", "2", "-n", "2", "-w", "2", "-d", str(geojson_file)])
+
+    assert list(parent.glob("*x*.geojson")) == []
+    cli.main(args=["-l", "2", "-n", "2", "-w", "2", str(geojson_file)])
+
+    assert len(list(parent.glob("*x*.geojson"))) == 2
+
+
+def test_writer_pool_bounds_pending_writes():
+    running = threading.Semaphore(0)
+    release = threading.Event()
+    submitted = []
+
+    def write(i):
+        running.release()
+        release.wait()
+
+    pool = cli.WriterPool(writers=1, queue_depth=2)
+    submitter = threading.Thread(
+        target=lambda: [submitted.append(pool.submit(write, i)) for i in range(3)]
+    )
+    submitter.start()
+    running.acquire()
+    submitter.join(timeout=0.2)
+
+    assert len(submitted) == 2  # third submit blocks until a write completes
+    release.set()
+    submitter.join()
+    pool.close()
+    assert len(submitted) == 3
+
+
+def test_writer_pool_raises_write_errors():
+    def write():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        with cli.WriterPool(writers=1) as pool:
+            pool.submit(write)
+
+
+def test_input_geojson_stdin_compressed(random_geojson_file, monkeypatch):
+    geojson_file = random_geojson_file(5)
+    parent = geojson_file.parent
+    stdin = io.TextIOWrapper(io.BytesIO(gzip.compress(geojson_file.read_bytes())))
+    monkeypatch.setattr(sys, "stdin", stdin)
+    cli.main(args=["--output", str(parent / "out"), "-"])
+
+    with (parent / "out" / "stdin_xaaaa.geojson").open() as f, geojson_file.open() as g:
+        assert geojson.load(f) == geojson.load(g)
+
+
+@pytest.mark.parametrize("extra_args", [[], ["--raw"], ["--jobs", "2"]])
+def test_input_geojson_compress_output(random_geojson_file, extra_args):
+    geojson_file = random_geojson_file(5)
+    parent = geojson_file.parent
+    cli.main(
+        args=["--compress", "gzip", "--level", "1", *extra_args, str(geojson_file)]
+    )
+
+    with gzip.open(parent / "random_xaaaa.geojson.gz", "rt") as f:
+        with geojson_file.open() as g:
+            assert geojson.load(f) == geojson.load(g)
+
+
+def test_input_geojson_stdout(random_geojson_file, capsysbinary):
+    geojson_file = random_geojson_file(5)
+    cli.main(args=["-l", "2", "--output", "-", str(geojson_file)])
+    lines = capsysbinary.readouterr().out.splitlines()
+
+    assert len(lines) == 3
+    features = itertools.chain.from_iterable(
+        geojson.loads(line)["features"] for line in lines
+    )
+    with geojson_file.open() as g:
+        assert list(features) == geojson.load(g)["features"]
+
+
+@pytest.mark.parametrize(
+    "value,expected", [("100", 100), ("2K", 2048), ("1.5m", 3 << 19), ("1G", 1 << 30)]
+)
+def test_size_type(value, expected):
+    assert cli.size_type(value) == expected
+
+
+@pytest.mark.parametrize("value", ["0", "-1K", "abc", "K"])
+def test_size_type_invalid(value):
+    with pytest.raises(ArgumentTypeError):
+        cli.size_type(value)
+
+
+@pytest.mark.parametrize("extra_args", [[], ["--raw"], ["--compress", "gzip"]])
+def test_input_geojson_max_bytes(random_geojson_file, extra_args):
+    geojson_file = random_geojson_file(50)
+    output = geojson_file.parent / "out"
+    cli.main(
+        args=["--max-bytes", "2K", "--output", str(output), *extra_args]
+        + [str(geojson_file)]
+    )
+
+    features = []
+    for path in sorted(output.glob("*_x*.geojson*")):
+        if path.suffix == ".gz":
+            with gzip.open(path) as f:
+                size = len(f.read())
+            with gzip.open(path, "rt") as f:
+                features.extend(geojson.load(f)["features"])
+        else:
+            size = path.stat().st_size
+            with path.open() as f:
+                features.extend(geojson.load(f)["features"])
+        assert size <= 2048
+    with geojson_file.open() as g:
+        assert features == geojson.load(g)["features"]
+
+
+def test_input_geojson_max_bytes_limit(random_geojson_file):
+    geojson_file = random_geojson_file(50)
+    cli.main(
+        args=["--max-bytes", "1K", "--geometry-count", "2", "--limit", "3"]
+        + [str(geojson_file)]
+    )
+    outputs = sorted(geojson_file.parent.glob("*_x*.geojson"))
+
+    assert len(outputs) == 3
+    for path in outputs:
+        with path.open() as f:
+            assert len(geojson.load(f)["features"]) <= 2
+
+
+@pytest.mark.parametrize(
+    "extra_args",
+    [
+        ["--partition", "grid:45"],
+        ["--partition", "quadtree:5", "--raw", "--max-open", "2"],
+    ],
+)
+def test_input_geojson_partition(random_geojson_file, extra_args):
+    geojson_file = random_geojson_file(50)
+    output = geojson_file.parent / "out"
+    cli.main(args=["--output", str(output), *extra_args, str(geojson_file)])
+
+    with (output / "random_manifest.json").open() as f:
+        manifest = json.load(f)
+    features = []
+    for entry in manifest["partitions"]:
+        with (output / entry["filename"]).open() as f:
+            partition_features = geojson.load(f)["features"]
+        assert len(partition_features) == entry["count"]
+        min_x, min_y, max_x, max_y = entry["extent"]
+        for feature in partition_features:
+            coordinates = feature["coordinates"][0]
+            x = (min(c[0] for c in coordinates) + max(c[0] for c in coordinates)) / 2
+            assert min_x <= x <= max_x
+        features.extend(partition_features)
+
+    assert len(manifest["partitions"]) > 1
+    with geojson_file.open() as g:
+        expected = geojson.load(g)["features"]
+    assert sorted(map(json.dumps, features)) == sorted(map(json.dumps, expected))
+
+
+def test_input_geojson_partition_raw_does_not_parse(random_geojson_file, monkeypatch):
+    def loads(self, raw):
+        raise AssertionError("raw features should not be parsed")
+
+    monkeypatch.setattr(Backend, "loads", loads)
+    geojson_file = random_geojson_file(50)
+    output = geojson_file.parent / "out"
+    cli.main(
+        args=["--output", str(output), "--partition", "grid:45", "--raw"]
+        + [str(geojson_file)]
+    )
+
+    with (output / "random_manifest.json").open() as f:
+        manifest = json.load(f)
+    assert sum(entry["count"] for entry in manifest["partitions"]) == 50
+
+
+@pytest.mark.parametrize(
+    "key,expected", [("BC", "BC"), (12, "12"), (None, "null"), ("a/b c", "a%2Fb%20c")]
+)
+def test_key_to_str(key, expected):
+    assert cli.key_to_str(key) == expected
+
+
+@pytest.fixture
+def state_geojson_file(tmp_path):
+    states = ["BC", "AB", "ON", "BC", None, "BC", "ON", "BC", "AB", "BC"]
+    features = [
+        geojson.Feature(
+            geometry=geojson.Point((i, i)),
+            properties={"id": i} if state is None else {"id": i, "state": state},
+        )
+        for i, state in enumerate(states)
+    ]
+    geojson_file = tmp_path / "states.geojson"
+    with geojson_file.open("w") as f:
+        geojson.dump(geojson.FeatureCollection(features), f)
+
+    return geojson_file
+
+
+BY_STATE = {"BC": [0, 3, 5, 7, 9], "AB": [1, 8], "ON": [2, 6], "null": [4]}
+
+
+@pytest.mark.parametrize(
+    "extra_args,expected",
+    [
+        ([], BY_STATE),
+        (["--raw", "--max-open", "1"], BY_STATE),
+        (
+            ["--geometry-count", "2", "--max-open", "2"],
+            {
+                "BC_xaaaa": [0, 3],
+                "BC_xaaab": [5, 7],
+                "BC_xaaac": [9],
+                "AB_xaaaa": [1, 8],
+                "ON_xaaaa": [2, 6],
+                "null_xaaaa": [4],
+            },
+        ),
+    ],
+)
+def test_input_geojson_split_by(state_geojson_file, extra_args, expected):
+    output = state_geojson_file.parent / "out"
+    cli.main(
+        args=["--split-by", "state", "--output", str(output), *extra_args]
+        + [str(state_geojson_file)]
+    )
+
+    outputs = {}
+    for path in output.glob("states_*.geojson"):
+        with path.open() as f:
+            features = geojson.load(f)["features"]
+        outputs[path.stem[len("states_") :]] = [f["properties"]["id"] for f in features]
+    assert outputs == expected
+
+
+@pytest.mark.parametrize("extra_args", [[], ["--raw"], ["--jobs", "2"]])
+def test_input_geojson_filters(state_geojson_file, extra_args):
+    cli.main(
+        args=["--where", "state=BC", "--where", "id>0", "--bbox", "0,0,6.5,6.5"]
+        + [*extra_args, str(state_geojson_file)]
+    )
+
+    with next(state_geojson_file.parent.glob("*_x*.geojson")).open() as f:
+        features = geojson.load(f)["features"]
+    assert [f["properties"]["id"] for f in features] == [3, 5]
+
+
+def test_exit_on_invalid_bbox(geojsplit_parser):
+    with pytest.raises(SystemExit):
+        geojsplit_parser.parse_args(["--bbox", "0,0,1", "a.geojson"])
+
+
+@pytest.mark.parametrize(
+    "extra_args", [[], ["--max-bytes", "1M"], ["--split-by", "state"]]
+)
+def test_input_geojson_transform(state_geojson_file, extra_args):
+    pytest.importorskip("numpy")
+    output = state_geojson_file.parent / "out"
+    cli.main(
+        args=["--transform", "to-mercator", "--precision", "0", "--output", str(output)]
+        + [*extra_args, str(state_geojson_file)]
+    )
+
+    coordinates = {}
+    for path in output.glob("*.geojson"):
+        with path.open() as f:
+            for feature in geojson.load(f)["features"]:
+                coordinates[feature["properties"]["id"]] = feature["geometry"][
+                    "coordinates"
+                ]
+    assert len(coordinates) == 10
+    assert coordinates[0] == [0, 0]
+    assert coordinates[1] == [111319, 111325]
+
+
+@pytest.mark.parametrize("extra_args", [[], ["--resume"], ["--sort-by", "hilbert"]])
+def test_input_geojson_transform_keeps_properties(tmp_path, extra_args):
+    pytest.importorskip("numpy")
+    properties = (
+        b'{"big": 123456789012345678901234567890, "v": 1.10, '
+        b'"p": -118.25463812345678901}'
+    )
+    geojson_file = tmp_path / "in.geojson"
+    geojson_file.write_bytes(
+        b'{"type": "FeatureCollection", "features": [{"type": "Feature", '
+        b'"properties": ' + properties + b", "
+        b'"geometry": {"type": "Point", "coordinates": [1.5, 2.25, 3]}}]}'
+    )
+    output = tmp_path / "out"
+    cli.main(args=["--drop-z", "--output", str(output), *extra_args, str(geojson_file)])
+
+    (path,) = output.glob("*.geojson")
+    assert properties in path.read_bytes()
+    feature = json.loads(path.read_bytes())["features"][0]
+    assert feature["geometry"]["coordinates"] == [1.5, 2.25]
+
+
+def test_exit_on_raw_transform(state_geojson_file):
+    with pytest.raises(SystemExit):
+        cli.main(args=["--raw", "--drop-z", str(state_geojson_file)])
+
+
+@pytest.mark.parametrize("extra_args", [[], ["--raw", "--where", "id>0"]])
+def test_input_geojson_resume(state_geojson_file, monkeypatch, extra_args):
+    args = ["--resume", "--geometry-count", "3", *extra_args]
+    expected = state_geojson_file.parent / "expected"
+    cli.main(args=args + ["--output", str(expected), str(state_geojson_file)])
+
+    write_features = cli.write_features
+    written = []
+    failing = [True]
+
+    def failing_write_features(features, filename, **kwargs):
+        if failing[0] and len(written) == 2:
+            (filename.parent / "states_xaaac.geojson.part").write_text("{")
+            raise IOError("disk full")
+        written.append(filename)
+        return write_features(features, filename, **kwargs)
+
+    output = state_geojson_file.parent / "out"
+    monkeypatch.setattr(cli, "write_features", failing_write_features)
+    cli.main(args=args + ["--output", str(output), str(state_geojson_file)])
+    assert (output / "states_checkpoint.json").exists()
+    assert sorted(p.name for p in output.iterdir()) == [
+        "states_checkpoint.json",
+        "states_xaaaa.geojson",
+        "states_xaaab.geojson",
+        "states_xaaac.geojson.part",
+    ]
+
+    written.clear()
+    failing[0] = False
+    cli.main(args=args + ["--output", str(output), str(state_geojson_file)])
+    assert written[0].name == "states_xaaac.geojson"
+    assert sorted(p.name for p in output.iterdir()) == sorted(
+        p.name for p in expected.iterdir()
+    )
+    for path in expected.iterdir():
+        assert (output / path.name).read_bytes() == path.read_bytes()
+
+
+def test_input_geojson_resume_other_options(state_geojson_file):
+    output = state_geojson_file.parent / "out"
+    output.mkdir()
+    (output / "states_checkpoint.json").write_text(
+        json.dumps(
+            {
+                "version": 1,
+                "fingerprint": {},
+                "settings": {},
+                "file_count": 1,
+                "feature_count": 3,
+                "offset": 10,
+            }
+        )
+    )
+    cli.main(args=["--resume", "--output", str(output), str(state_geojson_file)])
+
+    assert [p.name for p in output.iterdir()] == ["states_checkpoint.json"]
+
+
+@pytest.mark.parametrize(
+    "extra_args",
+    [[], ["--raw", "--jobs", "2"], ["--max-bytes", "200"], ["--split-by", "state"]],
+)
+def test_input_geojson_ndjson(state_geojson_file, extra_args):
+    output = state_geojson_file.parent / "out"
+    cli.main(
+        args=["--format", "ndjson", "-l", "4", "--output", str(output), *extra_args]
+        + [str(state_geojson_file)]
+    )
+
+    ids = []
+    for path in sorted(output.glob("states_*.geojsonl")):
+        ids.extend(json.loads(line)["properties"]["id"] for line in path.open())
+    assert sorted(ids) == list(range(10))
+
+
+def test_input_geojson_geojsonseq_stdout(state_geojson_file, capsysbinary):
+    cli.main(args=["--format", "geojsonseq", "-o", "-", str(state_geojson_file)])
+    records = capsysbinary.readouterr().out.split(b"\x1e")
+
+    assert records[0] == b""
+    assert [json.loads(r)["properties"]["id"] for r in records[1:]] == list(range(10))
+
+
+@pytest.mark.parametrize("extra_args", [[], ["--raw", "--jobs", "2"]])
+def test_input_geojson_parquet(state_geojson_file, extra_args):
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet
+
+    cli.main(
+        args=["--format", "parquet", "-l", "4", *extra_args, str(state_geojson_file)]
+    )
+    outputs = sorted(state_geojson_file.parent.glob("states_x*.parquet"))
+
+    assert [path.name for path in outputs] == [
+        "states_xaaaa.parquet",
+        "states_xaaab.parquet",
+        "states_xaaac.parquet",
+    ]
+    table = pyarrow.parquet.read_table(outputs[0])
+    assert table.column_names == ["id", "state", "geometry"]
+    assert table.to_pydict()["state"] == ["BC", "AB", "ON", "BC"]
+
+
+@pytest.mark.parametrize(
+    "extra_args", [["--output", "-"], ["--compress", "gzip"], ["--max-bytes", "1M"]]
+)
+def test_exit_on_columnar_format_options(state_geojson_file, extra_args):
+    with pytest.raises(SystemExit):
+        cli.main(args=["--format", "arrow", *extra_args, str(state_geojson_file)])
+
+
+@pytest.mark.parametrize(
+    "extra_args",
+    [[], ["--jobs", "2"], ["--jobs", "2", "--where", "id>=0"], ["--resume"]],
+)
+def test_input_geojson_sequence(state_geojson_file, extra_args):
+    with state_geojson_file.open() as f:
+        features = geojson.load(f)["features"]
+    sequence = state_geojson_file.with_suffix(".geojsonl")
+    sequence.write_text("".join(json.dumps(f) + "\n" for f in features))
+    cli.main(args=["-l", "4", *extra_args, str(sequence)])
+
+    outputs = sorted(sequence.parent.glob("states_x*"))
+    assert [path.name for path in outputs] == [
+        "states_xaaaa.geojson",
+        "states_xaaab.geojson",
+        "states_xaaac.geojson",
+    ]
+    split = []
+    for path in outputs:
+        with path.open() as f:
+            split.extend(geojson.load(f)["features"])
+    assert split == features
+
+
+@pytest.mark.parametrize(
+    "extra_args",
+    [[], ["--raw", "--mmap"], ["--jobs", "2"], ["--max-bytes", "1M"], ["--index"]],
+)
+def test_input_geojson_stats_json(state_geojson_file, capsys, extra_args):
+    stats = state_geojson_file.parent / "stats.jsonl"
+    cli.main(
+        args=[
+            "-l",
+            "4",
+            "--progress",
+            "--stats-json",
+            str(stats),
+            *extra_args,
+            str(state_geojson_file),
+        ]
+    )
+
+    lines = [json.loads(line) for line in stats.read_text().splitlines()]
+    assert lines[-1]["event"] == "close"
+    assert lines[-1]["features"] == 10
+    assert lines[-1]["features_written"] == 10
+    assert lines[-1]["files"] == 3
+    assert lines[-1]["total_bytes"] == state_geojson_file.stat().st_size
+    assert "10 features" in capsys.readouterr().err
+
+
+def test_input_geojson_profile(state_geojson_file):
+    profile = state_geojson_file.parent / "split.prof"
+    cli.main(args=["--profile", str(profile), str(state_geojson_file)])
+
+    stats = pstats.Stats(str(profile))
+    assert any(name == "input_geojson" for _, _, name in stats.stats)
+
+
+@pytest.fixture
+def many_geojson_files(state_geojson_file):
+    data = state_geojson_file.read_text()
+    (state_geojson_file.parent / "more").mkdir()
+    for name in ["more/provinces.geojson", "towns.geojson"]:
+        (state_geojson_file.parent / name).write_text(data)
+    # glob patterns are expanded by the command line tool
+    return [str(state_geojson_file), str(state_geojson_file.parent / "**" / "[pt]*")]
+
+
+@pytest.mark.parametrize("extra_args", [[], ["--jobs", "2"], ["--raw", "--mmap"]])
+def test_input_geojsons(many_geojson_files, tmp_path, extra_args):
+    output = tmp_path / "split"
+    cli.main(args=["-l", "4", "-o", str(output), *extra_args, *many_geojson_files])
+
+    assert sorted(path.name for path in output.glob("*_x*")) == [
+        f"{name}_x{suffix}.geojson"
+        for name in ["provinces", "states", "towns"]
+        for suffix in ["aaaa", "aaab", "aaac"]
+    ]
+    summary = json.loads((output / cli.SUMMARY_NAME).read_text())
+    assert [source["filename"] for source in summary["sources"]] == [
+        str(tmp_path / name)
+        for name in ["states.geojson", "more/provinces.geojson", "towns.geojson"]
+    ]
+    assert [source["features"] for source in summary["sources"]] == [10, 10, 10]
+    assert summary["features"] == 30
+    assert summary["files"] == 9
+    assert summary["bytes"] == 3 * tmp_path.joinpath("towns.geojson").stat().st_size
+
+
+def test_input_geojsons_continuous(many_geojson_files, tmp_path):
+    cli.main(args=["-l", "4", "--continuous", *many_geojson_files])
+
+    batches = [
+        json.loads(path.read_text())["features"]
+        for path in sorted(tmp_path.glob("states_x*.geojson"))
+    ]
+    assert [len(features) for features in batches] == [4] * 7 + [2]
+    assert [f["properties"]["id"] for f in batches[2]] == [8, 9, 0, 1]
+    summary = json.loads((tmp_path / cli.SUMMARY_NAME).read_text())
+    assert summary["continuous"]
+    assert [source["features"] for source in summary["sources"]] == [10, 10, 10]
+    assert summary["files"] == 8
+
+
+@pytest.mark.parametrize(
+    "extra_args",
+    [
+        ["-"],
+        ["--continuous", "--resume", "states.geojson"],
+        ["-o", "split", "states.geojson"],
+        ["missing/*.geojson"],
+    ],
+)
+def test_exit_on_invalid_geojsons(state_geojson_file, monkeypatch, extra_args):
+    monkeypatch.chdir(state_geojson_file.parent)
+    (state_geojson_file.parent / "more").mkdir()
+    (state_geojson_file.parent / "more" / "states.geojson").write_text("{}")
+    with pytest.raises(SystemExit):
+        cli.main(args=["more/states.geojson", *extra_args])
+
+
+def test_count_command(many_geojson_files, capsys):
+    cli.main(args=["count", *many_geojson_files])
+
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split()[0] for line in lines] == ["10", "10", "10", "30"]
+    assert lines[-1] == "30 total"
+
+
+@pytest.mark.parametrize(
+    "extra_args",
+    [["-l", "4"], ["-m", "300"], ["-l", "4", "-n", "2"], ["--where", "state=BC"]],
+)
+def test_input_plan(state_geojson_file, tmp_path, capsys, extra_args):
+    output = tmp_path / "split"
+    cli.main(args=["--plan", "-o", str(output), *extra_args, str(state_geojson_file)])
+    assert not output.exists()
+
+    rows = [line.split("\t") for line in capsys.readouterr().out.splitlines()]
+    cli.main(args=["--raw", "-o", str(output), *extra_args, str(state_geojson_file)])
+    written = sorted(output.iterdir())
+    assert [row[0] for row in rows[:-1]] == [str(path) for path in written]
+    assert [int(row[1]) for row in rows[:-1]] == [
+        len(json.loads(path.read_text())["features"]) for path in written
+    ]
+    assert [int(row[2]) for row in rows[:-1]] == [
+        path.stat().st_size for path in written
+    ]
+    assert rows[-1][0] == "total"
+
+
+def test_input_plan_suffix_capacity(state_geojson_file, monkeypatch, capsys):
+    monkeypatch.setattr(cli, "SUFFIX_ALPHABET", "ab")
+    cli.main(args=["--plan", "-l", "1", "-a", "2", str(state_geojson_file)])
+
+    assert capsys.readouterr().out == ""
+    cli.main(args=["--plan", "-l", "1", "-a", "4", str(state_geojson_file)])
+    assert len(capsys.readouterr().out.splitlines()) == 11
+
+
+def sorted_ids(output):
+    ids = []
+    for path in sorted(output.glob("states_x*")):
+        if path.suffix == ".geojsonl":
+            ids.extend(json.loads(line)["properties"]["id"] for line in path.open())
+        else:
+            features = json.loads(path.read_text())["features"]
+            ids.extend(feature["properties"]["id"] for feature in features)
+    return ids
+
+
+@pytest.mark.parametrize(
+    "extra_args",
+    [
+        [],
+        ["--raw", "--memory-limit", "1"],
+        ["--max-bytes", "300"],
+        ["--writers", "2", "--memory-limit", "500"],
+        ["--format", "ndjson"],
+    ],
+)
+def test_input_geojson_sort_by(state_geojson_file, extra_args):
+    output = state_geojson_file.parent / "out"
+    cli.main(
+        args=["--sort-by", "property:state", "-l", "4", "-o", str(output)]
+        + [*extra_args, str(state_geojson_file)]
+    )
+
+    assert sorted_ids(output) == [1, 8, 0, 3, 5, 7, 9, 2, 6, 4]
+
+
+def test_input_geojson_sort_by_stdout(state_geojson_file, capsysbinary):
+    cli.main(
+        args=["--sort-by", "property:state", "--format", "ndjson", "-o", "-"]
+        + ["--where", "id>2", str(state_geojson_file)]
+    )
+    lines = capsysbinary.readouterr().out.splitlines()
+
+    assert [json.loads(line)["properties"]["id"] for line in lines] == [
+        8,
+        3,
+        5,
+        7,
+        9,
+        6,
+        4,
+    ]
+
+
+def test_input_geojson_sort_by_curve_transform(state_geojson_file):
+    pytest.importorskip("numpy")
+    from geojsplit.sort import HilbertKey
+
+    output = state_geojson_file.parent / "out"
+    cli.main(
+        args=["--sort-by", "hilbert:10", "--transform", "to-mercator"]
+        + ["-o", str(output), str(state_geojson_file)]
+    )
+    with state_geojson_file.open("rb") as f:
+        features = json.load(f)["features"]
+    keys = [HilbertKey(10).key(json.dumps(feature).encode()) for feature in features]
+
+    # keys are those of the input coordinates, not of the transformed ones
+    assert len(set(keys)) > 1
+    assert sorted_ids(output) == sorted(range(10), key=lambda i: keys[i])
+
+
+@pytest.mark.parametrize(
+    "extra_args",
+    [
+        ["--sort-by", "unknown"],
+        ["--sort-by", "hilbert:0"],
+        ["--sort-by", "hilbert", "--split-by", "state"],
+        ["--sort-by", "hilbert", "--partition", "grid"],
+        ["--sort-by", "hilbert", "--resume"],
+        ["--sort-by", "hilbert", "--plan"],
+    ],
+)
+def test_exit_on_invalid_sort_by(state_geojson_file, extra_args):
+    with pytest.raises(SystemExit):
+        cli.main(args=[*extra_args, str(state_geojson_file)])
@@ -0,0 +1,73 @@
+import io
+
+import pytest
+from geojsplit import compression
+
+data = b'{"type": "FeatureCollection", "features": []}' * 100
+
+
+class Unseekable(io.RawIOBase):
+    def __init__(self, data):
+        self._fp = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        return self._fp.readinto(b)
+
+
+@pytest.mark.parametrize("name", compression.COMPRESSIONS)
+def test_roundtrip(tmp_path, name):
+    if name == "zstd":
+        pytest.importorskip("zstandard")
+    path = tmp_path / "a.geojson"
+    with compression.open_compressed(path, name, level=1) as fp:
+        fp.write(data)
+
+    assert compression.detect(path.read_bytes()) == name
+    with path.open("rb") as fp:
+        detected, decompressed = compression.open_decompressed(fp)
+        assert detected == name
+        assert decompressed.read() == data
+
+
+@pytest.mark.parametrize("name", compression.COMPRESSIONS)
+def test_open_decompressed_unseekable(tmp_path, name):
+    if name == "zstd":
+        pytest.importorskip("zstandard")
+    buf = io.BytesIO()
+    with compression.wrap_compressed(buf, name) as fp:
+        fp.write(data)
+    assert not buf.closed
+
+    detected, decompressed = compression.open_decompressed(Unseekable(buf.getvalue()))
+    assert detected == name
+    assert decompressed.read() == data
+
+
+def test_sniff_uncompressed_unseekable():
+    detected, fp = compression.sniff(Unseekable(data))
+
+    assert detected is None
+    assert fp.read() == data
+
+
+@pytest.mark.parametrize(
+    "name,expected",
+    [
+        ("a.geojson.gz", "a.geojson"),
+        ("a.geojson.zst", "a.geojson"),
+        ("a.json", "a.json"),
+    ],
+)
+def test_strip_suffix(name, expected):
+    assert compression.strip_suffix(compression.Path(name)).name == expected
+
+
+@pytest.mark.parametrize("fp", [io.BytesIO(data), Unseekable(data)])
+def test_read_head(fp):
+    head, fp = compression.read_head(fp, 10)
+
+    assert head == data[:10]
+    assert fp.read() == data
@@ -0,0 +1,154 @@
+import io
+from decimal import Decimal
+
+import ijson
+import pytest
+from geojsplit import filters
+
+
+def feature(x, y, bbox_first=False, **properties):
+    members = {
+        "type": "Feature",
+        "properties": properties,
+        "geometry": {"type": "Point", "coordinates": [x, y]},
+    }
+    if bbox_first:
+        members = {"bbox": [x, y, x, y], **members}
+    return members
+
+
+@pytest.mark.parametrize(
+    "condition,properties,expected",
+    [
+        ("status=active", {"status": "active"}, True),
+        ("status = active", {"status": "inactive"}, False),
+        ("lanes>=2", {"lanes": 2}, True),
+        ("lanes<2", {"lanes": Decimal("1.5")}, True),
+        ("lanes>2.5", {"lanes": 3}, True),
+        ("lanes>2", {}, False),
+        ("lanes>2", {"lanes": "many"}, False),
+        ("name!=null", {"name": None}, False),
+        ("name!=null", {"name": "a"}, True),
+        ("flag=true", {"flag": True}, True),
+    ],
+)
+def test_parse_condition(condition, properties, expected):
+    assert filters.parse_condition(condition)(properties) is expected
+
+
+@pytest.mark.parametrize("condition", ["", "status", "=active"])
+def test_parse_condition_invalid(condition):
+    with pytest.raises(ValueError):
+        filters.parse_condition(condition)
+
+
+def test_where_function_forms():
+    assert filters.where_function(None) is None
+    assert filters.where_function({"a": 1})({"a": 1, "b": 2})
+    assert not filters.where_function(["a=1", "b=3"])({"a": 1, "b": 2})
+
+
+@pytest.mark.parametrize(
+    "bbox",
+    [[0, 0, 1], [1, 0, 0, 1], [0, 1, 1, 0]],
+)
+def test_feature_filter_invalid_bbox(bbox):
+    with pytest.raises(ValueError):
+        filters.FeatureFilter(bbox=bbox)
+
+
+def test_feature_filter_decides_early():
+    feature_filter = filters.FeatureFilter(bbox=[0, 0, 1, 1], where="a=1")
+    partial = {"properties": {"a": 2}}
+
+    assert feature_filter.decide(partial, {"properties"}, complete=False) is False
+    partial = {"properties": {"a": 1}}
+    assert feature_filter.decide(partial, {"properties"}, complete=False) is None
+    partial["bbox"] = [0.5, 0.5, 2, 2]
+    assert feature_filter.decide(partial, {"properties", "bbox"}, complete=False)
+
+
+@pytest.mark.parametrize("bbox_first", [False, True])
+def test_feature_filter_matches_items(bbox_first):
+    import json
+
+    features = [
+        feature(i, i, bbox_first=bbox_first, id=i, even=i % 2 == 0) for i in range(10)
+    ]
+    features.append({"type": "Feature", "properties": {"even": True}, "geometry": None})
+    document = json.dumps({"type": "FeatureCollection", "features": features})
+    feature_filter = filters.FeatureFilter(bbox=[2, 2, 7, 7], where="even=true")
+
+    filtered = list(
+        feature_filter.filter(
+            ijson.parse(io.BytesIO(document.encode())), "features.item"
+        )
+    )
+    expected = [
+        f
+        for f in ijson.items(io.BytesIO(document.encode()), "features.item")
+        if feature_filter.matches(f)
+    ]
+    assert filtered == expected
+    assert [f["properties"]["id"] for f in filtered] == [2, 4, 6]
+
+
+@pytest.mark.parametrize("bbox_first", [False, True])
+def test_feature_filter_matches_raw(bbox_first):
+    import json
+
+    features = [
+        feature(i, i, bbox_first=bbox_first, id=i, even=i % 2 == 0, name='a]}\\"')
+        for i in range(10)
+    ]
+    features.append({"type": "Feature", "properties": None, "geometry": None})
+    features.append({"type": "Feature", "bbox": None, "properties": {"even": True}})
+    feature_filter = filters.FeatureFilter(bbox=[2, 2, 7, 7], where="even=true")
+
+    matches = [feature_filter.matches_raw(json.dumps(f).encode()) for f in features]
+    assert matches == [feature_filter.matches(f) for f in features]
+    assert matches.count(True) == 3
+
+
+@pytest.mark.parametrize(
+    "raw",
+    [
+        b'{"type": "Feature", "geometry": {"type": "LineString", '
+        b'"coordinates": [[1, 5], [-2, 3]]}, "properties": {"bbox": [0, 0, 0, 0]}}',
+        b'{"type": "Feature", "bbox": [0, 1, 2, 3, 4, 5], "geometry": null}',
+        b'{"type": "Feature", "geometry": null, "bbox": null}',
+        b'{"type": "Feature", "geometry": {"type": "Point", "coordinates": [1, 2]}, '
+        b'"properties": {"name": "bbox"}, "bbox": [0, 0, 5, 5]}',
+        b'{"type": "Feature", "properties": {}}',
+        b'{"type": "Point", "coordinates": [3, 4]}',
+    ],
+)
+def test_raw_feature_bbox(raw):
+    import json
+
+    assert filters.raw_feature_bbox(raw) == filters.feature_bbox(json.loads(raw))
+
+
+@pytest.mark.parametrize(
+    "raw,expected",
+    [
+        (
+            b'{"bbox": [-90, -90, 90, 90], "type": "LineString", '
+            b'"coordinates": [[1, 5], [-2, 3]]}',
+            (-2.0, 3.0, 1.0, 5.0),
+        ),
+        (
+            b'{"type": "GeometryCollection", "bbox": [-9, -9, 9, 9], "geometries": '
+            b'[{"type": "Point", "bbox": [0, 0, 0, 0], "coordinates": [1, 2]}, null, '
+            b'{"type": "GeometryCollection", "geometries": '
+            b'[{"type": "Point", "coordinates": [-1.5e1, 4]}]}]}',
+            (-15.0, 2.0, 1.0, 4.0),
+        ),
+        (b'{"type": "GeometryCollection", "geometries": []}', None),
+    ],
+)
+def test_raw_geometry_bbox(raw, expected):
+    assert filters.raw_geometry_bbox(raw) == expected
+    assert filters.raw_geometry_bbox(memoryview(raw)) == expected
+    feature = b'{"type": "Feature", "geometry": ' + raw + b"}"
+    assert not filters.FeatureFilter(bbox=[50, 50, 60, 60]).matches_raw(feature)
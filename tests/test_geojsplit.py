@@ -1,7 +1,13 @@
+import gzip
+import io
+import json
+import warnings
+from decimal import Decimal
 from pathlib import Path
 
+import geojson
 import pytest
-from geojsplit import geojsplit
+from geojsplit import geojsplit, metrics, writers
 
 
 geojson_str = """{"features":[{"coordinates":[[[-1,-22],[54,34],[-16,7],[-1,-22]]],"type":"Polygon"},{"coordinates":[[[47,23],[-47,27],[3,-61],[47,23]]],"type":"Polygon"},{"coordinates":[[[36,-17],[0,101],[-37,-29],[36,-17]]],"type":"Polygon"},{"coordinates":[[[15,-50],[17,14],[-80,27],[15,-50]]],"type":"Polygon"},{"coordinates":[[[41,-22],[6,106],[-11,-5],[41,-22]]],"type":"Polygon"},{"coordinates":[[[-8,19],[-39,-60],[53,-1],[-8,19]]],"type":"Polygon"},{"coordinates":[[[-59,-42],[56,-35],[-15,74],[-59,-42]]],"type":"Polygon"},{"coordinates":[[[86,-40],[4,70],[-88,-49],[86,-40]]],"type":"Polygon"},{"coordinates":[[[48,-64],[25,51],[-51,-6],[48,-64]]],"type":"Polygon"},{"coordinates":[[[-1,82],[-51,-34],[17,-10],[-1,82]]],"type":"Polygon"}],"type":"FeatureCollection"}"""
@@ -55,3 +61,339 @@ def test_default_batch_value(create_geojson):
     for feature_collection in gj.stream(batch=batch_size):
         assert len(feature_collection["features"]) == 100
 
+
+def test_stream_reads_bytes(create_geojson):
+    gj = geojsplit.GeoJSONBatchStreamer(create_geojson(geojson_str))
+
+    # ijson warns when it is fed text instead of bytes
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", DeprecationWarning)
+        assert sum(len(fc["features"]) for fc in gj.stream()) == 10
+
+
+
+def test_stream_raw_matches_stream(create_geojson):
+    tmp_geojson = create_geojson(geojson_str)
+    gj: geojsplit.GeoJSONBatchStreamer = geojsplit.GeoJSONBatchStreamer(tmp_geojson)
+
+    for feature_collection, raw_features in zip(
+        gj.stream(batch=3), gj.stream_raw(batch=3)
+    ):
+        assert feature_collection["features"] == [
+            json.loads(raw) for raw in raw_features
+        ]
+
+
+def test_stream_mmap_matches_stream(create_geojson):
+    tmp_geojson = create_geojson(geojson_str)
+    gj: geojsplit.GeoJSONBatchStreamer = geojsplit.GeoJSONBatchStreamer(tmp_geojson)
+    mapped: geojsplit.GeoJSONBatchStreamer = geojsplit.GeoJSONBatchStreamer(
+        tmp_geojson, use_mmap=True
+    )
+
+    assert list(mapped.stream(batch=3)) == list(gj.stream(batch=3))
+    assert [
+        [bytes(raw) for raw in raw_features]
+        for raw_features in mapped.stream_raw(batch=3)
+    ] == list(gj.stream_raw(batch=3))
+
+
+def test_stream_mmap_empty_file_falls_back(create_geojson):
+    tmp_geojson = create_geojson("")
+    gj: geojsplit.GeoJSONBatchStreamer = geojsplit.GeoJSONBatchStreamer(
+        tmp_geojson, use_mmap=True
+    )
+
+    assert list(gj.stream_raw()) == []
+
+
+def test_stream_compressed_file(create_geojson, tmp_path):
+    tmp_geojson = create_geojson(geojson_str)
+    compressed = tmp_path / "fake.geojson.gz"
+    with gzip.open(compressed, "wb") as fp:
+        fp.write(geojson_str.encode("utf-8"))
+    gj: geojsplit.GeoJSONBatchStreamer = geojsplit.GeoJSONBatchStreamer(compressed)
+
+    assert gj.name.name == "fake.geojson"
+    assert not gj.seekable
+    assert list(gj.stream(batch=3)) == list(
+        geojsplit.GeoJSONBatchStreamer(tmp_geojson).stream(batch=3)
+    )
+    assert len(list(gj.stream_raw(batch=3))) == 4
+    with pytest.raises(ValueError):
+        gj.index()
+
+
+@pytest.mark.parametrize(
+    "fp", [io.BytesIO(geojson_str.encode("utf-8")), io.StringIO(geojson_str)]
+)
+def test_stream_file_object_once(fp):
+    gj: geojsplit.GeoJSONBatchStreamer = geojsplit.GeoJSONBatchStreamer(fp)
+
+    assert gj.name.name == "stdin.geojson"
+    assert sum(len(fc["features"]) for fc in gj.stream(batch=3)) == 10
+    if isinstance(fp, io.BytesIO):
+        with pytest.raises(ValueError):
+            list(gj.stream_raw())
+
+
+@pytest.mark.parametrize("max_bytes", [1, 200, 500, 10 ** 6])
+def test_stream_max_bytes(create_geojson, max_bytes):
+    tmp_geojson = create_geojson(geojson_str)
+    gj: geojsplit.GeoJSONBatchStreamer = geojsplit.GeoJSONBatchStreamer(tmp_geojson)
+
+    batches = list(gj.stream_raw(max_bytes=max_bytes))
+    assert [raw for raws in batches for raw in raws] == list(gj.raw_features())
+    for raws in batches:
+        size = len(b"".join(raws)) + len(raws) - 1 + writers.ENVELOPE_SIZE
+        assert size <= max_bytes or len(raws) == 1
+
+    # parsed features are measured as serialized by the backend, not as read
+    feature_collections = list(gj.stream(max_bytes=max_bytes))
+    features = [f for fc in feature_collections for f in fc["features"]]
+    assert features == list(gj.features())
+    for fc in feature_collections:
+        sizes = [len(gj.backend.dumps(f)) for f in fc["features"]]
+        size = sum(sizes) + len(sizes) - 1 + writers.ENVELOPE_SIZE
+        assert size <= max_bytes or len(sizes) == 1
+    assert len(list(gj.stream(batch=2, max_bytes=max_bytes))) >= 5
+
+
+def test_stream_by_key(create_geojson):
+    tmp_geojson = create_geojson(geojson_str)
+    gj: geojsplit.GeoJSONBatchStreamer = geojsplit.GeoJSONBatchStreamer(tmp_geojson)
+
+    keys = [key for key, _ in gj.stream_by(lambda f: len(f["coordinates"][0]))]
+    assert keys == [4] * 10
+    assert [key for key, _ in gj.stream_by("missing")] == [None] * 10
+    assert [raw for _, raw in gj.stream_by("missing", raw=True)] == list(
+        gj.raw_features()
+    )
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_stream_filters(create_geojson, use_mmap):
+    tmp_geojson = create_geojson(geojson_str)
+    gj: geojsplit.GeoJSONBatchStreamer = geojsplit.GeoJSONBatchStreamer(
+        tmp_geojson, use_mmap=use_mmap
+    )
+
+    bbox = [50, -30, 60, 0]
+    expected = [
+        feature
+        for fc in gj.stream()
+        for feature in fc["features"]
+        if max(x for x, _ in feature["coordinates"][0]) >= 50
+    ]
+    assert 0 < len(expected) < 10
+    assert list(gj.stream(bbox=bbox)) == [geojson.FeatureCollection(expected)]
+    assert list(gj.stream(where="type=Polygon")) == []
+    assert len(list(gj.raw_features(bbox=bbox))) == len(expected)
+
+
+def test_stream_transform(create_geojson):
+    pytest.importorskip("numpy")
+    from geojsplit.transform import CoordinateTransform
+
+    tmp_geojson = create_geojson(geojson_str)
+    gj: geojsplit.GeoJSONBatchStreamer = geojsplit.GeoJSONBatchStreamer(tmp_geojson)
+
+    expected = [
+        [[[x / 10, y / 10] for x, y in ring] for ring in feature["coordinates"]]
+        for fc in gj.stream()
+        for feature in fc["features"]
+    ]
+    scale = CoordinateTransform(function=lambda positions: positions / 10)
+    batches = list(gj.stream(batch=3, transform=scale))
+    assert len(batches) == 4
+    assert [f["coordinates"] for fc in batches for f in fc["features"]] == expected
+    assert [f["coordinates"] for f in gj.features(transform=scale)] == expected
+    with pytest.raises(ValueError):
+        next(gj.stream_by("type", raw=True, transform=scale))
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_stream_resumable(create_geojson, use_mmap):
+    tmp_geojson = create_geojson(geojson_str)
+    gj: geojsplit.GeoJSONBatchStreamer = geojsplit.GeoJSONBatchStreamer(
+        tmp_geojson, use_mmap=use_mmap
+    )
+
+    batches = [[bytes(f) for f in batch] for batch in gj.stream_raw(batch=4)]
+    offsets = [offset for offset, _ in gj.stream_resumable(batch=4)]
+    assert len(offsets) == 3
+    resumed = [
+        [bytes(f) for f in batch]
+        for _, batch in gj.stream_resumable(batch=4, offset=offsets[0])
+    ]
+    assert resumed == batches[1:]
+    assert list(gj.stream_resumable(batch=4, offset=offsets[-1])) == []
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+@pytest.mark.parametrize(
+    "method,kwargs",
+    [
+        ("stream", {"batch": 3}),
+        ("stream_raw", {"batch": 3}),
+        ("features", {}),
+        ("stream_by", {"key": "id", "raw": True}),
+    ],
+)
+def test_stream_metrics(create_geojson, use_mmap, method, kwargs):
+    tmp_geojson = create_geojson(geojson_str)
+    measured = metrics.Metrics()
+    gj: geojsplit.GeoJSONBatchStreamer = geojsplit.GeoJSONBatchStreamer(
+        tmp_geojson, use_mmap=use_mmap, metrics=measured
+    )
+
+    items = list(getattr(gj, method)(**kwargs))
+    # memory mapped documents are counted up to the end of the last feature
+    footer = '],"type":"FeatureCollection"}'
+    assert measured.total_bytes == len(geojson_str)
+    assert measured.bytes_read >= len(geojson_str) - len(footer)
+    assert measured.features == 10
+    assert measured.batches == (len(items) if "batch" in kwargs else 1)
+    assert measured.latencies.count == measured.batches
+
+
+def sequence_features():
+    return json.loads(geojson_str)["features"]
+
+
+@pytest.mark.parametrize(
+    "separator,suffix", [(b"", b"\n"), (b"\x1e", b"\n"), (b"\x1e", b"\r\n")]
+)
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_stream_sequence(create_geojson, tmp_path, separator, suffix, use_mmap):
+    sequence = tmp_path / "fake.geojsonl"
+    sequence.write_bytes(
+        b"".join(
+            separator + json.dumps(f).encode("utf-8") + suffix
+            for f in sequence_features()
+        )
+    )
+    gj: geojsplit.GeoJSONBatchStreamer = geojsplit.GeoJSONBatchStreamer(
+        sequence, use_mmap=use_mmap
+    )
+
+    assert gj.sequence
+    assert [len(fc["features"]) for fc in gj.stream(batch=4)] == [4, 4, 2]
+    assert list(gj.features()) == sequence_features()
+    assert [json.loads(bytes(f)) for f in gj.raw_features()] == sequence_features()
+    assert list(gj.features(bbox=(0, 0, 10, 10))) == list(
+        geojsplit.GeoJSONBatchStreamer(create_geojson(geojson_str)).features(
+            bbox=(0, 0, 10, 10)
+        )
+    )
+    assert len(gj) == 10
+    assert gj[3] == sequence_features()[3]
+
+
+def test_stream_sequence_file_object():
+    data = b"\n".join(json.dumps(f).encode("utf-8") for f in sequence_features())
+    gj: geojsplit.GeoJSONBatchStreamer = geojsplit.GeoJSONBatchStreamer(
+        io.BytesIO(gzip.compress(data))
+    )
+
+    assert gj.sequence is None
+    assert list(gj.features()) == sequence_features()
+    assert gj.sequence
+
+
+def test_stream_document_is_not_sequence(create_geojson):
+    gj: geojsplit.GeoJSONBatchStreamer = geojsplit.GeoJSONBatchStreamer(
+        create_geojson(geojson_str)
+    )
+
+    assert gj.sequence is False
+    with pytest.raises(ValueError):
+        next(gj.stream(jobs=2))
+
+
+@pytest.mark.parametrize("extra_kwargs", [{}, {"where": "id>=5"}, {"max_bytes": 500}])
+def test_stream_parallel(tmp_path, monkeypatch, extra_kwargs):
+    monkeypatch.setattr(geojsplit, "RANGE_SIZE", 100)
+    features = [
+        geojson.Feature(geometry=f, properties={"id": i, "value": i / 2, "p": "p"})
+        for i, f in enumerate(sequence_features())
+    ]
+    sequence = tmp_path / "fake.geojsonl"
+    sequence.write_text(
+        "".join(
+            json.dumps(f).replace('"p": "p"', '"p": -118.25463812345678901') + "\n"
+            for f in features
+        )
+    )
+    gj: geojsplit.GeoJSONBatchStreamer = geojsplit.GeoJSONBatchStreamer(sequence)
+
+    batches = list(gj.stream(batch=3, jobs=2, **extra_kwargs))
+    assert batches == list(gj.stream(batch=3, **extra_kwargs))
+    if "where" in extra_kwargs:
+        features = features[5:]
+    assert [f["properties"]["id"] for fc in batches for f in fc["features"]] == [
+        f["properties"]["id"] for f in features
+    ]
+    assert batches[0]["features"][0]["properties"]["p"] == Decimal(
+        "-118.25463812345678901"
+    )
+
+
+def test_expand_paths(tmp_path):
+    (tmp_path / "sub").mkdir()
+    for name in ["b.geojson", "a.geojson", "sub/c.geojson", "d.geojsonl"]:
+        (tmp_path / name).write_text(geojson_str)
+
+    assert geojsplit.expand_paths(
+        [tmp_path / "d.geojsonl", str(tmp_path / "**" / "*.geojson")]
+    ) == [tmp_path / name for name in ["d.geojsonl", "a.geojson", "b.geojson"]] + [
+        tmp_path / "sub" / "c.geojson"
+    ]
+    with pytest.raises(FileNotFoundError):
+        geojsplit.expand_paths([str(tmp_path / "*.json")])
+    with pytest.raises(FileNotFoundError):
+        geojsplit.expand_paths([tmp_path / "missing.geojson"])
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_multi_streamer(tmp_path, use_mmap):
+    document = tmp_path / "a.geojson"
+    document.write_text(geojson_str)
+    sequence = tmp_path / "b.geojsonl"
+    sequence.write_text("".join(json.dumps(f) + "\n" for f in sequence_features()))
+    measured = metrics.Metrics()
+    gj: geojsplit.GeoJSONMultiStreamer = geojsplit.GeoJSONMultiStreamer(
+        [document, sequence], use_mmap=use_mmap, metrics=measured
+    )
+
+    assert gj.name == document
+    assert not gj.sequence
+    assert [len(fc["features"]) for fc in gj.stream(batch=3)] == [3] * 6 + [2]
+    assert gj.counts == [10, 10]
+    assert measured.total_bytes == document.stat().st_size + sequence.stat().st_size
+    assert measured.features == 20
+    assert [len(batch) for batch in gj.stream_raw(batch=8)] == [8, 8, 4]
+    assert list(gj.features(bbox=(0, 0, 10, 10))) == 2 * list(
+        geojsplit.GeoJSONBatchStreamer(document).features(bbox=(0, 0, 10, 10))
+    )
+    assert [key for key, _ in gj.stream_by(lambda f: f["type"])] == ["Polygon"] * 20
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_count(create_geojson, tmp_path, use_mmap):
+    document = create_geojson(geojson_1000_str)
+    gj: geojsplit.GeoJSONBatchStreamer = geojsplit.GeoJSONBatchStreamer(
+        document, use_mmap=use_mmap
+    )
+    sequence = tmp_path / "fake.geojsonl.gz"
+    sequence.write_bytes(
+        gzip.compress(
+            b"".join(json.dumps(f).encode() + b"\n" for f in sequence_features())
+        )
+    )
+
+    assert gj.count() == 1000
+    assert len(gj) == 1000
+    assert gj.count() == 1000  # from the loaded index
+    assert geojsplit.GeoJSONBatchStreamer(sequence).count() == 10
+    assert geojsplit.GeoJSONMultiStreamer([document, sequence]).count() == 1010
@@ -0,0 +1,71 @@
+import os
+
+import pytest
+from geojsplit import geojsplit, index
+
+geojson_str = """{"type": "FeatureCollection", "features": [{"type": "Feature", "properties": {"id": 0}, "geometry": null}, {"type": "Feature", "properties": {"id": 1}, "geometry": null}, {"type": "Feature", "properties": {"id": 2}, "geometry": null}, {"type": "Feature", "properties": {"id": 3}, "geometry": null}, {"type": "Feature", "properties": {"id": 4}, "geometry": null}]}"""
+
+
+@pytest.fixture
+def geojson_file(tmp_path):
+    path = tmp_path / "fake.geojson"
+    path.write_text(geojson_str)
+    return path
+
+
+def test_save_load_roundtrip(geojson_file, tmp_path):
+    built = index.FeatureIndex.build(geojson_file)
+    path = tmp_path / "fake.idx"
+    built.save(path)
+    loaded = index.FeatureIndex.load(path)
+
+    assert len(loaded) == 5
+    assert list(loaded.spans()) == list(built.spans())
+    assert loaded.is_valid_for(geojson_file, b"features")
+
+
+def test_load_not_an_index(tmp_path):
+    path = tmp_path / "fake.idx"
+    path.write_bytes(b"not an index")
+    with pytest.raises(ValueError):
+        index.FeatureIndex.load(path)
+
+
+@pytest.mark.parametrize("length", [len(index.MAGIC) + 2, len(index.MAGIC) + 10, -4])
+def test_truncated_index_is_rebuilt(geojson_file, length):
+    assert len(geojsplit.GeoJSONBatchStreamer(geojson_file)) == 5
+    path = index.sidecar_path(geojson_file)
+    path.write_bytes(path.read_bytes()[:length])
+
+    with pytest.raises(ValueError):
+        index.FeatureIndex.load(path)
+    assert len(geojsplit.GeoJSONBatchStreamer(geojson_file)) == 5
+    assert len(index.FeatureIndex.load(path)) == 5
+
+
+def test_stale_index_is_rebuilt(geojson_file):
+    gj = geojsplit.GeoJSONBatchStreamer(geojson_file)
+    assert len(gj) == 5
+    assert index.sidecar_path(geojson_file).exists()
+
+    geojson_file.write_text(
+        geojson_str.replace(
+            ', {"type": "Feature", "properties": {"id": 4}, "geometry": null}', ""
+        )
+    )
+    stat = geojson_file.stat()
+    os.utime(geojson_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+    assert len(geojsplit.GeoJSONBatchStreamer(geojson_file)) == 4
+
+
+def test_random_access(geojson_file):
+    gj = geojsplit.GeoJSONBatchStreamer(geojson_file)
+
+    assert gj[0]["properties"]["id"] == 0
+    assert gj[-1]["properties"]["id"] == 4
+    assert [f["properties"]["id"] for f in gj.slice(1, 3)["features"]] == [1, 2]
+    assert gj[3:]["features"] == gj.slice(3)["features"]
+    assert len(gj.slice_raw(4, 10)) == 1
+    with pytest.raises(IndexError):
+        gj[5]
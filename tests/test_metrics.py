@@ -0,0 +1,127 @@
+import io
+import json
+import pickle
+
+import pytest
+from geojsplit import metrics
+
+
+def test_histogram():
+    histogram = metrics.Histogram()
+    for seconds in [0.0005, 0.003, 0.003, 0.1, 100]:
+        histogram.add(seconds)
+
+    summary = histogram.to_dict()
+    assert (summary["count"], summary["min"], summary["max"]) == (5, 0.0005, 100)
+    assert summary["p50"] == 0.004
+    assert summary["p99"] == 100
+    assert summary["buckets"] == [[0.001, 1], [0.004, 2], [0.128, 1], [None, 1]]
+    assert metrics.Histogram().quantile(0.5) is None
+
+
+def test_measure(monkeypatch):
+    monkeypatch.setattr(metrics, "REPORT_SIZE", 2)
+    events = []
+    measured = metrics.Metrics(hooks=[lambda event, m: events.append(event)])
+
+    assert list(measured.measure(iter([[1, 2], [3]]), len)) == [[1, 2], [3]]
+    assert list(measured.measure(range(5))) == [0, 1, 2, 3, 4]
+    measured.close()
+
+    assert (measured.features, measured.batches) == (8, 5)
+    assert measured.latencies.count == 5
+    assert events == ["batch"] * 5 + ["close"]
+
+
+def test_add_pickled():
+    events = []
+    measured = metrics.Metrics(total_bytes=100, hooks=[lambda e, m: events.append(e)])
+    worker = metrics.Metrics()
+    worker.bytes_read = 40
+    worker.record_batch(3, 0.002)
+    worker.record_file(3, size=120, serialize=0.5, write=0.25)
+    worker.add_hook(lambda event, m: None)
+
+    measured.add(pickle.loads(pickle.dumps(worker)))
+    measured.add(worker)
+
+    assert (measured.bytes_read, measured.features, measured.files) == (80, 6, 2)
+    assert measured.bytes_written == 240
+    assert measured.timings == {"parse": 0.004, "serialize": 1.0, "write": 0.5}
+    assert measured.latencies.to_dict()["buckets"] == [[0.002, 2]]
+    assert measured.progress == 0.8
+    assert events == ["source", "source"]
+
+
+def test_measure_closes_items():
+    def items():
+        try:
+            yield from range(10)
+        finally:
+            closed.append(True)
+
+    closed = []
+    measured = metrics.Metrics().measure(items(), lambda _: 1)
+    next(measured)
+    measured.close()
+    assert closed == [True]
+
+
+def test_counting_reader():
+    measured = metrics.Metrics()
+    reader = metrics.CountingReader(io.BytesIO(b"line\nrest of the document"), measured)
+
+    assert reader.readline() == b"line\n"
+    buf = bytearray(4)
+    assert reader.readinto(buf) == 4
+    assert reader.read() == b" of the document"
+    assert measured.bytes_read == 25
+    assert reader.tell() == 25
+    assert not hasattr(metrics.CountingReader(object(), measured), "readinto")
+
+
+def test_record_file_and_timed_writer():
+    measured = metrics.Metrics(total_bytes=100)
+    fp = metrics.TimedWriter(io.BytesIO())
+    fp.write(b"abc")
+    fp.write(memoryview(b"de"))
+    measured.record_file(2, fp.bytes_written, serialize=0.5, write=fp.seconds)
+    measured.bytes_read = 25
+
+    stats = measured.to_dict()
+    assert (stats["files"], stats["features_written"], stats["bytes_written"]) == (
+        1,
+        2,
+        5,
+    )
+    assert stats["timings"]["serialize"] == 0.5
+    assert stats["progress"] == 0.25
+    json.dumps(stats)
+
+
+def test_progress_bar():
+    fp = io.StringIO()
+    measured = metrics.Metrics(total_bytes=2048, hooks=[metrics.ProgressBar(fp)])
+    measured.bytes_read = 1024
+    measured.record_batch(10, 0.01)
+    measured.close()
+
+    lines = fp.getvalue().split("\r")
+    assert lines[1].startswith(" 50.0% |##########          | 1.0 KB/2.0 KB")
+    assert "10 features" in lines[1]
+    assert fp.getvalue().endswith("\n")
+
+
+def test_stats_writer():
+    fp = io.StringIO()
+    measured = metrics.Metrics(hooks=[metrics.StatsWriter(fp, interval=60)])
+    measured.record_batch(10, 0.01)
+    measured.record_batch(10, 0.01)  # within the interval
+    measured.close()
+
+    lines = [json.loads(line) for line in fp.getvalue().splitlines()]
+    assert [(line["event"], line["features"]) for line in lines] == [
+        ("batch", 10),
+        ("close", 20),
+    ]
+    assert lines[1]["progress"] is None
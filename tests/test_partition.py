@@ -0,0 +1,84 @@
+from decimal import Decimal
+
+import pytest
+from geojsplit import partition
+
+
+def point(x, y):
+    return {"type": "Feature", "geometry": {"type": "Point", "coordinates": [x, y]}}
+
+
+@pytest.mark.parametrize(
+    "feature,expected",
+    [
+        (point(1, 2), (1.0, 2.0, 1.0, 2.0)),
+        (
+            {
+                "type": "Feature",
+                "geometry": {
+                    "type": "Polygon",
+                    "coordinates": [[[0, 0], [Decimal("2.5"), 0], [1, -3], [0, 0]]],
+                },
+            },
+            (0.0, -3.0, 2.5, 0.0),
+        ),
+        (
+            {
+                "type": "Feature",
+                "geometry": {
+                    "type": "GeometryCollection",
+                    "geometries": [point(1, 1)["geometry"], point(-1, 5)["geometry"]],
+                },
+            },
+            (-1.0, 1.0, 1.0, 5.0),
+        ),
+        (
+            {"type": "Feature", "bbox": [0, 1, 9, 2, 3, 9], "geometry": None},
+            (0, 1, 2, 3),
+        ),
+        ({"type": "Point", "coordinates": [3, 4]}, (3.0, 4.0, 3.0, 4.0)),
+        ({"type": "Feature", "geometry": None}, None),
+    ],
+)
+def test_feature_bbox(feature, expected):
+    assert partition.feature_bbox(feature) == expected
+
+
+def test_merge_bbox():
+    assert partition.merge_bbox(None, (0, 0, 1, 1)) == (0, 0, 1, 1)
+    assert partition.merge_bbox((0, 0, 1, 1), (-1, 0.5, 0.5, 2)) == (-1, 0, 1, 2)
+
+
+@pytest.mark.parametrize(
+    "spec,x,y,expected",
+    [
+        ("grid", 1.5, -0.5, "1_-1"),
+        ("grid:10", 15, 25, "1_2"),
+        ("geohash:5", -5.6, 42.6, "ezs42"),
+        ("tile:1", -10, 10, "1-0-0"),
+        ("tile:10", 2.35, 48.85, "10-518-352"),
+        ("quadtree", 10, 10, "q"),
+    ],
+)
+def test_partitioner_key(spec, x, y, expected):
+    partitioner = partition.get_partitioner(spec)
+    key = partitioner.key((x, y, x, y))
+
+    assert key == expected
+    min_x, min_y, max_x, max_y = partitioner.extent(key)
+    assert min_x <= x <= max_x and min_y <= y <= max_y
+
+
+def test_quadtree_splits_full_cells():
+    partitioner = partition.get_partitioner("quadtree:2")
+    keys = [partitioner.key((x, y, x, y)) for x, y in [(10, 10)] * 3 + [(-10, -10)]]
+
+    assert keys == ["q", "q", "q1", "q2"]
+    assert partitioner.extent("q1") == (0, 0, 180, 90)
+    assert partitioner.extent("q2") == (-180, -90, 0, 0)
+
+
+@pytest.mark.parametrize("spec", ["hexagon", "grid:0", "geohash:x", "tile:31"])
+def test_get_partitioner_invalid(spec):
+    with pytest.raises(ValueError):
+        partition.get_partitioner(spec)
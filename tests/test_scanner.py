@@ -0,0 +1,198 @@
+import io
+import mmap
+import json
+
+import pytest
+from geojsplit import scanner
+
+tricky_geojson_str = """{
+    "type": "FeatureCollection",
+    "name": "features",
+    "crs": {"features": [{"not": "a feature"}]},
+    "features" : [
+        {"type": "Feature", "properties": {"name": "brace } in \\"string\\" {", "a": [1, {"b": 2}]}, "geometry": {"type": "Point", "coordinates": [1.5, 2]}},
+        {"type": "Feature", "properties": {"name": "back\\\\slash", "unicode": "é中"}, "geometry": null} ,
+        {"type": "Feature", "properties": {}, "geometry": {"type": "LineString", "coordinates": [[0, 0], [1, 1]]}}
+    ],
+    "bbox": [0, 0, 1, 1]
+}"""
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, None])
+def test_iter_raw_features_matches_json(chunk_size):
+    data = tricky_geojson_str.encode("utf-8")
+    fp = io.BytesIO(data)
+    raw_features = list(scanner.iter_raw_features(fp, chunk_size=chunk_size))
+
+    assert [json.loads(raw) for _, raw in raw_features] == json.loads(data)["features"]
+    for offset, raw in raw_features:
+        assert data[offset : offset + len(raw)] == raw
+
+
+@pytest.mark.parametrize("chunk_size", [1, 64, None])
+def test_iter_spans_deeply_nested(chunk_size):
+    deep = {"type": "Feature", "properties": {}, "geometry": None}
+    for i in range(scanner.FEATURE_DEPTH + 2):
+        deep["properties"] = {"p": [deep["properties"], "{\\\"}"]}
+    features = [deep, {"type": "Feature", "properties": {"s": '"}'}}]
+    data = json.dumps({"features": features}).encode("utf-8")
+    spans = list(scanner.iter_spans(io.BytesIO(data), chunk_size=chunk_size))
+
+    assert [json.loads(data[start:end]) for start, end in spans] == features
+
+
+@pytest.mark.parametrize("depth", [1, scanner.FEATURE_DEPTH + 2])
+def test_member_offsets_skips_nested_objects(depth):
+    properties = {"geometry": "{", "id": 1}
+    for i in range(depth):
+        properties = {"geometry": [properties, '"}']}
+    raw = json.dumps(
+        {"properties": properties, "geometry": {"type": "Point"}, "id": 2}
+    ).encode("utf-8")
+    offsets = scanner.member_offsets(raw, [b"geometry"])
+
+    assert list(offsets) == [b"properties", b"geometry"]
+    start = offsets[b"geometry"]
+    assert json.loads(raw[start : scanner.object_end(raw, start)]) == {"type": "Point"}
+    start = offsets[b"properties"]
+    assert json.loads(raw[start : scanner.object_end(raw, start)]) == properties
+
+
+@pytest.mark.parametrize(
+    "value",
+    ['{"a": "}"}', '[1, ["]"], {"b": [2]}]', '"s\\"]"', "-1.5e3", "null", "true"],
+)
+def test_value_end(value):
+    raw = f'{{"v": {value}, "w": [0]}}'.encode("utf-8")
+    start = scanner.member_offsets(raw)[b"v"]
+
+    assert raw[start : scanner.value_end(raw, start)] == value.encode("utf-8")
+
+
+def test_iter_raw_features_missing_key():
+    fp = io.BytesIO(b'{"type": "FeatureCollection", "other": [{"a": 1}]}')
+    assert list(scanner.iter_raw_features(fp)) == []
+
+
+def test_iter_raw_features_truncated():
+    fp = io.BytesIO(b'{"features": [{"a": 1}, {"b": ')
+    with pytest.raises(ValueError):
+        list(scanner.iter_raw_features(fp))
+
+
+@pytest.mark.parametrize("prefix", ["features", "a.b.item", "features.item.item"])
+def test_key_from_prefix_unsupported(prefix):
+    with pytest.raises(ValueError):
+        scanner.key_from_prefix(prefix)
+
+
+def test_dump_raw_roundtrip():
+    fp = io.BytesIO()
+    scanner.dump_raw([b'{"a": 1}', b'{"b": 2}'], fp)
+    assert json.loads(fp.getvalue()) == {
+        "type": "FeatureCollection",
+        "features": [{"a": 1}, {"b": 2}],
+    }
+
+
+def test_iter_mapped_features_matches_raw(tmp_path):
+    path = tmp_path / "tricky.geojson"
+    path.write_bytes(tricky_geojson_str.encode("utf-8"))
+    with path.open("rb") as fp:
+        raw_features = list(scanner.iter_raw_features(fp))
+        mapping = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        mapped_features = [
+            (offset, bytes(view))
+            for offset, view in scanner.iter_mapped_features(mapping)
+        ]
+        mapping.close()
+
+    assert mapped_features == raw_features
+
+
+@pytest.mark.parametrize("chunk_size", [1, 64])
+def test_iter_raw_features_offset(tmp_path, chunk_size):
+    data = tricky_geojson_str.encode("utf-8")
+    raw_features = list(scanner.iter_raw_features(io.BytesIO(data)))
+    offset = raw_features[0][0] + len(raw_features[0][1])
+
+    resumed = scanner.iter_raw_features(
+        io.BytesIO(data), chunk_size=chunk_size, offset=offset
+    )
+    assert list(resumed) == raw_features[1:]
+
+    path = tmp_path / "tricky.geojson"
+    path.write_bytes(data)
+    with path.open("rb") as fp:
+        mapping = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        mapped = [
+            (start, bytes(view))
+            for start, view in scanner.iter_mapped_features(mapping, offset=offset)
+        ]
+        mapping.close()
+    assert mapped == raw_features[1:]
+
+
+@pytest.mark.parametrize(
+    "head,eof,expected",
+    [
+        (b'{"type": "FeatureCollection", "features": [', False, False),
+        (b'  \x1e{"id": 1}', False, True),
+        (b'{"type": "Feature", "geometry": {"coordinates": [', False, True),
+        (b'{"geometry": null, "properties": {}}\n{"geo', False, True),
+        (b'{"geometry": null, "properties": {}}', False, None),
+        (b'{"geometry": null, "properties": {}}', True, False),
+        (b'{"features": [{"type": "Feature"}]}', True, False),
+        (b'{"features": [', False, None),
+        (b"", True, False),
+    ],
+)
+def test_is_sequence(head, eof, expected):
+    assert scanner.is_sequence(head, eof=eof) is expected
+
+
+@pytest.mark.parametrize("chunk_size", [1, 64])
+def test_iter_raw_features_sequence(chunk_size):
+    features = json.loads(tricky_geojson_str)["features"]
+    data = b"".join(b"\x1e" + json.dumps(f).encode("utf-8") + b"\n" for f in features)
+
+    raw_features = list(
+        scanner.iter_raw_features(
+            io.BytesIO(data), chunk_size=chunk_size, sequence=True
+        )
+    )
+    assert [json.loads(raw) for _, raw in raw_features] == features
+    assert all(data[start : start + len(raw)] == raw for start, raw in raw_features)
+    with pytest.raises(ValueError):
+        list(scanner.iter_raw_features(io.BytesIO(b'{"a": 1}\n[1]'), sequence=True))
+
+
+@pytest.mark.parametrize("separator", [b"", b"\x1e"])
+def test_record_ranges(separator):
+    data = b"".join(separator + b'{"id": %d}\n' % i for i in range(100))
+    ranges = scanner.record_ranges(io.BytesIO(data), 50)
+
+    assert ranges[0][0] == 0
+    assert ranges[-1][1] == len(data)
+    assert all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+    ids = [
+        json.loads(raw)["id"]
+        for start, end in ranges
+        for _, raw in scanner.iter_raw_features(
+            io.BytesIO(data[start:end]), sequence=True
+        )
+    ]
+    assert ids == list(range(100))
+
+
+@pytest.mark.parametrize(
+    "records",
+    [
+        [json.dumps({"id": i}, indent=2).encode() for i in range(100)],
+        [b'{"id": 0}'] * 60 + [b'{"id": [' + b"1,\n" * 40 + b"1]}"] + [b"{}"] * 60,
+    ],
+)
+def test_record_ranges_multiline_records(monkeypatch, records):
+    monkeypatch.setattr(scanner, "CHUNK_SIZE", 64)  # only the first records are checked
+    data = b"\n".join(records) + b"\n"
+    assert scanner.record_ranges(io.BytesIO(data), 50) == [(0, len(data))]
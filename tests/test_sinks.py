@@ -0,0 +1,141 @@
+import io
+import json
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import geojson
+import pytest
+from geojsplit import sinks
+
+
+def features():
+    return [
+        geojson.Feature(
+            geometry=geojson.Point((1, 2)),
+            properties={"id": 0, "name": "a", "area": 1},
+        ),
+        geojson.Feature(
+            geometry=geojson.LineString([(0, 0, 1), (1, 1, 2)]),
+            properties={"id": 1, "area": Decimal("2.5"), "tags": ["x"]},
+        ),
+        geojson.Feature(geometry=None, properties={"id": 2, "name": None}),
+    ]
+
+
+@pytest.mark.parametrize(
+    "name,expected",
+    [
+        ("geojsonseq", b'\x1e{"id": 0}\n\x1e{"id":\n1}\n'),
+        ("ndjson", b'{"id": 0}\n{"id": 1}\n'),
+    ],
+)
+def test_text_sink(name, expected):
+    fp = io.BytesIO()
+    sink = sinks.get_sink(name)
+
+    assert sink.write(fp, [b'{"id": 0}', b'{"id":\n1}'], raw=True) == 2
+    assert fp.getvalue() == expected
+
+
+def test_geojson_sink():
+    fp = io.BytesIO()
+    sinks.get_sink().write(fp, geojson.FeatureCollection(features()))
+
+    assert geojson.loads(fp.getvalue())["features"] == features()
+
+
+def test_to_wkb():
+    assert sinks.to_wkb(None) is None
+    assert sinks.to_wkb(geojson.Point((1, 2))) == struct.pack("<BIdd", 1, 1, 1, 2)
+    assert sinks.to_wkb(geojson.LineString([(0, 0, 1), (1, 1, 2)])) == struct.pack(
+        "<BII6d", 1, 1002, 2, 0, 0, 1, 1, 1, 2
+    )
+    assert sinks.to_wkb(
+        geojson.MultiPolygon([[[(0, 0), (1, 0), (0, 1), (0, 0)]]])
+    ) == struct.pack("<BIIBIII8d", 1, 6, 1, 1, 3, 1, 4, 0, 0, 1, 0, 0, 1, 0, 0)
+    assert sinks.to_wkb(
+        geojson.GeometryCollection([geojson.Point((1, 2))])
+    ) == struct.pack("<BIIBIdd", 1, 7, 1, 1, 1, 1, 2)
+
+
+@pytest.mark.parametrize(
+    "kind,other,expected",
+    [
+        ("null", "int", "int"),
+        ("int", "null", "int"),
+        ("int", "float", "float"),
+        ("float", "int", "float"),
+        ("bool", "int", "string"),
+        ("string", "float", "string"),
+    ],
+)
+def test_widen(kind, other, expected):
+    assert sinks.widen(kind, other) == expected
+
+
+def test_unknown_sink():
+    with pytest.raises(ValueError):
+        sinks.get_sink("shapefile")
+
+
+@pytest.mark.parametrize("name", ["arrow", "parquet"])
+def test_columnar_sink(name):
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.parquet
+
+    sink = sinks.get_sink(name)
+    fp = io.BytesIO()
+    assert sink.write(fp, geojson.FeatureCollection(features())) == 3
+    fp.seek(0)
+    if name == "arrow":
+        table = pyarrow.ipc.open_file(fp).read_all()
+    else:
+        table = pyarrow.parquet.read_table(fp)
+        geo = json.loads(table.schema.metadata[b"geo"])
+        assert geo["columns"]["geometry"] == {
+            "encoding": "WKB",
+            "geometry_types": ["LineString", "Point"],
+        }
+
+    assert table.column_names == ["id", "name", "area", "tags", "geometry"]
+    assert table.to_pydict()["area"] == [1.0, 2.5, None]
+    assert table.to_pydict()["tags"] == [None, '["x"]', None]
+    assert table.to_pydict()["geometry"] == [
+        sinks.to_wkb(feature["geometry"]) for feature in features()
+    ]
+
+    # kinds are kept across batches, and widened by later ones
+    fp = io.BytesIO()
+    sink.write(fp, [b'{"properties": {"id": "b"}, "geometry": null}'], raw=True)
+    assert sink.kinds["id"] == "string"
+    assert sink.kinds["area"] == "float"
+
+
+def test_columnar_sink_int64_overflow():
+    pyarrow = pytest.importorskip("pyarrow")
+
+    sink = sinks.get_sink("arrow")
+    table = sink.table(
+        [
+            {"properties": {"id": 2 ** 63, "n": 1}},
+            {"properties": {"id": 1, "n": -(2 ** 63)}},
+        ]
+    )
+    assert table.to_pydict()["id"] == ["9223372036854775808", "1"]
+    assert table.to_pydict()["n"] == [1, -(2 ** 63)]
+    assert sink.kinds == {"id": "string", "n": "int"}
+
+
+def test_columnar_sink_shared_by_threads():
+    pyarrow = pytest.importorskip("pyarrow")
+
+    sink = sinks.get_sink("arrow")
+    batches = [[{"properties": {f"p{i % 20}": i, "q": i / 2}}] * 50 for i in range(200)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        tables = list(executor.map(sink.table, batches))
+
+    assert sink.kinds == {"q": "float", **{f"p{i}": "int" for i in range(20)}}
+    for i, table in enumerate(tables):
+        assert table.schema.field(f"p{i % 20}").type == pyarrow.int64()
+        assert table.to_pydict()["q"] == [i / 2] * 50
@@ -0,0 +1,115 @@
+import json
+
+import pytest
+from geojsplit import sort
+
+
+def point(x, y, **properties):
+    return json.dumps(
+        {
+            "type": "Feature",
+            "properties": properties,
+            "geometry": {"type": "Point", "coordinates": [x, y]},
+        }
+    ).encode()
+
+
+def test_hilbert_index_visits_adjacent_cells():
+    cells = {sort.hilbert_index(x, y, 3): (x, y) for x in range(8) for y in range(8)}
+
+    assert sorted(cells) == list(range(64))
+    for index in range(63):
+        (x, y), (next_x, next_y) = cells[index], cells[index + 1]
+        assert abs(x - next_x) + abs(y - next_y) == 1
+
+
+@pytest.mark.parametrize(
+    "x,y,expected", [(0, 0, 0), (1, 0, 1), (0, 1, 2), (2, 1, 6), (3, 3, 15)]
+)
+def test_zorder_index(x, y, expected):
+    assert sort.zorder_index(x, y, 2) == expected
+
+
+@pytest.mark.parametrize(
+    "raw,expected",
+    [
+        (point(10, 20), (10.0, 20.0, 10.0, 20.0)),
+        (
+            b'{"type": "Feature", "properties": {"geometry": {"coordinates": [0, 0]}}, '
+            b'"geometry": {"type": "LineString", "coordinates": [[1, 5], [-2, 3]]}, '
+            b'"bbox": [9, 9, 9, 9]}',
+            (-2.0, 3.0, 1.0, 5.0),
+        ),
+        (
+            b'{"type": "Feature", "geometry": {"bbox": [-9, -9, 9, 9], '
+            b'"type": "Point", "coordinates": [1, 2]}}',
+            (1.0, 2.0, 1.0, 2.0),
+        ),
+        (b'{"type": "Feature", "geometry": null}', None),
+        (b'{"type": "Point", "coordinates": [3, 4]}', (3.0, 4.0, 3.0, 4.0)),
+    ],
+)
+def test_raw_bbox(raw, expected):
+    assert sort.raw_bbox(raw) == expected
+
+
+@pytest.mark.parametrize("spec", ["hilbert", "zorder:4"])
+def test_curve_key(spec):
+    sort_key = sort.get_sort_key(spec)
+    corners = [point(-170, -80), point(-170, 80), point(170, 80), point(170, -80)]
+    keys = [sort_key.key(raw) for raw in corners]
+
+    assert len(set(keys)) == 4
+    assert sort_key.key(point(-180, -90)) == sort_key.key(point(-200, -100)) == 0
+    assert sort_key.key(b'{"type": "Feature", "geometry": null}') > max(keys)
+
+
+def test_property_key():
+    sort_key = sort.get_sort_key("property:value")
+    values = [True, "b", None, 2.5, {"a": 1}, "a", 1, False]
+    features = [point(0, 0, value=value) for value in values] + [point(0, 0)]
+    features.append(b'{"type": "Feature", "properties": null, "geometry": null}')
+    ordered = sorted(features, key=sort_key.key)
+
+    assert [(json.loads(f)["properties"] or {}).get("value", "-") for f in ordered] == [
+        1,
+        2.5,
+        "a",
+        "b",
+        False,
+        True,
+        {"a": 1},
+        None,
+        "-",
+        "-",
+    ]
+    # only the bytes of the properties are decoded, not those of the members after them
+    assert sort_key.key(b'{"properties": {"value": 3}, "name": "\xff"}') == (0, 3)
+    assert sort_key.key(b'{"properties": {"a": "}", "value": "{"}}') == (1, "{")
+
+
+@pytest.mark.parametrize(
+    "spec", ["unknown", "hilbert:0", "hilbert:32", "zorder:a", "property", "property:"]
+)
+def test_get_sort_key_invalid(spec):
+    with pytest.raises(ValueError):
+        sort.get_sort_key(spec)
+
+
+# records take 160 bytes besides their feature, two of them fit in 400 bytes
+@pytest.mark.parametrize("memory_limit,run_count", [(None, 0), (1, 49), (400, 24)])
+def test_external_sorter(monkeypatch, memory_limit, run_count):
+    monkeypatch.setattr(sort, "MERGE_WIDTH", 2)
+    records = [(i % 7, str(i).encode()) for i in range(50)]
+
+    with sort.ExternalSorter(memory_limit) as sorter:
+        for key, raw in records:
+            sorter.add(key, memoryview(raw))
+        runs = list(sorter.runs)
+        output = list(sorter.sorted())
+
+    # stable, so features of equal keys keep their order
+    assert output == [raw for _, raw in sorted(records, key=lambda r: r[0])]
+    assert sorter.count == 50
+    assert len(runs) == run_count
+    assert sorter.runs == [] and all(run.closed for run in runs)
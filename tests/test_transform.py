@@ -0,0 +1,129 @@
+from decimal import Decimal
+
+import pytest
+from geojsplit import transform
+
+numpy = pytest.importorskip("numpy")
+
+
+def features():
+    return [
+        {
+            "type": "Feature",
+            "properties": {"id": 0},
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [
+                    [[Decimal("1.23456"), Decimal("2.5"), Decimal("7")], [3, 4]],
+                    [],
+                ],
+            },
+        },
+        {"type": "Point", "coordinates": [Decimal("10.06"), Decimal("-20.04")]},
+        {"type": "Feature", "properties": {"id": 2}, "geometry": None},
+        {
+            "type": "Feature",
+            "properties": {"id": 3},
+            "geometry": {
+                "type": "GeometryCollection",
+                "geometries": [
+                    {"type": "MultiPoint", "coordinates": [[0, 0, 1], [1, 1, 2]]}
+                ],
+            },
+        },
+    ]
+
+
+def test_flat_coordinates_roundtrip():
+    geometries = [features()[0]["geometry"], features()[1]]
+    flat = transform.FlatCoordinates.from_geometries(geometries)
+
+    assert flat.positions.shape == (3, 3)
+    assert flat.sizes.tolist() == [3, 2, 2]
+    assert flat.lengths == [2, 2, 0]
+    assert flat.nest() == [
+        [[[1.23456, 2.5, 7.0], [3.0, 4.0]], []],
+        [10.06, -20.04],
+    ]
+
+
+def test_precision():
+    transformed = transform.CoordinateTransform(precision=1).apply(features())
+
+    assert transformed[0]["geometry"]["coordinates"] == [
+        [[1.2, 2.5, 7.0], [3.0, 4.0]],
+        [],
+    ]
+    assert transformed[1]["coordinates"] == [10.1, -20.0]
+    assert transformed[2]["geometry"] is None
+    assert transformed[3]["properties"] == {"id": 3}
+
+
+def test_drop_z():
+    transformed = transform.CoordinateTransform(drop_z=True).apply(features())
+
+    assert transformed[0]["geometry"]["coordinates"][0] == [[1.23456, 2.5], [3.0, 4.0]]
+    assert transformed[3]["geometry"]["geometries"][0]["coordinates"] == [
+        [0.0, 0.0],
+        [1.0, 1.0],
+    ]
+
+
+def test_mercator_roundtrip():
+    positions = numpy.array([[-123.1, 49.25, 10.0], [0.0, 0.0, 0.0], [180, -85, 1]])
+    projected = transform.to_mercator(positions)
+
+    assert projected[2, 0] == pytest.approx(20037508.34, abs=0.01)
+    assert projected[:, 2].tolist() == [10.0, 0.0, 1.0]
+    assert numpy.allclose(transform.from_mercator(projected), positions)
+
+
+def test_swap_xy_by_name():
+    transformed = transform.CoordinateTransform(function="swap-xy").apply(features())
+
+    assert transformed[1]["coordinates"] == [-20.04, 10.06]
+
+
+@pytest.mark.parametrize(
+    "drop_z,expected",
+    [
+        (False, [-20.04, 10.06, 0.0, -20.04, 10.06, 7.0]),
+        (True, [-20.04, 10.06, -20.04, 10.06]),
+    ],
+)
+def test_bbox_follows_transform(drop_z, expected):
+    data = features()
+    data[0]["bbox"] = [3, 4, 0, 3, 4, 7]  # stale, and in the source order of axes
+    data[0]["geometry"]["coordinates"] = [[[10.06, -20.04, 7], [10.06, -20.04, 0]]]
+    data[1]["bbox"] = [10.06, -20.04, 10.06, -20.04]
+    data[2]["bbox"] = [0, 0, 1, 1]
+    data[3]["geometry"]["bbox"] = [0, 0, 1, 1, 1, 2]
+    transformed = transform.CoordinateTransform(
+        drop_z=drop_z, function="swap-xy"
+    ).apply(data)
+
+    assert transformed[0]["bbox"] == expected
+    assert transformed[1]["bbox"] == [-20.04, 10.06, -20.04, 10.06]
+    assert "bbox" not in transformed[2]
+    assert transformed[3]["geometry"]["bbox"] == (
+        [0.0, 0.0, 1.0, 1.0] if drop_z else [0.0, 0.0, 1.0, 1.0, 1.0, 2.0]
+    )
+
+
+def test_apply_iter():
+    coordinate_transform = transform.CoordinateTransform(precision=0)
+
+    transformed = list(coordinate_transform.apply_iter(iter(features()), batch=3))
+    assert [f.get("properties") for f in transformed] == [
+        f.get("properties") for f in features()
+    ]
+    assert transformed[3]["geometry"]["geometries"][0]["coordinates"][1] == [
+        1.0,
+        1.0,
+        2.0,
+    ]
+
+
+def test_invalid_transform():
+    with pytest.raises(ValueError):
+        transform.CoordinateTransform(function="utm")
@@ -0,0 +1,152 @@
+import json
+
+import pytest
+from geojsplit import writers
+from geojsplit.sinks import NDJSONSink
+
+
+def test_feature_collection_writer(tmp_path):
+    filename = tmp_path / "out" / "a.geojson"
+    with writers.FeatureCollectionWriter(filename) as writer:
+        writer.write(b'{"type": "Feature"}')
+        writer.write(memoryview(b'{"type": "Feature", "id": 1}'))
+
+    assert writer.count == 2
+    assert writer.size == filename.stat().st_size
+    assert json.loads(filename.read_bytes())["features"][1] == {
+        "type": "Feature",
+        "id": 1,
+    }
+
+
+def test_feature_collection_writer_dry_run(tmp_path):
+    filename = tmp_path / "a.geojson"
+    with writers.FeatureCollectionWriter(filename, dry_run=True) as writer:
+        writer.write(b"{}")
+
+    assert writer.size == writers.ENVELOPE_SIZE + 2
+    assert not filename.exists()
+
+
+@pytest.mark.parametrize(
+    "max_bytes,max_features,expected",
+    [
+        (None, None, [10]),
+        (None, 4, [4, 4, 2]),
+        (writers.ENVELOPE_SIZE + 3 * 20 + 2, None, [3, 3, 3, 1]),
+        (writers.ENVELOPE_SIZE + 3 * 20 + 2, 2, [2, 2, 2, 2, 2]),
+        (1, None, [1] * 10),
+    ],
+)
+def test_rolling_writer(tmp_path, max_bytes, max_features, expected):
+    closed = []
+    feature = b'{"type": "Feature"}'.ljust(20)
+    with writers.RollingWriter(
+        lambda n: tmp_path / f"{n}.geojson",
+        max_bytes=max_bytes,
+        max_features=max_features,
+        on_close=closed.append,
+    ) as writer:
+        for _ in range(10):
+            writer.write(feature)
+
+    assert writer.file_count == len(expected)
+    assert [w.count for w in closed] == expected
+    for w in closed:
+        assert len(json.loads(w.filename.read_bytes())["features"]) == w.count
+        if max_bytes is not None and w.count > 1:
+            assert w.filename.stat().st_size <= max_bytes
+
+
+@pytest.mark.parametrize("compress", [None, "gzip"])
+def test_writer_cache_reopens_evicted_files(tmp_path, compress):
+    from geojsplit.compression import open_decompressed
+
+    keys = ["a", "b", "c", "a", "b", "d", "a"]
+    with writers.WriterCache(
+        lambda key: tmp_path / f"{key}.geojson", max_open=2, compress=compress
+    ) as cache:
+        for i, key in enumerate(keys):
+            cache.write(key, b'{"id": %d}' % i)
+            assert sum(not w.suspended for w in cache.writers.values()) <= 2
+
+    assert list(cache.writers) == ["a", "b", "c", "d"]
+    for key, writer in cache.writers.items():
+        with writer.filename.open("rb") as fp:
+            _, decompressed = open_decompressed(fp)
+            features = json.loads(decompressed.read())["features"]
+        assert [f["id"] for f in features] == [
+            i for i, k in enumerate(keys) if k == key
+        ]
+        assert writer.count == len(features)
+
+
+def test_writer_cache_finish(tmp_path):
+    with writers.WriterCache(lambda key: tmp_path / f"{key}.geojson") as cache:
+        cache.write("a", b"{}")
+        cache.finish("a")
+        assert json.loads((tmp_path / "a.geojson").read_bytes())["features"] == [{}]
+        cache.write("b", b"{}")
+
+
+def test_feature_collection_writer_is_atomic(tmp_path):
+    filename = tmp_path / "a.geojson"
+    writer = writers.FeatureCollectionWriter(filename)
+    writer.write(b"{}")
+    writer.suspend()
+    writer.write(b"{}")
+
+    assert not filename.exists()
+    assert writers.partial_path(filename).exists()
+    writer.close()
+    assert json.loads(filename.read_bytes())["features"] == [{}, {}]
+    assert not writers.partial_path(filename).exists()
+
+
+def test_atomic_open_removes_partial_file_on_error(tmp_path):
+    filename = tmp_path / "a.geojson"
+    with pytest.raises(RuntimeError):
+        with writers.atomic_open(filename) as fp:
+            fp.write(b"{")
+            raise RuntimeError()
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_writers_abort_on_error(tmp_path):
+    with pytest.raises(KeyboardInterrupt):
+        with writers.FeatureCollectionWriter(tmp_path / "a.geojson") as writer:
+            writer.write(b"{}")
+            raise KeyboardInterrupt()
+
+    with pytest.raises(RuntimeError):
+        with writers.RollingWriter(
+            lambda i: tmp_path / f"b{i}.geojson", max_features=1
+        ) as rolling:
+            rolling.write(b"{}")
+            rolling.write(b"{}")
+            raise RuntimeError()
+
+    with pytest.raises(RuntimeError):
+        with writers.WriterCache(lambda k: tmp_path / f"{k}.geojson", 1) as cache:
+            cache.write("c", b"{}")
+            cache.finish("c")
+            cache.write("d", b"{}")
+            cache.write("e", b"{}")
+            raise RuntimeError()
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "b0.geojson",
+        "c.geojson",
+    ]
+
+
+def test_feature_collection_writer_sink(tmp_path):
+    filename = tmp_path / "a.geojsonl"
+    with writers.FeatureCollectionWriter(filename, sink=NDJSONSink()) as writer:
+        assert writer.size_with(2) == 3
+        writer.write(b"{}")
+        writer.write(b'{"a":\n1}')
+
+    assert writer.size == filename.stat().st_size
+    assert filename.read_bytes() == b'{}\n{"a": 1}\n'